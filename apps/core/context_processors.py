@@ -2,7 +2,12 @@
 Context processors for adding data to all templates
 """
 from apps.core.terminal_config import get_terminal_config
-from apps.core.models import Store, Brand, StoreBrand
+from apps.core.store_context import get_store_context
+
+
+def _store_context(request):
+    """request.store_ctx when StoreContextMiddleware ran, else the cached context"""
+    return getattr(request, 'store_ctx', None) or get_store_context()
 
 
 def terminal_config(request):
@@ -31,7 +36,7 @@ def store_config(request):
     Usage in templates: {{ store_config.store_location }}
     """
     try:
-        store = Store.get_current()
+        store = _store_context(request).store
         return {
             'store_config': store,
         }
@@ -46,16 +51,8 @@ def global_context(request):
     Add global context variables including brand filter
     """
     try:
-        store = Store.get_current()
-        
-        # Get all brands associated with this store
-        available_brands = []
-        if store:
-            store_brands = StoreBrand.objects.filter(
-                store=store, 
-                is_active=True
-            ).select_related('brand')
-            available_brands = [sb.brand for sb in store_brands]
+        # All active brands associated with this store (cached)
+        available_brands = list(_store_context(request).brands)
         
         # Get context brand from session
         context_brand_id = request.session.get('context_brand_id', '')
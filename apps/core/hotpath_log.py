@@ -0,0 +1,145 @@
+"""
+Structured, sampled logging for POS hot paths
+
+add_item, send_to_kitchen, process_payment and the KDS screen used to print
+dozens of debug lines per request, some of them looping over bill items (and
+querying products) only to print their status. In production that output is
+noise, and the queries behind it are paid on every request.
+
+    from apps.core.hotpath_log import get_hot_logger
+    hotlog = get_hot_logger(__name__)
+
+    hotlog.debug('send_kitchen.start', bill=bill.bill_number, items=len(ids))
+    hotlog.dump('send_kitchen.items', lambda: [(i.id, i.status) for i in bill.items.all()])
+    hotlog.error('send_kitchen.failed', bill=bill.id, error=e)
+
+- Every line carries the request's correlation id (RequestIdMiddleware sets
+  it from X-Request-ID or generates one; RequestIdFilter adds it to records)
+- Messages are formatted lazily as "event key=value ...": nothing is
+  formatted when the level is disabled
+- debug/info events are sampled per request (POS_LOG_SAMPLE_RATE): a sampled
+  request logs all of its events, other requests log none of them.
+  warning/error are never sampled
+- dump() is for diagnostic item/status listings. Its callable only runs when
+  POS_LOG_DIAGNOSTIC_DUMPS is on, DEBUG is enabled for the logger and the
+  request is sampled, so views never query just to log
+"""
+import contextvars
+import logging
+import random
+import uuid
+
+from django.conf import settings
+
+_request_id = contextvars.ContextVar('pos_request_id', default='-')
+_sampled = contextvars.ContextVar('pos_log_sampled', default=None)
+
+
+def begin_request(request_id=None):
+    """
+    Start a logging scope (called by RequestIdMiddleware)
+
+    Returns:
+        (request_id, tokens) - pass tokens to end_request()
+    """
+    request_id = (request_id or uuid.uuid4().hex[:12])[:64]
+    tokens = (_request_id.set(request_id), _sampled.set(None))
+    return request_id, tokens
+
+
+def end_request(tokens):
+    request_token, sampled_token = tokens
+    _request_id.reset(request_token)
+    _sampled.reset(sampled_token)
+
+
+def get_request_id():
+    """Correlation id of the current request ('-' outside a request)"""
+    return _request_id.get()
+
+
+def is_sampled():
+    """Sampling decision of the current request (made once, on first use)"""
+    sampled = _sampled.get()
+    if sampled is None:
+        rate = getattr(settings, 'POS_LOG_SAMPLE_RATE', 1.0)
+        sampled = rate >= 1 or (rate > 0 and random.random() < rate)
+        _sampled.set(sampled)
+    return sampled
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds record.request_id for the '%(request_id)s' format field"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class _Event:
+    """Deferred 'event key=value ...' message, formatted only when emitted"""
+
+    __slots__ = ('event', 'fields')
+
+    def __init__(self, event, fields):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self):
+        if not self.fields:
+            return self.event
+        pairs = ' '.join(f"{key}={value}" for key, value in self.fields.items())
+        return f"{self.event} {pairs}"
+
+
+class HotPathLogger:
+    """Logger wrapper for request hot paths (see module docstring)"""
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+
+    def _log(self, level, event, fields, sampled=True, exc_info=None):
+        if not self.logger.isEnabledFor(level):
+            return
+        if sampled and not is_sampled():
+            return
+        self.logger.log(
+            level, '%s', _Event(event, fields), exc_info=exc_info,
+            extra={'event': event, 'fields': fields}, stacklevel=3,
+        )
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields, sampled=False)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields, sampled=False)
+
+    def exception(self, event, **fields):
+        """Error with traceback (call from an except block)"""
+        self._log(logging.ERROR, event, fields, sampled=False, exc_info=True)
+
+    def dump(self, event, rows):
+        """
+        Log a diagnostic listing, one line per row
+
+        Args:
+            event: Event name
+            rows: Callable returning an iterable of rows; not called at all
+                unless diagnostic dumps are enabled for this request
+        """
+        if not getattr(settings, 'POS_LOG_DIAGNOSTIC_DUMPS', False):
+            return
+        if not self.logger.isEnabledFor(logging.DEBUG) or not is_sampled():
+            return
+        for row in rows():
+            self.logger.debug('%s', _Event(event, {'row': row}), extra={'event': event}, stacklevel=2)
+
+
+def get_hot_logger(name):
+    return HotPathLogger(name)
@@ -4,7 +4,10 @@ Ensures all requests have valid terminal_id and injects terminal object into req
 """
 from django.shortcuts import redirect
 from django.urls import reverse
-from apps.core.models import POSTerminal
+from django.utils.functional import SimpleLazyObject
+from apps.core.hotpath_log import begin_request, end_request
+from apps.core.store_context import get_store_context
+from apps.core.terminal_resolver import resolve_terminal
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,32 +49,28 @@ class TerminalMiddleware:
             logger.warning(f'No terminal ID for path: {request.path}, user: {request.user}')
             return redirect('core:terminal_setup')
         
-        # Validate terminal exists and is active
-        try:
-            terminal = POSTerminal.objects.select_related('store', 'store__brand', 'store__brand__company').get(
-                id=terminal_id,
-                is_active=True
-            )
-            
-            # Inject terminal into request
-            request.terminal = terminal
-            request.store = terminal.store
-            
-            # Store in session for non-HTMX requests
-            request.session['terminal_id'] = str(terminal.id)
-            
-            # Update heartbeat every request (or periodically in JS)
-            # Commented to avoid too frequent updates, use JS heartbeat instead
-            # terminal.update_heartbeat(self.get_client_ip(request))
-            
-        except POSTerminal.DoesNotExist:
+        # Validate terminal exists and is active (cached, see terminal_resolver)
+        terminal = resolve_terminal(terminal_id)
+        if terminal is None:
             logger.error(f'Invalid terminal ID: {terminal_id}')
             # Clear only terminal-related session data, preserve user session
             if 'terminal_id' in request.session:
                 del request.session['terminal_id']
             # Don't force session.modified = True here, let Django handle it
             return redirect('core:terminal_setup')
-        
+
+        # Inject terminal into request
+        request.terminal = terminal
+        request.store = terminal.store
+
+        # Store in session for non-HTMX requests (only write when it changed)
+        if request.session.get('terminal_id') != str(terminal.id):
+            request.session['terminal_id'] = str(terminal.id)
+
+        # Update heartbeat every request (or periodically in JS)
+        # Commented to avoid too frequent updates, use JS heartbeat instead
+        # terminal.update_heartbeat(self.get_client_ip(request))
+
         response = self.get_response(request)
         return response
     
@@ -84,3 +83,36 @@ class TerminalMiddleware:
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
+
+
+class StoreContextMiddleware:
+    """Expose the cached store/brand context as request.store_ctx (loaded lazily)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.store_ctx = SimpleLazyObject(get_store_context)
+        return self.get_response(request)
+
+
+class RequestIdMiddleware:
+    """
+    Per-request correlation id for log lines (apps.core.hotpath_log)
+
+    Uses the X-Request-ID header when the client/proxy sends one, otherwise
+    generates an id. Exposed as request.request_id and echoed in the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id, tokens = begin_request(request.headers.get('X-Request-ID'))
+        request.request_id = request_id
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(tokens)
+        response['X-Request-ID'] = request_id
+        return response
@@ -2,6 +2,9 @@
 Session safeguard middleware to prevent session loss
 """
 import logging
+import time
+
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
@@ -10,12 +13,34 @@ class SessionSafeguardMiddleware:
     """
     Middleware to ensure sessions are properly maintained
     and debug session issues
+
+    With SESSION_KEEPALIVE_MINUTES > 0 the session is only touched (and so
+    written by SessionMiddleware, extending its expiry) when the last
+    keep-alive is older than that, instead of on every HTMX click and poll.
+    SESSION_KEEPALIVE_MINUTES = 0 keeps the legacy save-every-request mode.
     """
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.keepalive_seconds = getattr(settings, 'SESSION_KEEPALIVE_MINUTES', 5) * 60
     
     def __call__(self, request):
+        if not self.keepalive_seconds:
+            return self._legacy_call(request)
+
+        if request.user.is_authenticated:
+            logger.debug(f"User {request.user.username} - Session: {request.session.session_key} - Path: {request.path}")
+
+            # Throttled keep-alive: modified session is saved by SessionMiddleware
+            now = int(time.time())
+            last_touch = request.session.get('_last_activity_at', 0)
+            if now - last_touch >= self.keepalive_seconds:
+                request.session['_last_activity_at'] = now
+                request.session['_last_activity'] = str(request.path)
+
+        return self.get_response(request)
+
+    def _legacy_call(self, request):
         # Log session info for debugging
         if request.user.is_authenticated:
             session_key = request.session.session_key
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Sequence name, e.g. bill, queue, refund, reservation', max_length=30)),
+                ('scope', models.CharField(blank=True, default='', help_text='Brand code/ID the counter belongs to (empty = global)', max_length=64)),
+                ('business_date', models.DateField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'core_document_sequence',
+                'unique_together': {('name', 'scope', 'business_date')},
+            },
+        ),
+    ]
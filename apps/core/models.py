@@ -149,6 +149,18 @@ class Brand(models.Model):
     def __str__(self):
         return f"{self.company.name} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Tax/service rates are part of the cached store context
+        from apps.core.store_context import invalidate_store_context
+        invalidate_store_context()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.core.store_context import invalidate_store_context
+        invalidate_store_context()
+        return result
+
 
 class Store(models.Model):
     """Physical store location - Singleton per Edge Server, can have multiple brands"""
@@ -177,20 +189,42 @@ class Store(models.Model):
         # Enforce singleton pattern
         if not self.pk and Store.objects.exists():
             raise ValueError('Store configuration already exists. Only one store per Edge Server.')
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        from apps.core.store_context import invalidate_store_context
+        invalidate_store_context()
+        return result
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.core.store_context import invalidate_store_context
+        invalidate_store_context()
+        return result
     
     @classmethod
     def get_current(cls):
-        """Get current store configuration"""
-        return cls.objects.first()
+        """Get current store configuration (cached, see apps.core.store_context)"""
+        from apps.core.store_context import get_current_store
+        return get_current_store()
+
+    def _cached_context(self):
+        """Cached StoreContext if this instance is the current store, else None"""
+        from apps.core.store_context import get_store_context
+        ctx = get_store_context()
+        return ctx if ctx.store is not None and ctx.store.pk == self.pk else None
     
     def get_primary_brand(self):
         """Get the primary/first active brand for this store (for backward compatibility)"""
+        ctx = self._cached_context()
+        if ctx:
+            return ctx.primary_brand
         store_brand = self.store_brands.filter(is_active=True).first()
         return store_brand.brand if store_brand else None
     
     def get_all_brands(self):
         """Get all active brands for this store"""
+        ctx = self._cached_context()
+        if ctx:
+            return list(ctx.brands)
         return [sb.brand for sb in self.store_brands.filter(is_active=True)]
     
     @property
@@ -226,6 +260,17 @@ class StoreBrand(models.Model):
     def __str__(self):
         return f"{self.store.store_name} - {self.brand.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from apps.core.store_context import invalidate_store_context
+        invalidate_store_context()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.core.store_context import invalidate_store_context
+        invalidate_store_context()
+        return result
+
 
 class POSTerminal(models.Model):
     """POS/Tablet/Kiosk device registration - assigned to specific brand"""
@@ -337,6 +382,20 @@ class POSTerminal(models.Model):
     
     def __str__(self):
         return f"{self.terminal_code} - {self.terminal_name}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from apps.core.terminal_resolver import invalidate_terminal_cache, VOLATILE_FIELDS
+        update_fields = kwargs.get('update_fields')
+        # Heartbeats save every few seconds and don't affect terminal resolution
+        if update_fields is None or not set(update_fields) <= VOLATILE_FIELDS:
+            invalidate_terminal_cache()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.core.terminal_resolver import invalidate_terminal_cache
+        invalidate_terminal_cache()
+        return result
     
     def update_heartbeat(self, ip_address=None):
         """Update last heartbeat and optionally IP address"""
@@ -389,6 +448,17 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from apps.pos.catalog import invalidate_catalog
+        invalidate_catalog(self.brand_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.pos.catalog import invalidate_catalog
+        invalidate_catalog(self.brand_id)
+        return result
+
 
 class Product(models.Model):
     PRINTER_CHOICES = [
@@ -431,6 +501,18 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # POS catalog snapshot (brand_id None drops every brand)
+        from apps.pos.catalog import invalidate_catalog
+        invalidate_catalog(self.brand_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.pos.catalog import invalidate_catalog
+        invalidate_catalog(self.brand_id)
+        return result
+
 
 class Modifier(models.Model):
     """Modifier groups for products (e.g., Size, Spice Level)"""
@@ -471,6 +553,18 @@ class ProductModifier(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.modifier.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # has_modifiers flag in the POS catalog snapshot
+        from apps.pos.catalog import invalidate_catalog
+        invalidate_catalog()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.pos.catalog import invalidate_catalog
+        invalidate_catalog()
+        return result
+
 
 # Add property to Product to access modifiers
 def get_modifiers(self):
@@ -540,6 +634,18 @@ class ProductPhoto(models.Model):
     
     def __str__(self):
         return f"{self.product.name} - Photo {self.filename or self.id}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Primary photos are part of the POS catalog snapshot
+        from apps.pos.catalog import invalidate_catalog
+        invalidate_catalog()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.pos.catalog import invalidate_catalog
+        invalidate_catalog()
+        return result
     
     def get_url(self):
         """Get URL for photo - prioritize MinIO object_key"""
@@ -1197,3 +1303,22 @@ class CustomerReview(models.Model):
     def __str__(self):
         return f"Review #{self.rating} - {self.store} - {self.created_at:%Y-%m-%d %H:%M}"
 
+
+
+class DocumentSequence(models.Model):
+    """
+    Daily document counter (bill numbers, queue numbers, refund numbers,
+    reservation codes). One row per sequence name, scope and business date;
+    incremented under a row lock by apps.core.sequences.next_value().
+    """
+    name = models.CharField(max_length=30, help_text='Sequence name, e.g. bill, queue, refund, reservation')
+    scope = models.CharField(max_length=64, blank=True, default='', help_text='Brand code/ID the counter belongs to (empty = global)')
+    business_date = models.DateField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'core_document_sequence'
+        unique_together = [['name', 'scope', 'business_date']]
+
+    def __str__(self):
+        return f"{self.name}:{self.scope or '*'}:{self.business_date} = {self.last_value}"
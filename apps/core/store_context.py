@@ -0,0 +1,118 @@
+"""
+Cached store/brand tenancy context for the edge server.
+
+The edge server holds a singleton Store, yet Store.get_current(), the
+StoreBrand lookup in context processors and Store.brand used to hit the
+database several times per request. StoreContext loads them once per
+process and is exposed as request.store_ctx (StoreContextMiddleware).
+
+Invalidation:
+- Store/StoreBrand/Brand save() and delete() call invalidate_store_context()
+- a version number in the shared Django cache tells other worker processes
+  to reload on their next request
+- STORE_CONTEXT_TTL seconds as a safety net for queryset.update() writes
+"""
+import copy
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'core:store_context_version'
+
+_lock = threading.Lock()
+_context = None
+
+
+class StoreContext:
+    """Immutable snapshot of the current store, its active brands and their rates"""
+
+    def __init__(self, store, brands, version):
+        self.store = store
+        self.brands = brands  # active brands of this store, StoreBrand order
+        self.brands_by_id = {str(b.id): b for b in brands}
+        self.primary_brand = brands[0] if brands else None
+        self.rates = {
+            str(b.id): {'tax_rate': b.tax_rate, 'service_charge': b.service_charge}
+            for b in brands
+        }
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def get_brand(self, brand_id):
+        """Active brand of this store by id (UUID or str), or None"""
+        return self.brands_by_id.get(str(brand_id)) if brand_id else None
+
+    def get_rates(self, brand_id):
+        """{'tax_rate', 'service_charge'} percentages for a brand, or None"""
+        return self.rates.get(str(brand_id)) if brand_id else None
+
+
+def _shared_version():
+    """Current context version in the shared cache (0 if unavailable)"""
+    try:
+        return cache.get(VERSION_CACHE_KEY, 0)
+    except Exception as e:
+        logger.debug(f"Store context version lookup failed: {e}")
+        return 0
+
+
+def _load(version):
+    from apps.core.models import Store, StoreBrand
+
+    store = Store.objects.select_related('company').first()
+    brands = []
+    if store:
+        brands = [
+            sb.brand for sb in StoreBrand.objects.filter(
+                store=store, is_active=True
+            ).select_related('brand', 'brand__company')
+        ]
+    return StoreContext(store, brands, version)
+
+
+def get_store_context():
+    """Return the process-wide StoreContext, reloading it if stale"""
+    global _context
+
+    version = _shared_version()
+    ttl = getattr(settings, 'STORE_CONTEXT_TTL', 300)
+    ctx = _context
+    if ctx is not None and ctx.version == version and time.monotonic() - ctx.loaded_at < ttl:
+        return ctx
+
+    with _lock:
+        ctx = _context
+        if ctx is None or ctx.version != version or time.monotonic() - ctx.loaded_at >= ttl:
+            ctx = _load(version)
+            _context = ctx
+    return ctx
+
+
+def get_current_store():
+    """
+    Copy of the cached current Store (or None).
+    A copy, so callers that modify and save() it never touch the shared instance.
+    """
+    store = get_store_context().store
+    return copy.copy(store) if store is not None else None
+
+
+def invalidate_store_context():
+    """Drop the cached context here and in every other worker process"""
+    global _context
+
+    with _lock:
+        _context = None
+    try:
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            # Key missing (first invalidation or cache flushed)
+            cache.set(VERSION_CACHE_KEY, 1, None)
+    except Exception as e:
+        logger.warning(f"Store context version bump failed, other workers reload after TTL: {e}")
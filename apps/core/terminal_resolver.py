@@ -0,0 +1,145 @@
+"""
+Cached POS terminal resolution.
+
+Terminal validity is checked on almost every POS request (TerminalMiddleware,
+pos_main, send_to_kitchen, payment modal, shift open) but terminals change
+almost never. Active terminals are cached per process, keyed by id, with
+their store/company/brand loaded.
+
+Invalidation:
+- POSTerminal save() and delete() call invalidate_terminal_cache(), except
+  for heartbeat-only saves (last_heartbeat/last_seen/ip_address)
+- a version number in the shared Django cache tells other worker processes
+  to drop their cache on their next lookup
+- TERMINAL_CACHE_TTL seconds as a safety net for queryset.update() writes
+"""
+import copy
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'core:terminal_cache_version'
+
+# Fields written by heartbeats - saving only these does not invalidate the cache
+VOLATILE_FIELDS = frozenset({'last_heartbeat', 'last_seen', 'ip_address'})
+
+_lock = threading.Lock()
+_terminals = {}  # str(id) -> (terminal, loaded_at)
+_code_to_id = {}  # terminal_code -> str(id)
+_version = None
+
+
+def _shared_version():
+    """Current cache version in the shared cache (0 if unavailable)"""
+    try:
+        return cache.get(VERSION_CACHE_KEY, 0)
+    except Exception as e:
+        logger.debug(f"Terminal cache version lookup failed: {e}")
+        return 0
+
+
+def _check_version():
+    """Drop this process' entries when another process bumped the version"""
+    global _version
+
+    version = _shared_version()
+    if version != _version:
+        with _lock:
+            _terminals.clear()
+            _code_to_id.clear()
+            _version = version
+
+
+def _load(**lookup):
+    from apps.core.models import POSTerminal
+
+    terminal = POSTerminal.objects.select_related(
+        'store', 'store__company', 'brand', 'brand__company'
+    ).filter(is_active=True, **lookup).first()
+    if terminal is not None:
+        with _lock:
+            _terminals[str(terminal.id)] = (terminal, time.monotonic())
+            _code_to_id[terminal.terminal_code] = str(terminal.id)
+    return terminal
+
+
+def _cached(terminal_id):
+    entry = _terminals.get(str(terminal_id))
+    if entry is None:
+        return None
+    terminal, loaded_at = entry
+    if time.monotonic() - loaded_at >= getattr(settings, 'TERMINAL_CACHE_TTL', 60):
+        return None
+    return terminal
+
+
+def resolve_terminal(terminal_id):
+    """
+    Active POSTerminal by id, or None if missing/inactive/invalid.
+
+    Returns a copy, so callers that modify and save() it never touch the
+    shared instance.
+    """
+    if not terminal_id:
+        return None
+    _check_version()
+    terminal = _cached(terminal_id)
+    if terminal is None:
+        try:
+            terminal = _load(id=terminal_id)
+        except (ValidationError, ValueError) as e:
+            # Malformed UUID in session/header
+            logger.warning(f"Terminal lookup failed for {terminal_id!r}: {e}")
+            return None
+    return copy.copy(terminal) if terminal is not None else None
+
+
+def resolve_terminal_by_code(terminal_code):
+    """Active POSTerminal by terminal_code, or None (same cache as resolve_terminal)"""
+    if not terminal_code:
+        return None
+    _check_version()
+    terminal_id = _code_to_id.get(terminal_code)
+    terminal = _cached(terminal_id) if terminal_id else None
+    if terminal is None:
+        terminal = _load(terminal_code=terminal_code)
+    return copy.copy(terminal) if terminal is not None else None
+
+
+def get_request_terminal(request):
+    """
+    Terminal of the current request: request.terminal when already set
+    (middleware/pos_main), otherwise resolved from session['terminal_id'].
+    The result is attached to request.terminal for later callers.
+    """
+    terminal = getattr(request, 'terminal', None)
+    if terminal is not None:
+        return terminal
+    terminal = resolve_terminal(request.session.get('terminal_id'))
+    if terminal is not None:
+        request.terminal = terminal
+    return terminal
+
+
+def invalidate_terminal_cache():
+    """Drop cached terminals here and in every other worker process"""
+    global _version
+
+    with _lock:
+        _terminals.clear()
+        _code_to_id.clear()
+        _version = None
+    try:
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            # Key missing (first invalidation or cache flushed)
+            cache.set(VERSION_CACHE_KEY, 1, None)
+    except Exception as e:
+        logger.warning(f"Terminal cache version bump failed, other workers reload after TTL: {e}")
@@ -495,6 +495,7 @@ def setup_reset(request):
             from apps.core.models import Category, Product, Modifier
             from apps.pos.models import Bill, BillItem, Payment
             from apps.core.models_session import CashierShift, StoreSession, CashDrop
+            from apps.pos.catalog import invalidate_catalog
             
             # Count before deletion
             terminal_count = POSTerminal.objects.count()
@@ -533,6 +534,7 @@ def setup_reset(request):
             Product.objects.all().delete()
             Category.objects.all().delete()
             Modifier.objects.all().delete()
+            invalidate_catalog()
             
             # Step 4: Delete brands (depends on Company)
             Brand.objects.all().delete()
@@ -4,6 +4,7 @@ from .models import (
     KitchenTicket, KitchenTicketItem, StationPrinter, PrinterBrand,
     KitchenTicketLog, PrinterHealthCheck
 )
+from .services import notify_kitchen_config_changed
 
 
 @admin.register(KitchenOrder)
@@ -65,7 +66,7 @@ class KitchenTicketAdmin(admin.ModelAdmin):
     search_fields = ['bill__bill_number', 'printer_ip']
     readonly_fields = [
         'created_at', 'printed_at', 'last_error_at', 'print_attempts',
-        'error_message', 'original_ticket'
+        'error_message', 'original_ticket', 'claimed_by', 'lease_expires_at'
     ]
     inlines = [KitchenTicketItemInline]
     
@@ -74,7 +75,8 @@ class KitchenTicketAdmin(admin.ModelAdmin):
             'fields': ('bill', 'printer_target', 'status')
         }),
         ('Print Details', {
-            'fields': ('printer_ip', 'print_attempts', 'max_retries', 'is_reprint', 'original_ticket')
+            'fields': ('printer_ip', 'print_attempts', 'max_retries', 'is_reprint', 'original_ticket',
+                       'claimed_by', 'lease_expires_at')
         }),
         ('Error Tracking', {
             'fields': ('error_message', 'last_error_at'),
@@ -92,7 +94,9 @@ class KitchenTicketAdmin(admin.ModelAdmin):
         count = queryset.filter(status__in=['failed', 'printed']).update(
             status='new',
             error_message='',
-            printer_ip=None
+            printer_ip=None,
+            claimed_by='',
+            lease_expires_at=None
         )
         self.message_user(request, f"{count} ticket(s) marked as NEW for reprint")
     mark_as_new.short_description = "🔄 Reset to NEW (Reprint)"
@@ -152,6 +156,20 @@ class StationPrinterAdmin(admin.ModelAdmin):
         return f"<span style='color: {color}; font-weight: bold;'>{rate:.1f}%</span>"
     get_success_rate.short_description = 'Success Rate'
     get_success_rate.allow_tags = True
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # brand may have changed on edit - flush every brand in that case
+        notify_kitchen_config_changed(None if 'brand' in form.changed_data else obj.brand_id)
+
+    def delete_model(self, request, obj):
+        brand_id = obj.brand_id
+        super().delete_model(request, obj)
+        notify_kitchen_config_changed(brand_id)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        notify_kitchen_config_changed()
     
     actions = ['run_health_check']
     
@@ -33,6 +33,18 @@ class KDSConsumer(AsyncWebsocketConsumer):
             'table': event['table'],
         }))
 
+    async def kds_update(self, event):
+        # Per-order diff with rendered card (see services.push_kds_update)
+        await self.send(text_data=json.dumps({
+            'type': 'kds_update',
+            'event': event['event'],
+            'order_id': event['order_id'],
+            'station': event['station'],
+            'status': event['status'],
+            'priority': event['priority'],
+            'html': event['html'],
+        }))
+
 
 class POSConsumer(AsyncWebsocketConsumer):
     async def connect(self):
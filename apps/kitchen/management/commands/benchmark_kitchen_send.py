@@ -0,0 +1,58 @@
+from collections import Counter
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    help = 'Count SQL statements issued by the kitchen part of send_to_kitchen (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bill', type=int, help='Bill ID (default: bill with the most kitchen items)')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of runs to average the timing over')
+        parser.add_argument('--show-sql', action='store_true', help='Print every captured statement')
+
+    def handle(self, *args, **options):
+        from apps.pos.models import Bill
+        from apps.kitchen.services import create_kitchen_orders_for_items, create_kitchen_tickets
+
+        if options['bill']:
+            bill = Bill.objects.filter(id=options['bill']).first()
+        else:
+            bill = Bill.objects.filter(items__is_void=False).annotate(
+                n=Count('items')
+            ).order_by('-n').first()
+        if not bill:
+            raise CommandError('No bill with items found')
+
+        item_ids = list(
+            bill.items.filter(is_void=False).exclude(printer_target__in=['', 'none']).values_list('id', flat=True)
+        )
+        self.stdout.write(f'Bill #{bill.bill_number} (id={bill.id}): {len(item_ids)} kitchen item(s)')
+
+        timings = []
+        captured = None
+        for _ in range(max(options['repeat'], 1)):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    orders = create_kitchen_orders_for_items(bill, item_ids=item_ids)
+                    tickets = create_kitchen_tickets(bill, item_ids=item_ids)
+                    timings.append((time.perf_counter() - start) * 1000)
+                # Benchmark only - never keep the rows
+                transaction.set_rollback(True)
+            captured = captured or ctx.captured_queries
+
+        kinds = Counter(q['sql'].lstrip().split(' ', 1)[0].upper() for q in captured)
+        self.stdout.write(f'KDS orders: {len(orders)}, tickets: {len(tickets)}')
+        self.stdout.write(f'Statements: {len(captured)}')
+        for kind, count in kinds.most_common():
+            self.stdout.write(f'  {kind:<10} {count}')
+        self.stdout.write(f'Avg time: {sum(timings) / len(timings):.1f} ms over {len(timings)} run(s)')
+
+        if options['show_sql']:
+            for q in captured:
+                self.stdout.write(q['sql'])
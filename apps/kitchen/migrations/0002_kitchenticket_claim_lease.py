@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+        ('kitchen', '0001_initial'),
+        ('pos', '0003_payment_method_choices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kitchenticket',
+            name='claimed_by',
+            field=models.CharField(blank=True, help_text='Kitchen agent holding the print lease', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='kitchenticket',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='Lease expiry - expired printing tickets are reclaimed by any agent', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='kitchenticket',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='kitchen_kit_status_ac4f87_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0002_kitchenticket_claim_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kitchenticket',
+            name='rendered_payload',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='kitchenticket',
+            name='rendered_profile',
+            field=models.CharField(blank=True, help_text='Printer brand/chars per line the payload was rendered for, e.g. HRPT/42', max_length=50),
+        ),
+    ]
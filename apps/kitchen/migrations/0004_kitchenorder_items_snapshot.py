@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0003_kitchenticket_rendered_payload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kitchenorder',
+            name='items_snapshot',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -55,6 +55,10 @@ class KitchenOrder(models.Model):
     # Batch tracking: which specific BillItem IDs belong to this KDS order
     item_ids = models.JSONField(default=list, blank=True)
 
+    # Denormalized item snapshot for KDS rendering (no join back to pos_billitem):
+    # [{'id', 'product_name', 'quantity', 'modifiers', 'notes', 'is_void'}, ...]
+    items_snapshot = models.JSONField(default=list, blank=True)
+
     # Timer tracking
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
@@ -78,15 +82,42 @@ class KitchenOrder(models.Model):
     def __str__(self):
         return f"{self.bill.bill_number} - {self.station}"
     
+    @staticmethod
+    def snapshot_item(item):
+        """Compact KDS entry for a BillItem (product must be loaded)"""
+        return {
+            'id': item.id,
+            'product_name': item.product.name,
+            'quantity': item.quantity,
+            'modifiers': item.modifiers or [],
+            'notes': item.notes or '',
+            'is_void': item.is_void,
+        }
+
+    def mark_item_void(self, item_id):
+        """Flag an item as void in the snapshot. Returns True if it was on this order."""
+        for entry in self.items_snapshot:
+            if int(entry['id']) == int(item_id):
+                entry['is_void'] = True
+                self.save(update_fields=['items_snapshot'])
+                return True
+        return False
+
     def get_batch_items(self):
-        """Get BillItems for this batch, filtered by item_ids.
-        Handles type comparison safely (JSONField int vs model id)."""
-        items = self.bill.items.all()
+        """Get non-void items for this batch as snapshot dicts.
+        Reads items_snapshot; orders created before it existed fall back to
+        BillItems filtered by item_ids (JSONField int vs model id) or station."""
+        if self.items_snapshot:
+            return [entry for entry in self.items_snapshot if not entry.get('is_void')]
+
+        items = self.bill.items.select_related('product')
         if self.item_ids:
             id_set = set(int(i) for i in self.item_ids)
-            return [item for item in items if item.id in id_set and not item.is_void]
-        # Fallback for orders without item_ids: filter by station
-        return [item for item in items if not item.is_void and (item.printer_target or 'kitchen') == self.station]
+            items = [item for item in items if item.id in id_set and not item.is_void]
+        else:
+            # Fallback for orders without item_ids: filter by station
+            items = [item for item in items if not item.is_void and (item.printer_target or 'kitchen') == self.station]
+        return [self.snapshot_item(item) for item in items]
 
     def get_elapsed_time(self):
         """Get elapsed time since order created (in seconds)"""
@@ -334,6 +365,22 @@ class KitchenTicket(models.Model):
     
     # Printer used
     printer_ip = models.CharField(max_length=255, null=True, blank=True, help_text='Printer that processed this ticket')
+
+    # Agent claim lease (multiple agents share the queue via FOR UPDATE SKIP LOCKED)
+    claimed_by = models.CharField(max_length=100, blank=True, help_text='Kitchen agent holding the print lease')
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Lease expiry - expired printing tickets are reclaimed by any agent'
+    )
+    
+    # Pre-rendered ESC/POS bytes (see ticket_renderer) - agent streams these as-is
+    rendered_payload = models.BinaryField(null=True, blank=True, editable=False)
+    rendered_profile = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text='Printer brand/chars per line the payload was rendered for, e.g. HRPT/42'
+    )
     
     # Error tracking
     error_message = models.TextField(blank=True)
@@ -361,6 +408,7 @@ class KitchenTicket(models.Model):
             models.Index(fields=['brand', 'printer_target']),
             models.Index(fields=['printer_target', 'status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['status', 'lease_expires_at']),
         ]
     
     def __str__(self):
@@ -382,14 +430,24 @@ class KitchenTicket(models.Model):
         self.status = 'printed'
         self.printed_at = timezone.now()
         self.error_message = ''
-        self.save(update_fields=['status', 'printed_at', 'error_message'])
+        self.lease_expires_at = None
+        self.save(update_fields=['status', 'printed_at', 'error_message', 'lease_expires_at'])
     
     def mark_failed(self, error_message):
         """Mark ticket as failed"""
         self.status = 'failed'
         self.error_message = error_message
         self.last_error_at = timezone.now()
-        self.save(update_fields=['status', 'error_message', 'last_error_at'])
+        self.lease_expires_at = None
+        self.save(update_fields=['status', 'error_message', 'last_error_at', 'lease_expires_at'])
+
+    def is_lease_expired(self):
+        """True if an agent claimed this ticket but its lease has run out"""
+        return (
+            self.status == 'printing'
+            and self.lease_expires_at is not None
+            and self.lease_expires_at < timezone.now()
+        )
 
 
 class KitchenTicketItem(models.Model):
@@ -489,7 +547,23 @@ class KitchenTicketLog(models.Model):
         Convenience method to create log entries
         Usage: KitchenTicketLog.log_action(ticket, 'print_success', 'printer_service', ...)
         """
-        return cls.objects.create(
+        entry = cls.build_action(
+            ticket, action, actor, old_status=old_status, new_status=new_status,
+            printer_ip=printer_ip, error_code=error_code, error_message=error_message,
+            duration_ms=duration_ms, metadata=metadata
+        )
+        entry.save()
+        return entry
+
+    @classmethod
+    def build_action(cls, ticket, action, actor, old_status='', new_status='',
+                     printer_ip=None, error_code='', error_message='',
+                     duration_ms=None, metadata=None):
+        """
+        Unsaved log entry for bulk_create (same defaults as log_action)
+        Usage: KitchenTicketLog.objects.bulk_create([KitchenTicketLog.build_action(...), ...])
+        """
+        return cls(
             ticket=ticket,
             action=action,
             actor=actor,
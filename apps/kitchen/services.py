@@ -1,12 +1,117 @@
 ﻿"""Kitchen services for printing and KDS operations"""
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
 from .models import KitchenOrder, KitchenTicket, KitchenTicketItem, KitchenTicketLog
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def notify_kitchen_agents(tickets):
+    """
+    Wake up kitchen printer agents via Postgres LISTEN/NOTIFY.
+
+    Agents LISTEN on settings.KITCHEN_NOTIFY_CHANNEL and only fall back to
+    slow polling when no notification arrives. NOTIFY is transactional, so
+    when called inside an atomic block it is delivered on commit only.
+    No-op on non-Postgres databases (e.g. SQLite dev setup).
+
+    Args:
+        tickets: Iterable of KitchenTicket instances just created
+    """
+    tickets = list(tickets)
+    if not tickets or connection.vendor != 'postgresql':
+        return
+
+    channel = getattr(settings, 'KITCHEN_NOTIFY_CHANNEL', 'kitchen_tickets')
+    payload = json.dumps({
+        'ticket_ids': [t.id for t in tickets],
+        'stations': sorted({t.printer_target for t in tickets}),
+        'brand_id': str(tickets[0].brand_id) if tickets[0].brand_id else None,
+    })
+
+    try:
+        # Savepoint: a failed NOTIFY must not abort the caller's transaction
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [channel, payload])
+    except Exception as e:
+        # Agents still pick tickets up on their safety-net poll
+        logger.warning(f"Kitchen agent NOTIFY failed: {e}")
+
+
+def notify_kitchen_config_changed(brand_id=None):
+    """
+    Tell kitchen printer agents to drop cached printer routing/templates.
+
+    Agents cache StationPrinter rows and checker/kitchen templates per
+    (station_code, brand_id) with a TTL; this NOTIFY (sent on the same
+    channel as new tickets) makes edits take effect immediately.
+    No-op on non-Postgres databases.
+
+    Args:
+        brand_id: Brand whose printers/templates changed, or None to
+            invalidate every brand (company-wide templates, brand moves)
+    """
+    if connection.vendor != 'postgresql':
+        return
+
+    channel = getattr(settings, 'KITCHEN_NOTIFY_CHANNEL', 'kitchen_tickets')
+    payload = json.dumps({
+        'event': 'config_changed',
+        'brand_id': str(brand_id) if brand_id else None,
+    })
+
+    try:
+        # Savepoint: a failed NOTIFY must not abort the caller's transaction
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [channel, payload])
+    except Exception as e:
+        # Agents pick the change up when their cache TTL expires
+        logger.warning(f"Kitchen config NOTIFY failed: {e}")
+
+
+
+def prerender_kitchen_tickets(tickets, items_by_ticket):
+    """
+    Store the final ESC/POS payload on new tickets (KITCHEN_PRERENDER_TICKETS).
+
+    The agent then streams rendered_payload instead of formatting at print
+    time. Failures are logged only - the agent renders unrendered tickets.
+
+    Args:
+        tickets: KitchenTicket instances just created (same bill)
+        items_by_ticket: {ticket.id: [BillItem, ...]}
+    """
+    if not tickets or not getattr(settings, 'KITCHEN_PRERENDER_TICKETS', True):
+        return
+
+    from .ticket_renderer import prerender_tickets
+    try:
+        # Savepoint: a failed render must not break the caller's transaction
+        with transaction.atomic():
+            count = prerender_tickets(tickets, items_by_ticket)
+        logger.info(f"Pre-rendered {count}/{len(tickets)} kitchen ticket payload(s)")
+    except Exception as e:
+        logger.warning(f"Kitchen ticket pre-render failed, agent will render: {e}")
+
+
+def group_items_by_station(items):
+    """
+    Group bill items by printer_target, falling back to 'kitchen'.
+
+    Args:
+        items: Iterable (or queryset) of BillItem
+
+    Returns:
+        dict: {station_code: [BillItem, ...]} in first-seen order
+    """
+    items_by_station = {}
+    for item in items:
+        items_by_station.setdefault(item.printer_target or 'kitchen', []).append(item)
+    return items_by_station
+
 
 def create_kitchen_orders_for_items(bill, item_ids=None):
     """
@@ -27,31 +132,94 @@ def create_kitchen_orders_for_items(bill, item_ids=None):
     if item_ids is not None:
         items_query = items_query.filter(id__in=item_ids)
 
-    # Group item IDs by station
-    station_items = {}
-    for item in items_query:
-        station = item.printer_target or 'kitchen'
-        if station not in station_items:
-            station_items[station] = []
-        station_items[station].append(item.id)
+    # Group items by station in one query (product name goes into the snapshot)
+    station_items = group_items_by_station(items_query.select_related('product').order_by('id'))
 
     if not station_items:
         return []
 
-    kitchen_orders = []
-    for station, ids in station_items.items():
-        ko = KitchenOrder.objects.create(
+    # One INSERT for all stations; KDS cards render from items_snapshot
+    kitchen_orders = KitchenOrder.objects.bulk_create([
+        KitchenOrder(
             bill=bill,
             station=station,
             status='new',
-            item_ids=ids,
+            item_ids=[item.id for item in items],
+            items_snapshot=[KitchenOrder.snapshot_item(item) for item in items],
         )
-        kitchen_orders.append(ko)
-        logger.info(f"KDS order #{ko.id} for {station.upper()}: {len(ids)} items")
+        for station, items in station_items.items()
+    ])
+    for ko in kitchen_orders:
+        logger.info(f"KDS order #{ko.id} for {ko.station.upper()}: {len(ko.item_ids)} items")
 
     return kitchen_orders
 
 
+# ============================================================================
+# KDS PUSH (WebSocket diffs via KDSConsumer)
+# ============================================================================
+
+KDS_VISIBLE_STATUSES = ('new', 'preparing', 'ready')
+
+
+def push_kds_update(order, event):
+    """
+    Push one KitchenOrder change to KDS tablets of its brand.
+
+    Sends the re-rendered card so tablets patch their columns in place
+    instead of polling kds_orders. An empty 'html' means the card should be
+    removed (served, or every item voided). Non-blocking: failures are
+    logged and tablets catch up on their next resync.
+
+    Args:
+        order: KitchenOrder instance (bill loaded or loadable)
+        event: 'new', 'started', 'ready', 'bumped', 'priority' or 'item_voided'
+    """
+    try:
+        from channels.layers import get_channel_layer
+        from asgiref.sync import async_to_sync
+        from django.template.loader import render_to_string
+
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            return
+
+        html = ''
+        if order.status in KDS_VISIBLE_STATUSES and order.get_batch_items():
+            html = render_to_string('kitchen/partials/kds_order_card.html', {'order': order})
+
+        async_to_sync(channel_layer.group_send)(
+            f"kds_{order.bill.brand_id}",
+            {
+                'type': 'kds_update',
+                'event': event,
+                'order_id': order.id,
+                'station': order.station,
+                'status': order.status,
+                'priority': order.priority,
+                'html': html,
+            }
+        )
+    except Exception as e:
+        logger.warning(f"KDS push for order #{order.id} ({event}) failed: {e}")
+
+
+def push_kds_item_voided(bill, item_id):
+    """
+    Mark a voided item in open KDS orders' snapshots and re-push their cards.
+
+    Args:
+        bill: Bill instance
+        item_id: ID of the BillItem that was voided
+    """
+    orders = KitchenOrder.objects.filter(bill=bill, status__in=KDS_VISIBLE_STATUSES)
+    for order in orders:
+        if int(item_id) in {int(i) for i in (order.item_ids or [])}:
+            order.mark_item_void(item_id)
+            order.bill = bill
+            push_kds_update(order, 'item_voided')
+
+
 # ============================================================================
 # KITCHEN PRINTER SERVICE FUNCTIONS
 # ============================================================================
@@ -80,120 +248,76 @@ def create_kitchen_tickets(bill, item_ids=None):
     """
     logger.info(f"Creating kitchen tickets for bill #{bill.bill_number}")
     
-    # Group items by printer_target
-    items_by_station = {}
-    
-    # Filter items - if item_ids provided, use only those items
-    items_query = bill.items.filter(is_void=False).exclude(printer_target='').exclude(printer_target='none')
+    # Group items by printer_target (one query, product loaded for pre-render)
+    items_query = bill.items.filter(is_void=False).exclude(printer_target='').exclude(printer_target='none').select_related('product')
     if item_ids is not None:
         items_query = items_query.filter(id__in=item_ids)
         logger.info(f"Filtering for specific {len(item_ids)} item(s)")
     
-    for item in items_query:
-        # Use printer_target, fallback to 'kitchen' if empty
-        station = item.printer_target or 'kitchen'
-        
-        if station not in items_by_station:
-            items_by_station[station] = []
-        
-        items_by_station[station].append(item)
+    items_by_station = group_items_by_station(items_query)
     
     if not items_by_station:
         logger.warning(f"No items to print for bill #{bill.bill_number}")
         return []
     
-    tickets = []
-    
-    # Create 1 ticket per station
-    for station_code, items in items_by_station.items():
-        logger.info(f"Creating ticket for station '{station_code}' with {len(items)} items")
-        
-        ticket = KitchenTicket.objects.create(
-            bill=bill,
-            brand=bill.brand,
-            printer_target=station_code,
-            status='new'
-        )
-        
-        # Add items to ticket
-        for item in items:
-            KitchenTicketItem.objects.create(
-                kitchen_ticket=ticket,
-                bill_item=item,
-                quantity=item.quantity
-            )
-        
-        # Log creation
-        KitchenTicketLog.log_action(
-            ticket=ticket,
-            action='created',
-            actor='system',
-            old_status='',
-            new_status='new',
-            metadata={
-                'items_count': len(items),
-                'bill_number': bill.bill_number,
-                'bill_type': bill.bill_type,
-                'table': str(bill.table) if bill.table else None,
-            }
-        )
-        
-        tickets.append(ticket)
-        logger.info(f"✓ Created ticket #{ticket.id} for {station_code.upper()}")
-    
     # === CHECKER TICKET ===
-    # Create a checker ticket containing ALL items from ALL stations
-    # Only if a checker printer is configured for this brand
+    # A checker ticket containing ALL items from ALL stations is added
+    # only if a checker printer is configured for this brand
     from .models import StationPrinter
     has_checker_printer = StationPrinter.objects.filter(
         brand=bill.brand,
         station_code='checker',
         is_active=True
     ).exists()
-
+    
+    # 1 ticket per station (+ checker), inserted in one statement each for
+    # tickets, ticket items and logs instead of one INSERT per row
+    ticket_items = list(items_by_station.items())
     if has_checker_printer:
-        # Collect ALL items from all stations for checker
-        all_items = []
-        for items in items_by_station.values():
-            all_items.extend(items)
-
+        all_items = [item for items in items_by_station.values() for item in items]
         logger.info(f"Creating CHECKER ticket with ALL {len(all_items)} items")
-
-        checker_ticket = KitchenTicket.objects.create(
-            bill=bill,
-            brand=bill.brand,
-            printer_target='checker',
-            status='new'
-        )
-
-        for item in all_items:
-            KitchenTicketItem.objects.create(
-                kitchen_ticket=checker_ticket,
-                bill_item=item,
-                quantity=item.quantity
-            )
-
-        KitchenTicketLog.log_action(
-            ticket=checker_ticket,
+        ticket_items.append(('checker', all_items))
+    
+    tickets = KitchenTicket.objects.bulk_create([
+        KitchenTicket(bill=bill, brand=bill.brand, printer_target=station_code, status='new')
+        for station_code, _ in ticket_items
+    ])
+    
+    KitchenTicketItem.objects.bulk_create([
+        KitchenTicketItem(kitchen_ticket=ticket, bill_item=item, quantity=item.quantity)
+        for ticket, (_, items) in zip(tickets, ticket_items)
+        for item in items
+    ])
+    
+    logs = []
+    items_by_ticket = {}
+    for ticket, (station_code, items) in zip(tickets, ticket_items):
+        metadata = {
+            'items_count': len(items),
+            'bill_number': bill.bill_number,
+            'bill_type': bill.bill_type,
+            'table': str(bill.table) if bill.table else None,
+        }
+        if station_code == 'checker':
+            metadata['is_checker'] = True
+            metadata['stations_included'] = list(items_by_station.keys())
+        logs.append(KitchenTicketLog.build_action(
+            ticket=ticket,
             action='created',
             actor='system',
             old_status='',
             new_status='new',
-            metadata={
-                'items_count': len(all_items),
-                'bill_number': bill.bill_number,
-                'bill_type': bill.bill_type,
-                'table': str(bill.table) if bill.table else None,
-                'is_checker': True,
-                'stations_included': list(items_by_station.keys()),
-            }
-        )
-
-        tickets.append(checker_ticket)
-        logger.info(f"✓ Created CHECKER ticket #{checker_ticket.id} with {len(all_items)} items from {list(items_by_station.keys())}")
-
+            metadata=metadata
+        ))
+        items_by_ticket[ticket.id] = items
+        logger.info(f"✓ Created ticket #{ticket.id} for {station_code.upper()} with {len(items)} items")
+    KitchenTicketLog.objects.bulk_create(logs)
+    
     logger.info(f"Successfully created {len(tickets)} ticket(s) for bill #{bill.bill_number}")
 
+    prerender_kitchen_tickets(tickets, items_by_ticket)
+    notify_kitchen_agents(tickets)
+
     return tickets
 
 
@@ -261,12 +385,11 @@ def reprint_kitchen_ticket(ticket, actor):
         )
         
         # Copy items
-        for item in ticket.items.all():
-            KitchenTicketItem.objects.create(
-                kitchen_ticket=new_ticket,
-                bill_item=item.bill_item,
-                quantity=item.quantity
-            )
+        original_items = list(ticket.items.select_related('bill_item__product'))
+        KitchenTicketItem.objects.bulk_create([
+            KitchenTicketItem(kitchen_ticket=new_ticket, bill_item=item.bill_item, quantity=item.quantity)
+            for item in original_items
+        ])
         
         # Log reprint
         KitchenTicketLog.log_action(
@@ -282,5 +405,8 @@ def reprint_kitchen_ticket(ticket, actor):
         )
         
         logger.info(f"Created reprint ticket #{new_ticket.id} from #{ticket.id} by {actor}")
+
+        prerender_kitchen_tickets([new_ticket], {new_ticket.id: [item.bill_item for item in original_items]})
+        notify_kitchen_agents([new_ticket])
         
         return new_ticket
@@ -0,0 +1,285 @@
+"""
+Kitchen Ticket Renderer
+Builds the final ESC/POS byte payload for kitchen/checker tickets on the
+Django side, so the Kitchen Printer Agent only has to stream bytes.
+
+Output must stay byte-identical to PrinterInterface._format_ticket /
+_format_checker_ticket in kitchen_printer_agent/kitchen_agent.py. Ticket
+times are printed in local time (TIME_ZONE here, the agent's "timezone"
+setting there), so both must name the same zone.
+"""
+import logging
+from typing import Optional, Dict, List
+
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+# ESC/POS command sets per printer brand (mirror of agent PrinterProfile classes)
+HRPT_PROFILE = {
+    'init': b'\x1b@',
+    'normal_font': b'\x1d!\x00',
+    'double_font': b'\x1d!\x11',
+    'center': b'\x1ba\x01',
+    'left': b'\x1ba\x00',
+    'feed_and_cut': b'\n\n\n' + b'\x1bd\x03' + b'\x1bB\x02\x02' + b'\x1dV\x00',
+}
+
+EPSON_PROFILE = {
+    'init': b'\x1b@',
+    'normal_font': b'\x1b!\x00',
+    'double_font': b'\x1b!\x30',
+    'center': b'\x1ba\x01',
+    'left': b'\x1ba\x00',
+    'feed_and_cut': b'\n\n\n' + b'\x1dV\x00',
+}
+
+PRINTER_PROFILES = {
+    'HRPT': HRPT_PROFILE,
+    'EPSON': EPSON_PROFILE,
+    'XPRINTER': EPSON_PROFILE,  # XPrinter uses Epson commands
+}
+
+
+def profile_signature(printer_brand: str, chars_per_line: int) -> str:
+    """
+    Identify the printer profile + paper width a payload was rendered for.
+    The agent only uses a stored payload when its current printer matches.
+    """
+    return f"{(printer_brand or 'HRPT').upper()}/{chars_per_line}"
+
+
+def build_ticket_context(ticket, items) -> Dict:
+    """
+    Build the ticket dict the agent gets from claim_pending_tickets
+
+    Args:
+        ticket: KitchenTicket instance (bill/table already loaded)
+        items: BillItem instances on this ticket (product already loaded)
+    """
+    bill = ticket.bill
+    return {
+        'bill_number': bill.bill_number,
+        'table_number': bill.table.number if bill.table else 'N/A',
+        'customer_name': bill.customer_name or '',
+        'printer_target': ticket.printer_target,
+        'created_at': timezone.localtime(ticket.created_at).strftime('%Y-%m-%d %H:%M:%S'),
+        'items': [
+            {
+                'quantity': item.quantity,
+                'product_name': item.product.name,
+                'notes': item.notes or '',
+                'station': item.printer_target or '',
+            }
+            for item in sorted(items, key=lambda i: i.id)
+        ],
+    }
+
+
+def render_kitchen_ticket(ticket: Dict, profile: Dict, chars_per_line: int = 42, tmpl=None) -> bytes:
+    """Render a station ticket (tmpl: KitchenTicketTemplate or None)"""
+    data = bytearray()
+    sep = b'=' * chars_per_line + b'\n'
+    dash_sep = b'-' * chars_per_line + b'\n'
+
+    # Template values with fallback defaults
+    header1 = (tmpl.header_line_1 if tmpl else None) or 'KITCHEN TICKET'
+    header2 = (tmpl.header_line_2 if tmpl else None) or ''
+    footer1 = (tmpl.footer_line_1 if tmpl else None) or ''
+    footer2 = (tmpl.footer_line_2 if tmpl else None) or ''
+    show_bill = tmpl.show_bill_number if tmpl else True
+    show_table = tmpl.show_table_number if tmpl else True
+    show_customer = tmpl.show_customer_name if tmpl else True
+    show_station = tmpl.show_station_name if tmpl else True
+    show_datetime = tmpl.show_date_time if tmpl else True
+    show_qty = tmpl.show_item_qty if tmpl else True
+    show_notes = tmpl.show_item_notes if tmpl else True
+    feed_lines = tmpl.feed_lines if tmpl else 3
+
+    # Header - Center aligned, double size
+    data.extend(profile['init'])
+    data.extend(profile['center'])
+    data.extend(profile['double_font'])
+    data.extend(header1.encode('utf-8') + b'\n')
+    data.extend(profile['normal_font'])
+    if header2:
+        data.extend(header2.encode('utf-8') + b'\n')
+    data.extend(sep)
+
+    # Ticket info - Left aligned
+    data.extend(profile['left'])
+    if show_bill:
+        data.extend(f"Bill     : {ticket['bill_number']}\n".encode('utf-8'))
+    if show_table:
+        data.extend(f"Table    : {ticket.get('table_number', 'N/A')}\n".encode('utf-8'))
+    if show_customer and ticket.get('customer_name'):
+        data.extend(f"Customer : {ticket['customer_name']}\n".encode('utf-8'))
+    if show_station:
+        data.extend(f"Station  : {ticket['printer_target'].upper()}\n".encode('utf-8'))
+    if show_datetime:
+        data.extend(f"Time     : {ticket['created_at']}\n".encode('utf-8'))
+
+    data.extend(b'\n')
+    data.extend(dash_sep)
+
+    # Items
+    for item in ticket['items']:
+        qty_str = f"{item['quantity']}x " if show_qty else ''
+        data.extend(f"{qty_str}{item['product_name']}\n".encode('utf-8'))
+        if show_notes and item.get('notes'):
+            data.extend(f"   Note: {item['notes']}\n".encode('utf-8'))
+
+    # Footer
+    data.extend(b'\n')
+    data.extend(sep)
+    data.extend(profile['center'])
+    if footer1:
+        data.extend(footer1.encode('utf-8') + b'\n')
+    elif not tmpl:
+        # Default footer when no template
+        data.extend(f"Printer: {ticket['printer_target']}\n".encode('utf-8'))
+    if footer2:
+        data.extend(footer2.encode('utf-8') + b'\n')
+
+    # Feed and cut
+    data.extend(b'\n' * feed_lines)
+    data.extend(profile['feed_and_cut'])
+
+    return bytes(data)
+
+
+def render_checker_ticket(ticket: Dict, profile: Dict, chars_per_line: int = 42, tmpl=None) -> bytes:
+    """Render a checker ticket with all items (tmpl: CheckerTemplate or None)"""
+    data = bytearray()
+    sep = b'=' * chars_per_line + b'\n'
+    dash_sep = b'-' * chars_per_line + b'\n'
+
+    # Template defaults
+    header1 = (tmpl.header_line_1 if tmpl else None) or 'CHECKER'
+    header2 = (tmpl.header_line_2 if tmpl else None) or 'Cek item sebelum disajikan'
+    footer1 = (tmpl.footer_line_1 if tmpl else None) or 'CEK SEMUA ITEM SEBELUM DISAJIKAN'
+    footer2 = (tmpl.footer_line_2 if tmpl else None) or ''
+    show_bill = tmpl.show_bill_number if tmpl else True
+    show_table = tmpl.show_table_number if tmpl else True
+    show_datetime = tmpl.show_date_time if tmpl else True
+    show_station = tmpl.show_station_label if tmpl else True
+    show_notes = tmpl.show_item_notes if tmpl else True
+    show_qty = tmpl.show_item_qty if tmpl else True
+    show_checkbox = tmpl.show_checkbox if tmpl else True
+    feed_lines = tmpl.feed_lines if tmpl else 3
+
+    # Header
+    data.extend(profile['init'])
+    data.extend(profile['center'])
+    data.extend(profile['double_font'])
+    data.extend(header1.encode('utf-8') + b'\n')
+    data.extend(profile['normal_font'])
+    data.extend(header2.encode('utf-8') + b'\n')
+    data.extend(sep)
+
+    # Bill info
+    data.extend(profile['left'])
+    if show_bill:
+        data.extend(f"Bill     : {ticket['bill_number']}\n".encode('utf-8'))
+    if show_table:
+        data.extend(f"Table    : {ticket.get('table_number', 'N/A')}\n".encode('utf-8'))
+    if show_datetime:
+        data.extend(f"Time     : {ticket['created_at']}\n".encode('utf-8'))
+
+    data.extend(b'\n')
+    data.extend(dash_sep)
+    data.extend(b'\n')
+
+    # Items with checkboxes
+    for item in ticket['items']:
+        notes = item.get('notes', '')
+        station = item.get('station', '')
+        prefix = '[ ]  ' if show_checkbox else '  '
+        qty_str = f"{item['quantity']}x " if show_qty else ''
+        station_str = f" [{station.upper()}]" if (show_station and station) else ''
+        data.extend(f"{prefix}{qty_str}{item['product_name']}{station_str}\n".encode('utf-8'))
+        if show_notes and notes:
+            data.extend(f"     {notes}\n".encode('utf-8'))
+        data.extend(b'\n')
+
+    # Footer
+    data.extend(dash_sep)
+    data.extend(profile['center'])
+    data.extend(f"Total Items: {len(ticket['items'])}\n".encode('utf-8'))
+    data.extend(sep)
+    if footer1:
+        data.extend(footer1.encode('utf-8') + b'\n')
+    if footer2:
+        data.extend(footer2.encode('utf-8') + b'\n')
+
+    # Feed extra lines and cut
+    data.extend(b'\n' * feed_lines)
+    data.extend(profile['feed_and_cut'])
+
+    return bytes(data)
+
+
+def get_active_template(model, brand_id):
+    """Brand-specific active template first, then company-wide (brand NULL)"""
+    candidates = model.objects.filter(Q(brand_id=brand_id) | Q(brand__isnull=True), is_active=True)
+    templates = list(candidates)
+    for tmpl in templates:
+        if tmpl.brand_id == brand_id:
+            return tmpl
+    return templates[0] if templates else None
+
+
+def prerender_tickets(tickets: List, items_by_ticket: Dict) -> int:
+    """
+    Render and store ESC/POS payloads for freshly created tickets.
+
+    Uses the same printer routing as the agent (active StationPrinter with
+    lowest priority for station + brand). Tickets whose station has no
+    printer are left unrendered - the agent reports those as failed.
+
+    Args:
+        tickets: KitchenTicket instances of one bill (same brand)
+        items_by_ticket: {ticket.id: [BillItem, ...]}
+
+    Returns:
+        int: Number of tickets rendered
+    """
+    from .models import StationPrinter, KitchenTicket, KitchenTicketTemplate, CheckerTemplate
+
+    if not tickets:
+        return 0
+
+    brand_id = tickets[0].brand_id
+    printers = {}
+    for printer in StationPrinter.objects.filter(
+        brand_id=brand_id,
+        station_code__in={t.printer_target for t in tickets},
+        is_active=True
+    ).order_by('priority'):
+        printers.setdefault(printer.station_code, printer)
+
+    templates = {}
+    rendered = []
+    for ticket in tickets:
+        printer = printers.get(ticket.printer_target)
+        if not printer:
+            continue
+
+        is_checker = ticket.printer_target == 'checker'
+        template_model = CheckerTemplate if is_checker else KitchenTicketTemplate
+        if template_model not in templates:
+            templates[template_model] = get_active_template(template_model, brand_id)
+
+        profile = PRINTER_PROFILES.get((printer.printer_brand or 'HRPT').upper(), HRPT_PROFILE)
+        renderer = render_checker_ticket if is_checker else render_kitchen_ticket
+        context = build_ticket_context(ticket, items_by_ticket.get(ticket.id, []))
+
+        ticket.rendered_payload = renderer(context, profile, printer.chars_per_line, templates[template_model])
+        ticket.rendered_profile = profile_signature(printer.printer_brand, printer.chars_per_line)
+        rendered.append(ticket)
+
+    if rendered:
+        KitchenTicket.objects.bulk_update(rendered, ['rendered_payload', 'rendered_profile'])
+    return len(rendered)
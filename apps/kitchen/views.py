@@ -10,7 +10,12 @@ from datetime import timedelta
 from decimal import Decimal
 import json
 
+from apps.core.hotpath_log import get_hot_logger
+
 from .models import KitchenOrder, KitchenPerformance, KitchenStation, StationPrinter
+from .services import notify_kitchen_config_changed, push_kds_update
+
+hotlog = get_hot_logger(__name__)
 
 
 def trigger_client_event(response, event_name, data=None):
@@ -33,7 +38,7 @@ def kds_screen(request, station='kitchen'):
         bill__brand=request.user.brand,
         station=station,
         status__in=['new', 'preparing']
-    ).select_related('bill', 'bill__table').prefetch_related('bill__items')
+    ).select_related('bill', 'bill__table')
     
     # Get station config
     station_config = KitchenStation.objects.filter(
@@ -49,13 +54,11 @@ def kds_screen(request, station='kitchen'):
             date=timezone.now().date()
         ).first()
     except Exception as e:
-        print(f"Error loading KitchenPerformance: {e}")
+        hotlog.warning('kds.performance_load_failed', station=station, error=e)
         today_performance = None
     
-    print(f"DEBUG KDS: User Brand: {request.user.brand}, Station: {station}, Orders count: {orders.count()}")
-    if orders.exists():
-        for order in orders:
-            print(f"  - Order {order.id}: Bill {order.bill.bill_number}, Status {order.status}")
+    hotlog.debug('kds.screen', brand=request.user.brand_id, station=station)
+    hotlog.dump('kds.order', lambda: [(o.id, o.bill.bill_number, o.status) for o in orders])
     
     return render(request, 'kitchen/kds.html', {
         'orders': orders,
@@ -88,7 +91,7 @@ def kds_orders(request, station='kitchen'):
         query = query.filter(status__in=['new', 'preparing'])
     
     # Order by priority and time (oldest first for better queue management)
-    orders = query.select_related('bill', 'bill__table').prefetch_related('bill__items').order_by(
+    orders = query.select_related('bill', 'bill__table').order_by(
         '-priority',  # urgent/rush first
         'created_at'  # oldest first
     )
@@ -118,6 +121,8 @@ def kds_start(request, order_id):
         order.bill.items.filter(id__in=order.item_ids, status='sent').update(status='preparing')
     else:
         order.bill.items.filter(product__printer_target=order.station, status='sent').update(status='preparing')
+
+    push_kds_update(order, 'started')
     
     response = render(request, 'kitchen/partials/kds_order_card.html', {'order': order})
     return trigger_client_event(response, 'orderStarted')
@@ -140,6 +145,8 @@ def kds_ready(request, order_id):
     
     # Update performance metrics
     update_kitchen_performance(order)
+
+    push_kds_update(order, 'ready')
     
     # Send WebSocket notification
     try:
@@ -177,6 +184,8 @@ def kds_bump(request, order_id):
     else:
         order.bill.items.filter(product__printer_target=order.station, status='ready').update(status='served')
 
+    push_kds_update(order, 'bumped')
+
     response = HttpResponse()
     response['HX-Trigger'] = 'orderBumped'
     return response
@@ -193,6 +202,7 @@ def set_priority(request, order_id):
     if priority in ['normal', 'rush', 'urgent']:
         order.priority = priority
         order.save()
+        push_kds_update(order, 'priority')
         
         return render(request, 'kitchen/partials/kds_order_card.html', {'order': order})
     
@@ -702,35 +712,19 @@ def kitchen_ticket_detail(request, ticket_id):
 @require_POST
 def ticket_reprint(request, ticket_id):
     """Reprint a kitchen ticket - creates new ticket with is_reprint flag"""
-    from .models import KitchenTicket, KitchenTicketItem, KitchenTicketLog
+    from .models import KitchenTicket, KitchenTicketLog
+    from .services import reprint_kitchen_ticket
     from django.contrib import messages
     
     try:
         # Get original ticket
         original_ticket = get_object_or_404(
-            KitchenTicket.objects.prefetch_related('items__bill_item'),
+            KitchenTicket.objects.select_related('bill__table', 'brand'),
             id=ticket_id
         )
         
-        # Create new ticket as reprint
-        reprint_ticket = KitchenTicket.objects.create(
-            bill=original_ticket.bill,
-            brand=original_ticket.brand or original_ticket.bill.brand,
-            printer_target=original_ticket.printer_target,
-            status='new',  # Will be picked up by kitchen agent
-            is_reprint=True,
-            original_ticket=original_ticket,
-            print_attempts=0,
-            max_retries=3
-        )
-        
-        # Copy all items from original ticket
-        for original_item in original_ticket.items.all():
-            KitchenTicketItem.objects.create(
-                kitchen_ticket=reprint_ticket,
-                bill_item=original_item.bill_item,
-                quantity=original_item.quantity
-            )
+        # New ticket with bulk-copied items, pre-rendered payload and agent NOTIFY
+        reprint_ticket = reprint_kitchen_ticket(original_ticket, request.user.username)
         
         # Log reprint action on original ticket
         KitchenTicketLog.log_action(
@@ -745,20 +739,6 @@ def ticket_reprint(request, ticket_id):
             }
         )
         
-        # Log creation of reprint ticket
-        KitchenTicketLog.log_action(
-            ticket=reprint_ticket,
-            action='created',
-            actor=request.user.username,
-            old_status='',
-            new_status='new',
-            metadata={
-                'original_ticket_id': original_ticket.id,
-                'is_reprint': True,
-                'items_count': reprint_ticket.items.count()
-            }
-        )
-        
         messages.success(
             request, 
             f'✓ Ticket #{original_ticket.id} berhasil di-reprint. Ticket baru: #{reprint_ticket.id}'
@@ -836,6 +816,7 @@ def printer_create(request):
                 printer_type=request.POST.get('printer_type', 'network'),
                 timeout_seconds=int(request.POST.get('timeout_seconds', 5)),
             )
+            notify_kitchen_config_changed(printer.brand_id)
             
             messages.success(request, f'✓ Printer "{printer.printer_name}" berhasil ditambahkan!')
             return redirect('kitchen:printer_manage')
@@ -865,6 +846,7 @@ def printer_edit(request, printer_id):
     
     if request.method == 'POST':
         try:
+            old_brand_id = printer.brand_id
             brand_id = request.POST.get('brand')
             printer.brand = get_object_or_404(Brand, id=brand_id)
             printer.station_code = request.POST.get('station_code').lower().strip()
@@ -879,6 +861,8 @@ def printer_edit(request, printer_id):
             printer.printer_type = request.POST.get('printer_type', 'network')
             printer.timeout_seconds = int(request.POST.get('timeout_seconds', 5))
             printer.save()
+            # Moving a printer between brands invalidates both - flush all
+            notify_kitchen_config_changed(printer.brand_id if printer.brand_id == old_brand_id else None)
             
             messages.success(request, f'✓ Printer "{printer.printer_name}" berhasil diupdate!')
             return redirect('kitchen:printer_manage')
@@ -905,7 +889,9 @@ def printer_delete(request, printer_id):
 
     if request.method == 'POST':
         printer_name = printer.printer_name
+        brand_id = printer.brand_id
         printer.delete()
+        notify_kitchen_config_changed(brand_id)
         # AJAX request → return JSON
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.content_type == 'application/json':
             return JsonResponse({
@@ -927,6 +913,7 @@ def printer_toggle_active(request, printer_id):
     printer = get_object_or_404(StationPrinter, id=printer_id)
     printer.is_active = not printer.is_active
     printer.save()
+    notify_kitchen_config_changed(printer.brand_id)
     
     return JsonResponse({
         'success': True,
@@ -1075,6 +1062,7 @@ def printer_setup_defaults(request):
                 existing_count += 1
         
         if created_count > 0:
+            notify_kitchen_config_changed(brand.id)
             message = f'✓ Successfully created {created_count} default printer(s)'
             if existing_count > 0:
                 message += f' ({existing_count} already existed)'
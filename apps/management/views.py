@@ -3080,7 +3080,7 @@ def sales_report(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     
-    today = timezone.now().date()
+    today = timezone.localdate()
     
     # Calculate date range based on period
     if period == 'today':
@@ -3109,47 +3109,38 @@ def sales_report(request):
         date_from = today
         date_to = today
     
-    # Get bills in date range
-    bills = Bill.objects.filter(
-        brand=Brand,
-        status='paid',
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to
+    # Paid bills per day from the sales rollups (raw bills only for today)
+    from apps.pos.models_rollup import SalesRollup
+    from apps.pos.rollups import report_rows
+    days = report_rows(
+        SalesRollup, Brand, date_from, date_to, ['business_date'],
+        ['bills', 'revenue', 'subtotal', 'discount', 'tax', 'service']
     )
+    days = sorted((day for day in days if day['bills']), key=lambda day: day['business_date'])
     
     # Calculate metrics
-    total_revenue = bills.aggregate(total=Sum('total'))['total'] or Decimal('0')
-    total_bills = bills.count()
+    total_revenue = sum((day['revenue'] for day in days), Decimal('0'))
+    total_bills = sum(day['bills'] for day in days)
     avg_bill = total_revenue / total_bills if total_bills > 0 else Decimal('0')
     
     # Subtotals breakdown
-    subtotal_sum = bills.aggregate(sum=Sum('subtotal'))['sum'] or Decimal('0')
-    discount_sum = bills.aggregate(sum=Sum('discount_amount'))['sum'] or Decimal('0')
-    tax_sum = bills.aggregate(sum=Sum('tax_amount'))['sum'] or Decimal('0')
-    service_sum = bills.aggregate(sum=Sum('service_charge'))['sum'] or Decimal('0')
+    subtotal_sum = sum((day['subtotal'] for day in days), Decimal('0'))
+    discount_sum = sum((day['discount'] for day in days), Decimal('0'))
+    tax_sum = sum((day['tax'] for day in days), Decimal('0'))
+    service_sum = sum((day['service'] for day in days), Decimal('0'))
     
     # Daily breakdown
-    from django.db.models.functions import TruncDate
-    daily_sales = bills.annotate(
-        date=TruncDate('created_at')
-    ).values('date').annotate(
-        revenue=Sum('total'),
-        count=Count('id')
-    ).order_by('date')
+    daily_sales = [
+        {'date': day['business_date'], 'revenue': day['revenue'], 'count': day['bills']}
+        for day in days
+    ]
     
     # Comparison with previous period
     period_days = (date_to - date_from).days + 1
     prev_start = date_from - timedelta(days=period_days)
     prev_end = date_from - timedelta(days=1)
     
-    prev_bills = Bill.objects.filter(
-        brand=Brand,
-        status='paid',
-        created_at__date__gte=prev_start,
-        created_at__date__lte=prev_end
-    )
-    
-    prev_revenue = prev_bills.aggregate(total=Sum('total'))['total'] or Decimal('0')
+    prev_revenue = report_rows(SalesRollup, Brand, prev_start, prev_end, [], ['revenue'])[0]['revenue'] or Decimal('0')
     revenue_growth = ((total_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else Decimal('0')
     
     context = {
@@ -3163,7 +3154,7 @@ def sales_report(request):
         'discount_sum': discount_sum,
         'tax_sum': tax_sum,
         'service_sum': service_sum,
-        'daily_sales': list(daily_sales),
+        'daily_sales': daily_sales,
         'prev_revenue': prev_revenue,
         'revenue_growth': revenue_growth,
     }
@@ -3179,7 +3170,7 @@ def products_report(request):
     
     # Get date range
     period = request.GET.get('period', 'week')
-    today = timezone.now().date()
+    today = timezone.localdate()
     
     if period == 'today':
         date_from = today
@@ -3190,55 +3181,53 @@ def products_report(request):
     else:
         date_from = today - timedelta(days=7)
     
-    # Top products by quantity
-    from apps.pos.models import BillItem
-    top_products_qty = BillItem.objects.filter(
-        bill__brand=Brand,
-        bill__status='paid',
-        bill__created_at__date__gte=date_from,
-        is_void=False
-    ).values(
-        'product__name',
-        'product__category__name'
-    ).annotate(
-        total_qty=Sum('quantity'),
-        total_revenue=Sum('total')
-    ).order_by('-total_qty')[:20]
-    
-    # Top products by revenue
-    top_products_revenue = BillItem.objects.filter(
-        bill__brand=Brand,
-        bill__status='paid',
-        bill__created_at__date__gte=date_from,
-        is_void=False
-    ).values(
-        'product__name',
-        'product__category__name'
-    ).annotate(
-        total_qty=Sum('quantity'),
-        total_revenue=Sum('total')
-    ).order_by('-total_revenue')[:20]
+    # Items sold per product from the product rollups (raw items only for today)
+    from apps.pos.models_rollup import ProductRollup
+    from apps.pos.rollups import report_rows
+    product_rows = report_rows(
+        ProductRollup, Brand, date_from, today, ['product_id', 'product_name', 'category_name'],
+        ['quantity', 'revenue']
+    )
+    
+    products = {}
+    categories = {}
+    for row in product_rows:
+        if not row['quantity']:
+            continue  # Only voided in this period
+        product = products.setdefault((row['product_name'], row['category_name']), {
+            'product__name': row['product_name'],
+            'product__category__name': row['category_name'],
+            'total_qty': 0,
+            'total_revenue': Decimal('0'),
+        })
+        product['total_qty'] += row['quantity']
+        product['total_revenue'] += row['revenue']
+        
+        category = categories.setdefault(row['category_name'], {
+            'product__category__name': row['category_name'],
+            'total_qty': 0,
+            'total_revenue': Decimal('0'),
+            'product_ids': set(),
+        })
+        category['total_qty'] += row['quantity']
+        category['total_revenue'] += row['revenue']
+        category['product_ids'].add(row['product_id'])
+    
+    # Top products by quantity / revenue
+    top_products_qty = sorted(products.values(), key=lambda p: p['total_qty'], reverse=True)[:20]
+    top_products_revenue = sorted(products.values(), key=lambda p: p['total_revenue'], reverse=True)[:20]
     
     # Category performance
-    category_performance = BillItem.objects.filter(
-        bill__brand=Brand,
-        bill__status='paid',
-        bill__created_at__date__gte=date_from,
-        is_void=False
-    ).values(
-        'product__category__name'
-    ).annotate(
-        total_qty=Sum('quantity'),
-        total_revenue=Sum('total'),
-        product_count=Count('product', distinct=True)
-    ).order_by('-total_revenue')
+    for category in categories.values():
+        category['product_count'] = len(category.pop('product_ids'))
+    category_performance = sorted(categories.values(), key=lambda c: c['total_revenue'], reverse=True)
     
     context = {
         'period': period,
         'date_from': date_from,
-        'top_products_qty': list(top_products_qty),
-        'top_products_revenue': list(top_products_revenue),
-        'category_performance': list(category_performance),
+        'top_products_qty': top_products_qty,
+        'top_products_revenue': top_products_revenue,
+        'category_performance': category_performance,
     }
     
     return render(request, 'management/reports/products.html', context)
@@ -3252,7 +3241,7 @@ def cashier_report(request):
     
     # Get date range
     period = request.GET.get('period', 'today')
-    today = timezone.now().date()
+    today = timezone.localdate()
     
     if period == 'today':
         date_from = today
@@ -3267,46 +3256,33 @@ def cashier_report(request):
         date_from = today
         date_to = today
     
-    # Cashier performance
-    cashier_stats = Bill.objects.filter(
-        brand=Brand,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to
-    ).values(
-        'created_by__username',
-        'created_by__first_name',
-        'created_by__last_name'
-    ).annotate(
-        total_bills=Count('id'),
-        paid_bills=Count('id', filter=Q(status='paid')),
-        cancelled_bills=Count('id', filter=Q(status='cancelled')),
-        total_revenue=Sum('total', filter=Q(status='paid')),
-        avg_bill=Avg('total', filter=Q(status='paid'))
-    ).order_by('-total_revenue')
-    
-    # Void items by cashier
-    from apps.pos.models import BillItem
-    void_stats = BillItem.objects.filter(
-        bill__brand=Brand,
-        bill__created_at__date__gte=date_from,
-        bill__created_at__date__lte=date_to,
-        is_void=True
-    ).values(
-        'bill__created_by__username'
-    ).annotate(
-        void_count=Count('id'),
-        void_amount=Sum('total')
+    # Bills and void items per cashier from the rollups (raw bills only for today)
+    from apps.pos.models_rollup import CashierRollup
+    from apps.pos.rollups import report_rows
+    cashier_rows = report_rows(
+        CashierRollup, Brand, date_from, date_to, ['user_id'],
+        ['bills', 'paid_bills', 'cancelled_bills', 'revenue', 'void_count', 'void_amount']
     )
+    users = User.objects.in_bulk([row['user_id'] for row in cashier_rows])
     
-    void_dict = {item['bill__created_by__username']: item for item in void_stats}
-    
-    # Merge void stats into cashier stats
     cashier_list = []
-    for cashier in cashier_stats:
-        username = cashier['created_by__username']
-        cashier['void_count'] = void_dict.get(username, {}).get('void_count', 0)
-        cashier['void_amount'] = void_dict.get(username, {}).get('void_amount', Decimal('0'))
-        cashier_list.append(cashier)
+    for row in cashier_rows:
+        user = users.get(row['user_id'])
+        if not row['bills'] or not user:
+            continue
+        cashier_list.append({
+            'created_by__username': user.username,
+            'created_by__first_name': user.first_name,
+            'created_by__last_name': user.last_name,
+            'total_bills': row['bills'],
+            'paid_bills': row['paid_bills'],
+            'cancelled_bills': row['cancelled_bills'],
+            'total_revenue': row['revenue'],
+            'avg_bill': row['revenue'] / row['paid_bills'] if row['paid_bills'] else None,
+            'void_count': row['void_count'],
+            'void_amount': row['void_amount'],
+        })
+    cashier_list.sort(key=lambda c: c['total_revenue'], reverse=True)
     
     context = {
         'period': period,
@@ -3326,7 +3302,7 @@ def payment_report(request):
     
     # Get date range
     period = request.GET.get('period', 'today')
-    today = timezone.now().date()
+    today = timezone.localdate()
     
     if period == 'today':
         date_from = today
@@ -3341,29 +3317,26 @@ def payment_report(request):
         date_from = today
         date_to = today
     
+    # Payments per day and method from the rollups (raw payments only for today)
+    from apps.pos.models_rollup import PaymentRollup
+    from apps.pos.rollups import report_rows
+    payment_rows = report_rows(
+        PaymentRollup, Brand, date_from, date_to, ['business_date', 'method'], ['count', 'amount']
+    )
+    
     # Payment method breakdown
-    payment_breakdown = Payment.objects.filter(
-        bill__brand=Brand,
-        bill__status='paid',
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to
-    ).values('method').annotate(
-        count=Count('id'),
-        total=Sum('amount')
-    ).order_by('-total')
+    methods = {}
+    for row in payment_rows:
+        method = methods.setdefault(row['method'], {'method': row['method'], 'count': 0, 'total': Decimal('0')})
+        method['count'] += row['count']
+        method['total'] += row['amount']
+    payment_breakdown = sorted(methods.values(), key=lambda m: m['total'], reverse=True)
     
     # Daily payment trends
-    from django.db.models.functions import TruncDate
-    daily_payments = Payment.objects.filter(
-        bill__brand=Brand,
-        bill__status='paid',
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to
-    ).annotate(
-        date=TruncDate('created_at')
-    ).values('date', 'method').annotate(
-        total=Sum('amount')
-    ).order_by('date', 'method')
+    daily_payments = sorted(
+        ({'date': row['business_date'], 'method': row['method'], 'total': row['amount']} for row in payment_rows),
+        key=lambda p: (p['date'], p['method'])
+    )
     
     # Calculate totals
     total_amount = sum(item['total'] for item in payment_breakdown)
@@ -3372,8 +3345,8 @@ def payment_report(request):
         'period': period,
         'date_from': date_from,
         'date_to': date_to,
-        'payment_breakdown': list(payment_breakdown),
-        'daily_payments': list(daily_payments),
+        'payment_breakdown': payment_breakdown,
+        'daily_payments': daily_payments,
         'total_amount': total_amount,
     }
     
@@ -3388,7 +3361,7 @@ def void_discount_report(request):
     
     # Get date range
     period = request.GET.get('period', 'week')
-    today = timezone.now().date()
+    today = timezone.localdate()
     
     if period == 'today':
         date_from = today
@@ -3399,63 +3372,55 @@ def void_discount_report(request):
     else:
         date_from = today - timedelta(days=7)
     
-    # Void items analysis
-    from apps.pos.models import BillItem
-    void_items = BillItem.objects.filter(
-        bill__brand=Brand,
-        bill__created_at__date__gte=date_from,
-        is_void=True
-    ).select_related('product', 'bill__created_by')
-    
-    void_summary = void_items.aggregate(
-        count=Count('id'),
-        total_amount=Sum('total')
-    )
+    # Void items and bill discounts from the rollups (raw bills only for today)
+    from apps.pos.models_rollup import CashierRollup, DiscountRollup, ProductRollup
+    from apps.pos.rollups import report_rows
     
     # Void by product
-    void_by_product = void_items.values(
-        'product__name'
-    ).annotate(
-        count=Count('id'),
-        amount=Sum('total')
-    ).order_by('-count')[:10]
+    void_products = [
+        {'product__name': row['product_name'], 'count': row['void_count'], 'amount': row['void_amount']}
+        for row in report_rows(ProductRollup, Brand, date_from, today, ['product_name'], ['void_count', 'void_amount'])
+        if row['void_count']
+    ]
+    void_summary = {
+        'count': sum(row['count'] for row in void_products),
+        'total_amount': sum((row['amount'] for row in void_products), Decimal('0')),
+    }
+    void_by_product = sorted(void_products, key=lambda v: v['count'], reverse=True)[:10]
     
     # Void by cashier
-    void_by_cashier = void_items.values(
-        'bill__created_by__username'
-    ).annotate(
-        count=Count('id'),
-        amount=Sum('total')
-    ).order_by('-count')
-    
-    # Discount analysis
-    bills_with_discount = Bill.objects.filter(
-        brand=Brand,
-        created_at__date__gte=date_from,
-        discount_amount__gt=0
+    void_cashiers = [
+        row for row in report_rows(CashierRollup, Brand, date_from, today, ['user_id'], ['void_count', 'void_amount'])
+        if row['void_count']
+    ]
+    usernames = dict(User.objects.filter(pk__in=[row['user_id'] for row in void_cashiers]).values_list('pk', 'username'))
+    void_by_cashier = sorted(
+        (
+            {'bill__created_by__username': usernames.get(row['user_id']), 'count': row['void_count'], 'amount': row['void_amount']}
+            for row in void_cashiers
+        ),
+        key=lambda v: v['count'], reverse=True
     )
     
-    discount_summary = bills_with_discount.aggregate(
-        count=Count('id'),
-        total_discount=Sum('discount_amount')
+    # Discount by percent (bills with a bill-level discount)
+    discount_rows = report_rows(DiscountRollup, Brand, date_from, today, ['discount_percent'], ['bills', 'amount'])
+    discount_summary = {
+        'count': sum(row['bills'] for row in discount_rows),
+        'total_discount': sum((row['amount'] for row in discount_rows), Decimal('0')),
+    }
+    discount_breakdown = sorted(
+        ({'discount_percent': row['discount_percent'], 'count': row['bills'], 'total': row['amount']} for row in discount_rows),
+        key=lambda d: d['total'], reverse=True
     )
     
-    # Discount by type (if you have discount reason field)
-    discount_breakdown = bills_with_discount.values(
-        'discount_percent'
-    ).annotate(
-        count=Count('id'),
-        total=Sum('discount_amount')
-    ).order_by('-total')
-    
     context = {
         'period': period,
         'date_from': date_from,
         'void_summary': void_summary,
-        'void_by_product': list(void_by_product),
-        'void_by_cashier': list(void_by_cashier),
+        'void_by_product': void_by_product,
+        'void_by_cashier': void_by_cashier,
         'discount_summary': discount_summary,
-        'discount_breakdown': list(discount_breakdown),
+        'discount_breakdown': discount_breakdown,
     }
     
     return render(request, 'management/reports/void_discount.html', context)
@@ -3469,7 +3434,7 @@ def peak_hours_report(request):
     
     # Get date range
     period = request.GET.get('period', 'week')
-    today = timezone.now().date()
+    today = timezone.localdate()
     
     if period == 'today':
         date_from = today
@@ -3480,31 +3445,25 @@ def peak_hours_report(request):
     else:
         date_from = today - timedelta(days=7)
     
-    # Hourly sales distribution
-    from django.db.models.functions import ExtractHour
-    hourly_sales = Bill.objects.filter(
-        brand=Brand,
-        status='paid',
-        created_at__date__gte=date_from
-    ).annotate(
-        hour=ExtractHour('created_at')
-    ).values('hour').annotate(
-        count=Count('id'),
-        revenue=Sum('total')
-    ).order_by('hour')
-    
-    # Day of week analysis
-    from django.db.models.functions import ExtractWeekDay
-    daily_sales = Bill.objects.filter(
-        brand=Brand,
-        status='paid',
-        created_at__date__gte=date_from
-    ).annotate(
-        weekday=ExtractWeekDay('created_at')
-    ).values('weekday').annotate(
-        count=Count('id'),
-        revenue=Sum('total')
-    ).order_by('weekday')
+    # Paid bills per date and hour from the sales rollups (raw bills only for today)
+    from apps.pos.models_rollup import SalesRollup
+    from apps.pos.rollups import report_rows
+    hours = {}
+    weekdays = {}
+    for row in report_rows(SalesRollup, Brand, date_from, today, ['business_date', 'hour'], ['bills', 'revenue']):
+        if not row['bills']:
+            continue
+        # Hourly sales distribution
+        hour = hours.setdefault(row['hour'], {'hour': row['hour'], 'count': 0, 'revenue': Decimal('0')})
+        hour['count'] += row['bills']
+        hour['revenue'] += row['revenue']
+        # Day of week analysis (ExtractWeekDay numbering: 1 = Sunday)
+        weekday_number = row['business_date'].isoweekday() % 7 + 1
+        weekday = weekdays.setdefault(weekday_number, {'weekday': weekday_number, 'count': 0, 'revenue': Decimal('0')})
+        weekday['count'] += row['bills']
+        weekday['revenue'] += row['revenue']
+    hourly_sales = [hours[hour] for hour in sorted(hours)]
+    daily_sales = [weekdays[weekday] for weekday in sorted(weekdays)]
     
     # Map weekday numbers to names
     weekday_names = {
@@ -3523,7 +3482,7 @@ def peak_hours_report(request):
     context = {
         'period': period,
         'date_from': date_from,
-        'hourly_sales': list(hourly_sales),
+        'hourly_sales': hourly_sales,
         'daily_sales': daily_sales_list,
         'peak_hour': peak_hour,
     }
@@ -4337,6 +4296,7 @@ def import_condiment_groups_process(request):
 def import_excel_reset(request):
     """Reset all products, categories, and modifiers"""
     from apps.core.models import Modifier, ModifierOption
+    from apps.pos.catalog import invalidate_catalog
     
     try:
         store_config = Store.get_current()
@@ -4364,6 +4324,9 @@ def import_excel_reset(request):
         # 5. Delete categories
         Category.objects.filter(brand=Brand).delete()
         
+        # Queryset deletes skip the model delete() hooks
+        invalidate_catalog(Brand.pk)
+        
         return JsonResponse({
             'success': True,
             'message': f'Successfully deleted {category_count} categories, {product_count} products, and {modifier_count} modifiers'
@@ -6124,7 +6087,7 @@ def stock_reset_all(request):
 
     count = StoreProductStock.objects.filter(
         brand_id__in=brand_ids, is_active=True
-    ).update(sold_qty=0, last_reset_date=timezone.now().date())
+    ).update(sold_qty=0, last_reset_date=timezone.now().date(), updated_at=timezone.now())
 
     messages.success(request, f'Daily reset complete: {count} products reset to full stock')
     return redirect('management:stock_management')
@@ -6806,6 +6769,7 @@ def checker_template_list(request):
 def checker_template_create(request):
     """Create new checker template"""
     from apps.kitchen.models import CheckerTemplate
+    from apps.kitchen.services import notify_kitchen_config_changed
 
     store_config, error_response = check_store_config(request, 'management/checker_template_form.html')
     if error_response:
@@ -6868,6 +6832,7 @@ def checker_template_create(request):
                     created_by=request.user
                 )
                 template.save()
+                notify_kitchen_config_changed()
                 messages.success(request, f'Checker template "{template_name}" created successfully')
                 return redirect('management:checker_template_list')
             except Exception as e:
@@ -6886,6 +6851,7 @@ def checker_template_create(request):
 def checker_template_edit(request, template_id):
     """Edit checker template"""
     from apps.kitchen.models import CheckerTemplate
+    from apps.kitchen.services import notify_kitchen_config_changed
 
     store_config, error_response = check_store_config(request, 'management/checker_template_form.html')
     if error_response:
@@ -6946,6 +6912,7 @@ def checker_template_edit(request, template_id):
                 template.feed_lines = int(feed_lines)
                 template.updated_by = request.user
                 template.save()
+                notify_kitchen_config_changed()
                 messages.success(request, f'Checker template "{template_name}" updated successfully')
                 return redirect('management:checker_template_list')
             except Exception as e:
@@ -6966,6 +6933,7 @@ def checker_template_edit(request, template_id):
 def checker_template_delete(request, template_id):
     """Delete checker template"""
     from apps.kitchen.models import CheckerTemplate
+    from apps.kitchen.services import notify_kitchen_config_changed
 
     store_config = Store.get_current()
     if not store_config:
@@ -6976,6 +6944,7 @@ def checker_template_delete(request, template_id):
         template = get_object_or_404(CheckerTemplate, id=template_id, company=store_config.company)
         template_name = template.template_name
         template.delete()
+        notify_kitchen_config_changed()
         messages.success(request, f'Checker template "{template_name}" deleted successfully')
     except Exception as e:
         messages.error(request, f'Error deleting template: {str(e)}')
@@ -6988,6 +6957,7 @@ def checker_template_delete(request, template_id):
 def checker_template_toggle(request, template_id):
     """Toggle checker template active status"""
     from apps.kitchen.models import CheckerTemplate
+    from apps.kitchen.services import notify_kitchen_config_changed
 
     store_config = Store.get_current()
     if not store_config:
@@ -6998,6 +6968,7 @@ def checker_template_toggle(request, template_id):
         template.is_active = not template.is_active
         template.updated_by = request.user
         template.save()
+        notify_kitchen_config_changed()
 
         status = 'activated' if template.is_active else 'deactivated'
         messages.success(request, f'Template "{template.template_name}" {status}!')
@@ -7052,6 +7023,7 @@ def kitchen_template_list(request):
 def kitchen_template_create(request):
     """Create new kitchen ticket template"""
     from apps.kitchen.models import KitchenTicketTemplate
+    from apps.kitchen.services import notify_kitchen_config_changed
 
     store_config, error_response = check_store_config(request, 'management/kitchen_template_form.html')
     if error_response:
@@ -7108,6 +7080,7 @@ def kitchen_template_create(request):
                     created_by=request.user
                 )
                 template.save()
+                notify_kitchen_config_changed()
                 messages.success(request, f'Kitchen template "{template_name}" created successfully')
                 return redirect('management:kitchen_template_list')
             except Exception as e:
@@ -7126,6 +7099,7 @@ def kitchen_template_create(request):
 def kitchen_template_edit(request, template_id):
     """Edit kitchen ticket template"""
     from apps.kitchen.models import KitchenTicketTemplate
+    from apps.kitchen.services import notify_kitchen_config_changed
 
     store_config, error_response = check_store_config(request, 'management/kitchen_template_form.html')
     if error_response:
@@ -7180,6 +7154,7 @@ def kitchen_template_edit(request, template_id):
                 template.feed_lines = int(feed_lines)
                 template.updated_by = request.user
                 template.save()
+                notify_kitchen_config_changed()
                 messages.success(request, f'Kitchen template "{template_name}" updated successfully')
                 return redirect('management:kitchen_template_list')
             except Exception as e:
@@ -7200,6 +7175,7 @@ def kitchen_template_edit(request, template_id):
 def kitchen_template_delete(request, template_id):
     """Delete kitchen ticket template"""
     from apps.kitchen.models import KitchenTicketTemplate
+    from apps.kitchen.services import notify_kitchen_config_changed
 
     store_config = Store.get_current()
     if not store_config:
@@ -7210,6 +7186,7 @@ def kitchen_template_delete(request, template_id):
         template = get_object_or_404(KitchenTicketTemplate, id=template_id, company=store_config.company)
         template_name = template.template_name
         template.delete()
+        notify_kitchen_config_changed()
         messages.success(request, f'Kitchen template "{template_name}" deleted successfully')
     except Exception as e:
         messages.error(request, f'Error deleting template: {str(e)}')
@@ -7222,6 +7199,7 @@ def kitchen_template_delete(request, template_id):
 def kitchen_template_toggle(request, template_id):
     """Toggle kitchen ticket template active status"""
     from apps.kitchen.models import KitchenTicketTemplate
+    from apps.kitchen.services import notify_kitchen_config_changed
 
     store_config = Store.get_current()
     if not store_config:
@@ -7232,6 +7210,7 @@ def kitchen_template_toggle(request, template_id):
         template.is_active = not template.is_active
         template.updated_by = request.user
         template.save()
+        notify_kitchen_config_changed()
 
         status = 'activated' if template.is_active else 'deactivated'
         messages.success(request, f'Template "{template.template_name}" {status}!')
@@ -0,0 +1,161 @@
+"""
+POS Catalog API - JSON catalog with version/ETag and delta sync
+
+Lets a terminal keep the product catalog locally and filter/search it
+without a round trip per category click:
+
+    GET /pos/api/catalog/
+        Full catalog (categories, products, stock) with an ETag.
+        Send If-None-Match to get 304 when nothing changed.
+
+    GET /pos/api/catalog/?since=<version>
+        Only what changed since a previous response's "version":
+        products (price, name, availability, photo), stock records and the
+        category tree (always complete, it is small).
+
+Deltas are based on Product/ProductPhoto/StoreProductStock.updated_at.
+Hard-deleted products can't be reported as a delta; clients compare their
+local count with "product_count" and fetch the full catalog on mismatch.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.decorators import login_required
+from django.db.models import Max
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from apps.core.minio_client import get_minio_endpoint_for_request
+
+from .catalog import get_catalog
+
+
+def _to_version(dt):
+    """Datetime -> version cursor (epoch milliseconds)"""
+    return int(dt.timestamp() * 1000)
+
+
+def _from_version(value):
+    """Version cursor -> aware datetime (ValueError if invalid)"""
+    return datetime.fromtimestamp(int(value) / 1000, tz=dt_timezone.utc)
+
+
+def serialize_category(category):
+    return {
+        'id': str(category.id),
+        'name': category.name,
+        'parent_id': str(category.parent_id) if category.parent_id else None,
+        'icon': category.icon,
+        'sort_order': category.sort_order,
+    }
+
+
+def serialize_product(product):
+    """Product card data; photo is the MinIO object path (prefix with minio_endpoint/minio_bucket)"""
+    photo = product.primary_photos[0] if product.primary_photos else None
+    return {
+        'id': str(product.id),
+        'name': product.name,
+        'sku': product.sku,
+        'price': str(product.price),
+        'category_id': str(product.category_id),
+        'parent_category_id': str(product.category.parent_id) if product.category.parent_id else None,
+        # Grid order: category sort_order, category name, product name
+        'sort_key': [product.category.sort_order, product.category.name, product.name],
+        'has_modifiers': product.has_modifiers,
+        'photo': f"{photo.object_key}?v={(photo.checksum or '')[:8]}" if photo and photo.object_key else None,
+        'image_url': product.image.url if product.image else None,
+        'updated_at': _to_version(product.updated_at),
+    }
+
+
+def serialize_stock(stock):
+    return {
+        'remaining': str(stock.remaining_stock),
+        'daily_stock': str(stock.daily_stock),
+        'is_out': stock.is_out_of_stock,
+        'is_low': stock.is_low_stock,
+    }
+
+
+@login_required
+@require_GET
+def catalog_api(request):
+    """Full catalog or delta since ?since=<version> for the user's brand"""
+    from apps.core.models import Product, ProductPhoto
+    from apps.pos.models import StoreProductStock
+
+    brand = request.user.brand
+    if not brand:
+        return JsonResponse({'error': 'User has no brand'}, status=400)
+
+    since = request.GET.get('since')
+    if since:
+        try:
+            since_dt = _from_version(since)
+        except (TypeError, ValueError, OverflowError):
+            return JsonResponse({'error': 'Invalid since version'}, status=400)
+    else:
+        since_dt = None
+
+    # Cursor taken before reading, so writes racing this request show up again next time
+    now = timezone.now()
+    catalog = get_catalog(brand)
+    stock_qs = StoreProductStock.objects.filter(brand=brand)
+
+    etag = None
+    if since_dt is None:
+        stock_mark = stock_qs.aggregate(last=Max('updated_at'))['last']
+        product_mark = max((p.updated_at for p in catalog.products), default=None)
+        etag = '"catalog-{}-{}-{}-{}"'.format(
+            catalog.brand_id,
+            '.'.join(str(v) for v in catalog.version),
+            _to_version(product_mark) if product_mark else 0,
+            _to_version(stock_mark) if stock_mark else 0,
+        )
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+    removed = []
+    if since_dt is None:
+        products = catalog.products
+        stocks = stock_qs.filter(is_active=True)
+        stock_removed = []
+    else:
+        changed_ids = {p.pk for p in catalog.products if p.updated_at > since_dt}
+        changed_ids.update(
+            ProductPhoto.objects.filter(
+                product__category__brand=brand, updated_at__gt=since_dt
+            ).values_list('product_id', flat=True)
+        )
+        products = [p for p in catalog.products if p.pk in changed_ids]
+        # Deactivated since then (no longer in the snapshot)
+        removed = [
+            str(pk) for pk in Product.objects.filter(
+                category__brand=brand, is_active=False, updated_at__gt=since_dt
+            ).values_list('pk', flat=True)
+        ]
+        changed_stock = list(stock_qs.filter(updated_at__gt=since_dt))
+        stocks = [s for s in changed_stock if s.is_active]
+        stock_removed = [str(s.product_id) for s in changed_stock if not s.is_active]
+
+    data = {
+        'brand_id': catalog.brand_id,
+        'version': _to_version(now),
+        'full': since_dt is None,
+        'minio_endpoint': get_minio_endpoint_for_request(request),
+        'minio_bucket': 'product-images',
+        'product_count': len(catalog.products),
+        'categories': [serialize_category(c) for c in catalog.categories],
+        'products': [serialize_product(p) for p in products],
+        'removed': removed,
+        'stock': {str(s.product_id): serialize_stock(s) for s in stocks},
+        'stock_removed': stock_removed,
+    }
+    response = JsonResponse(data)
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
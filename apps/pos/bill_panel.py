@@ -0,0 +1,99 @@
+"""
+Bill panel view-model
+
+The bill panel (pos/partials/bill_panel.html + bill_items.html) is the most
+frequently rendered POS fragment: every item tap re-renders it. BillPanel
+loads the bill with its table/brand and all items with their product in two
+queries. It then computes every flag the templates need in a single pass
+over the items.
+
+Used by render_bill_panel, pos_main, product_list and the item mutation views.
+"""
+from decimal import Decimal
+
+from django.db.models import Prefetch
+
+from .models import Bill, BillItem
+
+
+def bill_panel_queryset():
+    """Bills with everything the panel renders (2 queries per bill)"""
+    return Bill.objects.select_related('table', 'table__area', 'brand').prefetch_related(
+        Prefetch('items', queryset=BillItem.objects.select_related('product').order_by('id'))
+    )
+
+
+class BillPanel:
+    """
+    Everything the bill panel and product cards need, computed in one pass.
+
+    Attributes:
+        bill: Bill with table/brand loaded and items prefetched
+            (bill.items.all / bill.items.count hit the prefetch cache)
+        items: All items, including voided ones, ordered by id
+        active_items: Non-void items
+        pending_count: Non-void items not yet sent to kitchen
+        has_sent_items: Any non-void item already sent (non-pending status)
+        item_count: All items including voided (split button rule)
+        product_quantities: {product_id: qty} of pending non-void items
+        tax_rate / service_charge_rate: Brand percentages (cached store context)
+    """
+
+    def __init__(self, bill):
+        self.bill = bill
+        self.items = list(bill.items.all()) if bill else []
+        self.active_items = []
+        self.pending_count = 0
+        self.has_sent_items = False
+        self.product_quantities = {}
+
+        for item in self.items:
+            if item.is_void:
+                continue
+            self.active_items.append(item)
+            if item.status == 'pending':
+                self.pending_count += 1
+                self.product_quantities[item.product_id] = (
+                    self.product_quantities.get(item.product_id, 0) + item.quantity
+                )
+            else:
+                self.has_sent_items = True
+
+        self.item_count = len(self.items)
+        if bill:
+            self.tax_rate, self.service_charge_rate = bill.get_rates()
+        else:
+            self.tax_rate = self.service_charge_rate = Decimal('0')
+
+    def get_context(self):
+        """Template context for bill_panel.html (without store_config)"""
+        return {
+            'bill': self.bill,
+            'active_items_count': self.pending_count,
+            'has_sent_items': self.has_sent_items,
+            'bill_item_count': self.item_count,
+            'bill_items_dict': self.product_quantities,
+            'tax_rate': self.tax_rate,
+            'service_charge_rate': self.service_charge_rate,
+        }
+
+
+def build_bill_panel(bill, statuses=None):
+    """
+    Load a fresh BillPanel.
+
+    Args:
+        bill: Bill instance or bill id (None gives an empty panel)
+        statuses: Optional list of allowed bill statuses (e.g. ['open', 'hold']);
+            a bill outside them gives an empty panel
+
+    Returns:
+        BillPanel
+    """
+    if bill is None:
+        return BillPanel(None)
+    bill_id = bill.pk if isinstance(bill, Bill) else bill
+    queryset = bill_panel_queryset()
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return BillPanel(queryset.filter(id=bill_id).first())
@@ -0,0 +1,193 @@
+"""
+POS product catalog snapshot per brand
+
+pos_main and product_list used to rebuild the product queryset (category,
+parent, product_modifiers and primary photos) on every category switch and
+search keystroke. CatalogSnapshot loads a brand's catalog once per process:
+pre-sorted products with their primary photos, the category tree and modifier
+flags. Category filters and search run against in-memory indexes.
+
+Invalidation:
+- Category/Product/ProductPhoto/ProductModifier save() and delete() call
+  invalidate_catalog() (HO sync and management edits go through these);
+  the Excel import reset deletes by queryset and calls it directly
+- the bump runs on transaction commit, so no worker caches pre-commit data
+- version numbers in the shared Django cache (global + per brand) tell other
+  worker processes to rebuild on their next request
+- POS_CATALOG_TTL seconds as a safety net for queryset.update() writes
+
+Stock is not part of the snapshot - it changes on every send to kitchen.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Prefetch
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'pos:catalog_version'
+BRAND_VERSION_KEY = 'pos:catalog_version:{brand_id}'
+
+_lock = threading.Lock()
+_snapshots = {}  # str(brand_id) -> CatalogSnapshot
+
+
+class CatalogSnapshot:
+    """Read-only catalog of one brand. Product/Category instances must not be modified."""
+
+    def __init__(self, brand_id, categories, products, version):
+        self.brand_id = str(brand_id) if brand_id else None
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+        # Category tree (active categories, sort_order + name)
+        self.categories = categories
+        self.categories_by_id = {str(c.id): c for c in categories}
+        self.parent_categories = [c for c in categories if c.parent_id is None]
+        self.subcategories = {}
+        for category in categories:
+            if category.parent_id is not None:
+                self.subcategories.setdefault(str(category.parent_id), []).append(category)
+
+        # Products, already sorted by category sort_order, category name, name
+        self.products = products
+        self.products_by_id = {str(p.id): p for p in products}
+        self._by_category = {}
+        self._by_family = {}  # parent category id -> its own + its children's products
+        for product in products:
+            category_id = str(product.category_id)
+            self._by_category.setdefault(category_id, []).append(product)
+            self._by_family.setdefault(category_id, []).append(product)
+            if product.category.parent_id:
+                self._by_family.setdefault(str(product.category.parent_id), []).append(product)
+        self._search_names = {p.pk: p.name.lower() for p in products}
+
+    def get_category(self, category_id):
+        return self.categories_by_id.get(str(category_id)) if category_id else None
+
+    def get_subcategories(self, parent):
+        return self.subcategories.get(str(parent.id), []) if parent else []
+
+    def filter(self, parent_id=None, category_id=None, search=''):
+        """
+        Products of a parent category (itself + its children) or of a single
+        category, optionally narrowed by a case-insensitive name search.
+        Same semantics as the former queryset filters in product_list.
+        """
+        if parent_id and parent_id != 'all':
+            products = self._by_family.get(str(parent_id), [])
+        elif category_id and category_id != 'all':
+            products = self._by_category.get(str(category_id), [])
+        else:
+            products = self.products
+
+        search = (search or '').strip().lower()
+        if search:
+            products = [p for p in products if search in self._search_names[p.pk]]
+        return products
+
+
+def _shared_version(brand_id):
+    """(global, brand) versions from the shared cache ((0, 0) if unavailable)"""
+    brand_key = BRAND_VERSION_KEY.format(brand_id=brand_id)
+    try:
+        versions = cache.get_many([GLOBAL_VERSION_KEY, brand_key])
+    except Exception as e:
+        logger.debug(f"Catalog version lookup failed: {e}")
+        return (0, 0)
+    return (versions.get(GLOBAL_VERSION_KEY, 0), versions.get(brand_key, 0))
+
+
+def _load(brand_id, version):
+    from apps.core.models import Category, Product, ProductPhoto
+
+    start = time.perf_counter()
+    categories = list(
+        Category.objects.filter(brand_id=brand_id, is_active=True).order_by('sort_order', 'name')
+    )
+    products = list(
+        Product.objects.filter(
+            category__brand_id=brand_id,
+            is_active=True
+        ).select_related('category', 'category__parent').prefetch_related(
+            Prefetch(
+                'photos',
+                queryset=ProductPhoto.objects.filter(is_primary=True).order_by('sort_order'),
+                to_attr='primary_photos'
+            )
+        ).annotate(
+            modifier_count=Count('product_modifiers')
+        ).order_by(
+            'category__sort_order',
+            'category__name',
+            'name'
+        )
+    )
+    for product in products:
+        product.has_modifiers = product.modifier_count > 0
+
+    snapshot = CatalogSnapshot(brand_id, categories, products, version)
+    logger.info(
+        f"Catalog snapshot built for brand {brand_id}: {len(products)} products, "
+        f"{len(categories)} categories in {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    return snapshot
+
+
+def get_catalog(brand):
+    """
+    Return the CatalogSnapshot of a brand, rebuilding it if stale
+
+    Args:
+        brand: Brand instance or brand id (None gives an empty catalog)
+    """
+    if not brand:
+        return CatalogSnapshot(None, [], [], None)
+    brand_id = str(getattr(brand, 'pk', brand))
+    version = _shared_version(brand_id)
+    ttl = getattr(settings, 'POS_CATALOG_TTL', 600)
+
+    snapshot = _snapshots.get(brand_id)
+    if snapshot is not None and snapshot.version == version and time.monotonic() - snapshot.loaded_at < ttl:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(brand_id)
+        if snapshot is None or snapshot.version != version or time.monotonic() - snapshot.loaded_at >= ttl:
+            snapshot = _load(brand_id, version)
+            _snapshots[brand_id] = snapshot
+    return snapshot
+
+
+def invalidate_catalog(brand_id=None):
+    """
+    Drop cached catalog snapshots here and in every other worker process
+
+    Runs once the current transaction commits; a worker rebuilding before
+    that would cache pre-commit data under the new version.
+
+    Args:
+        brand_id: Only this brand's snapshot; None drops every brand
+    """
+    transaction.on_commit(lambda: _invalidate(brand_id))
+
+
+def _invalidate(brand_id):
+    key = BRAND_VERSION_KEY.format(brand_id=brand_id) if brand_id else GLOBAL_VERSION_KEY
+    with _lock:
+        if brand_id:
+            _snapshots.pop(str(brand_id), None)
+        else:
+            _snapshots.clear()
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Key missing (first invalidation or cache flushed)
+            cache.set(key, 1, None)
+    except Exception as e:
+        logger.warning(f"Catalog version bump failed, other workers reload after TTL: {e}")
@@ -0,0 +1,75 @@
+"""
+Compare stored Bill totals against a full recompute from the bill items
+
+Bill totals are maintained incrementally (Bill.apply_item_change) on every
+item add/change/void. This command recomputes them the slow way and reports
+bills whose stored values drifted, optionally fixing them.
+
+Usage:
+    python manage.py check_bill_totals              # open/hold bills
+    python manage.py check_bill_totals --days 7     # all bills of the last 7 days
+    python manage.py check_bill_totals --fix
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from apps.pos.models import Bill
+
+
+class Command(BaseCommand):
+    help = 'Check stored bill totals against a full recompute from bill items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Check all bills created in the last N days (default: open/hold bills only)')
+        parser.add_argument('--bill', type=int, help='Check a single bill by ID')
+        parser.add_argument('--fix', action='store_true', help='Recalculate and save drifted bills')
+        parser.add_argument('--tolerance', type=Decimal, default=Decimal('0.01'), help='Allowed difference per field')
+
+    def handle(self, *args, **options):
+        bills = Bill.objects.select_related('brand')
+        if options['bill']:
+            bills = bills.filter(id=options['bill'])
+        elif options['days']:
+            bills = bills.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        else:
+            bills = bills.filter(status__in=['open', 'hold'])
+
+        # Item subtotal of every bill in one grouped query
+        bills = bills.annotate(
+            items_subtotal=Sum('items__total', filter=Q(items__is_void=False))
+        ).order_by('id')
+
+        tolerance = options['tolerance']
+        checked = drifted = fixed = 0
+        for bill in bills.iterator(chunk_size=500):
+            checked += 1
+            stored = {field: getattr(bill, field) for field in Bill.TOTAL_FIELDS}
+
+            bill.subtotal = bill.items_subtotal or Decimal('0')
+            bill.line_discount_amount = Decimal('0')
+            bill._apply_derived_totals()
+
+            diffs = [
+                (field, stored[field], getattr(bill, field))
+                for field in Bill.TOTAL_FIELDS
+                if abs(stored[field] - getattr(bill, field)) > tolerance
+            ]
+            if not diffs:
+                continue
+
+            drifted += 1
+            self.stdout.write(self.style.WARNING(f'Bill #{bill.bill_number} (id={bill.id}, {bill.status})'))
+            for field, old, new in diffs:
+                self.stdout.write(f'  {field:<22} stored={old:>14}  expected={new.quantize(Decimal("0.01")):>14}')
+
+            if options['fix']:
+                bill.save(update_fields=Bill.TOTAL_FIELDS)
+                fixed += 1
+
+        self.stdout.write(f'Checked {checked} bill(s), {drifted} with drifted totals')
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {fixed} bill(s)'))
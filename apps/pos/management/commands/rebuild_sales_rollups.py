@@ -0,0 +1,58 @@
+"""
+Rebuild the sales rollup tables (management reports) from bills and payments
+
+Rollups are refreshed when a bill is closed; this command rebuilds whole
+business days - after deploying the rollup tables (backfill history), after
+bulk imports, or nightly to catch bills changed without Bill.save().
+
+Usage:
+    python manage.py rebuild_sales_rollups                    # yesterday and today
+    python manage.py rebuild_sales_rollups --days 90          # backfill the last 90 days
+    python manage.py rebuild_sales_rollups --date 2026-03-01
+    python manage.py rebuild_sales_rollups --days 30 --brand BR
+
+Schedule daily, after closing:
+    # Linux cron (daily at 3am)
+    0 3 * * * cd /path/to/pos && python manage.py rebuild_sales_rollups
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.core.models import Brand
+from apps.pos.rollups import rebuild_day
+
+
+class Command(BaseCommand):
+    help = 'Rebuild sales rollup tables per business day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=str, help='Rebuild a single business date (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=2, help='Business days up to today to rebuild (default 2)')
+        parser.add_argument('--brand', type=str, help='Only this brand code')
+
+    def handle(self, *args, **options):
+        brand_id = None
+        if options['brand']:
+            brand = Brand.objects.filter(code=options['brand']).first()
+            if not brand:
+                raise CommandError(f"Brand {options['brand']} not found")
+            brand_id = brand.pk
+
+        if options['date']:
+            try:
+                dates = [datetime.strptime(options['date'], '%Y-%m-%d').date()]
+            except ValueError:
+                raise CommandError('Invalid --date, expected YYYY-MM-DD')
+        else:
+            today = timezone.localdate()
+            dates = [today - timedelta(days=n) for n in reversed(range(max(options['days'], 1)))]
+
+        total = 0
+        for business_date in dates:
+            rows = rebuild_day(business_date, brand_id)
+            total += rows
+            self.stdout.write(f"{business_date}: {rows} rollup rows")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(dates)} day(s), {total} rollup rows"))
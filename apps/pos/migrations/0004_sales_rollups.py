@@ -0,0 +1,121 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_document_sequence'),
+        ('pos', '0003_payment_method_choices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashierRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('bills', models.IntegerField(default=0, help_text='Bills of any status')),
+                ('paid_bills', models.IntegerField(default=0)),
+                ('cancelled_bills', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('void_count', models.IntegerField(default=0)),
+                ('void_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.brand')),
+                ('store', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.store')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'pos_cashier_rollup',
+                'indexes': [models.Index(fields=['brand', 'business_date'], name='pos_cashier_brand_i_61c3dc_idx')],
+                'unique_together': {('brand', 'store', 'business_date', 'hour', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DiscountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('discount_percent', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('bills', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.brand')),
+                ('store', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.store')),
+            ],
+            options={
+                'db_table': 'pos_discount_rollup',
+                'indexes': [models.Index(fields=['brand', 'business_date'], name='pos_discoun_brand_i_ec63b1_idx')],
+                'unique_together': {('brand', 'store', 'business_date', 'hour', 'discount_percent')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('method', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.brand')),
+                ('store', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.store')),
+            ],
+            options={
+                'db_table': 'pos_payment_rollup',
+                'indexes': [models.Index(fields=['brand', 'business_date'], name='pos_payment_brand_i_2106c7_idx')],
+                'unique_together': {('brand', 'store', 'business_date', 'hour', 'method')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('product_name', models.CharField(max_length=200)),
+                ('category_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('void_count', models.IntegerField(default=0)),
+                ('void_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.brand')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.product')),
+                ('store', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.store')),
+            ],
+            options={
+                'db_table': 'pos_product_rollup',
+                'indexes': [models.Index(fields=['brand', 'business_date'], name='pos_product_brand_i_4d7799_idx')],
+                'unique_together': {('brand', 'store', 'business_date', 'hour', 'product')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('bills', models.IntegerField(default=0, help_text='Paid bills')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('service', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancelled_bills', models.IntegerField(default=0)),
+                ('void_items', models.IntegerField(default=0, help_text='Voided items of bills of any status')),
+                ('void_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.brand')),
+                ('store', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.store')),
+            ],
+            options={
+                'db_table': 'pos_sales_rollup',
+                'indexes': [models.Index(fields=['brand', 'business_date'], name='pos_sales_r_brand_i_ea24f6_idx')],
+                'unique_together': {('brand', 'store', 'business_date', 'hour')},
+            },
+        ),
+    ]
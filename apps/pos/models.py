@@ -5,6 +5,8 @@ import uuid
 
 # Import refund models
 from .models_refund import BillRefund, BillRefundItem, RefundPaymentReversal
+# Import sales rollup models
+from .models_rollup import CashierRollup, DiscountRollup, PaymentRollup, ProductRollup, SalesRollup
 
 
 class Bill(models.Model):
@@ -119,44 +121,103 @@ class Bill(models.Model):
         if not self.bill_number:
             self.bill_number = self.generate_bill_number()
         super().save(*args, **kwargs)
+        if self.status in ('paid', 'cancelled', 'void'):
+            from .rollups import schedule_bill_refresh
+            schedule_bill_refresh(self)
+        if self.status in ('cancelled', 'void') and self.discount_type == 'promotion':
+            # Give back the promotion use reserved when the discount was applied
+            from apps.promotions.usage import bill_transaction_id, release_usage
+            release_usage(bill_transaction_id(self))
     
     def generate_bill_number(self):
-        today = timezone.now().strftime('%Y%m%d')
+        from apps.core.sequences import next_value
+
+        today = timezone.localdate()
         # Use brand code instead of ID for UUID compatibility
         brand_code = self.brand.code if hasattr(self.brand, 'code') else '001'
-        prefix = f"{brand_code}-{today}"
-        last_bill = Bill.objects.filter(bill_number__startswith=prefix).order_by('-bill_number').first()
-        if last_bill:
-            last_num = int(last_bill.bill_number.split('-')[-1])
-            new_num = last_num + 1
-        else:
-            new_num = 1
+        prefix = f"{brand_code}-{today:%Y%m%d}"
+
+        def last_used():
+            # Only when today's counter doesn't exist yet (continues legacy numbering)
+            last_bill = Bill.objects.filter(bill_number__startswith=prefix).order_by('-bill_number').first()
+            return int(last_bill.bill_number.split('-')[-1]) if last_bill else 0
+
+        new_num = next_value('bill', scope=brand_code, business_date=today, seed=last_used)
         return f"{prefix}-{new_num:04d}"
     
-    def calculate_totals(self):
-        # Calculate subtotal from items
-        self.subtotal = sum(item.total for item in self.items.filter(is_void=False))
-        
-        # Calculate line item discounts (from individual item discounts)
-        self.line_discount_amount = sum(item.discount_amount for item in self.items.filter(is_void=False) if hasattr(item, 'discount_amount'))
-        
+    # Fields written by calculate_totals / apply_subtotal_delta
+    TOTAL_FIELDS = ['subtotal', 'line_discount_amount', 'discount_amount', 'tax_amount', 'service_charge', 'total']
+
+    def get_rates(self):
+        """(tax_rate, service_charge_rate) percentages of this bill's brand"""
+        from apps.core.store_context import get_store_context
+        rates = get_store_context().get_rates(self.brand_id)
+        if rates:
+            return rates['tax_rate'], rates['service_charge']
+        if not self.brand_id:
+            return Decimal('0'), Decimal('0')
+        # Brand not active in this store's cached context
+        return self.brand.tax_rate, self.brand.service_charge
+
+    def _apply_derived_totals(self):
+        """Bill discount, tax, service charge and total from subtotal + line discounts"""
         # Calculate subtotal/bill level discount
         if self.discount_percent > 0:
             self.discount_amount = self.subtotal * (self.discount_percent / 100)
-        
+
         # After all discounts
         after_discount = self.subtotal - self.line_discount_amount - self.discount_amount
-        
-        # Safely get tax and service charge rates
-        tax_rate = self.brand.tax_rate if self.brand else Decimal('0')
-        service_charge_rate = self.brand.service_charge if self.brand else Decimal('0')
-        
+
+        tax_rate, service_charge_rate = self.get_rates()
         self.tax_amount = after_discount * (tax_rate / 100)
         self.service_charge = after_discount * (service_charge_rate / 100)
-        
+
         self.total = after_discount + self.tax_amount + self.service_charge
-        self.save()
-    
+
+    def compute_item_totals(self):
+        """
+        (subtotal, line_discount_amount) of non-void items in one aggregate query.
+        BillItem has no per-item discount yet, so line discounts are always 0.
+        """
+        from django.db.models import Sum
+        result = self.items.filter(is_void=False).aggregate(subtotal=Sum('total'))
+        return result['subtotal'] or Decimal('0'), Decimal('0')
+
+    def calculate_totals(self):
+        """Full recompute of all totals from the bill items (merge/split/delete paths)"""
+        self.subtotal, self.line_discount_amount = self.compute_item_totals()
+        self._apply_derived_totals()
+        self.save(update_fields=self.TOTAL_FIELDS)
+
+    def apply_subtotal_delta(self, delta):
+        """
+        Incrementally update totals after items changed by `delta` (sum of item totals).
+
+        The stored subtotal/discounts are re-read under a row lock, so concurrent
+        taps on the same bill from two terminals can't lose an update.
+        """
+        from django.db import transaction
+
+        with transaction.atomic():
+            current = Bill.objects.select_for_update().values(
+                'subtotal', 'line_discount_amount', 'discount_amount', 'discount_percent'
+            ).get(pk=self.pk)
+            self.subtotal = current['subtotal'] + delta
+            self.line_discount_amount = current['line_discount_amount']
+            self.discount_amount = current['discount_amount']
+            self.discount_percent = current['discount_percent']
+            self._apply_derived_totals()
+            self.save(update_fields=self.TOTAL_FIELDS)
+
+    def apply_item_change(self, item):
+        """
+        Update totals after one BillItem of this bill was created/changed/voided and saved.
+        No-op when the change does not affect the subtotal (notes, status, ...).
+        """
+        delta = item.pop_totals_delta()
+        if delta:
+            self.apply_subtotal_delta(delta)
+
     def get_paid_amount(self):
         return sum(p.amount for p in self.payments.all())
     
@@ -216,9 +277,33 @@ class BillItem(models.Model):
             models.Index(fields=['brand', 'product', 'created_at']),    # Brand-level product mix
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this item contributes to Bill.subtotal (see pop_totals_delta)
+        if 'total' in field_names and 'is_void' in field_names:
+            instance._saved_contribution = instance.bill_contribution()
+        return instance
+
+    def bill_contribution(self):
+        """Amount this item adds to Bill.subtotal"""
+        return Decimal('0') if self.is_void else self.total
+
+    def pop_totals_delta(self):
+        """Change in bill_contribution() since the last save (0 if already applied)"""
+        delta = getattr(self, '_totals_delta', Decimal('0'))
+        self._totals_delta = Decimal('0')
+        return delta
+
     def save(self, *args, **kwargs):
         self.total = (self.unit_price + self.modifier_price) * self.quantity
         super().save(*args, **kwargs)
+        contribution = self.bill_contribution()
+        self._totals_delta = (
+            getattr(self, '_totals_delta', Decimal('0'))
+            + contribution - getattr(self, '_saved_contribution', Decimal('0'))
+        )
+        self._saved_contribution = contribution
 
 
 class Payment(models.Model):
@@ -549,16 +634,20 @@ class StoreProductStock(models.Model):
         return 0 < remaining <= self.low_stock_alert
 
     def deduct_stock(self, qty):
-        """Deduct stock when items sent to kitchen"""
-        from decimal import Decimal
-        self.sold_qty += Decimal(str(qty))
-        self.save(update_fields=['sold_qty', 'updated_at'])
+        """Deduct stock when items sent to kitchen (atomic, see apps.pos.stock)"""
+        from apps.pos.stock import deduct_stock
+        self._refresh_level(deduct_stock(self.brand_id, [(self.product_id, qty)]))
 
     def restore_stock(self, qty):
-        """Restore stock when items are voided"""
-        from decimal import Decimal
-        self.sold_qty = max(Decimal('0'), self.sold_qty - Decimal(str(qty)))
-        self.save(update_fields=['sold_qty', 'updated_at'])
+        """Restore stock when items are voided (atomic, see apps.pos.stock)"""
+        from apps.pos.stock import restore_stock
+        self._refresh_level(restore_stock(self.brand_id, [(self.product_id, qty)]))
+
+    def _refresh_level(self, levels):
+        record = levels.get(self.product_id)
+        if record is not None:
+            self.sold_qty = record.sold_qty
+            self.updated_at = record.updated_at
 
     def reset_daily(self, new_stock=None):
         """Reset stock for new day"""
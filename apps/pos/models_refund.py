@@ -90,17 +90,17 @@ class BillRefund(models.Model):
     
     def generate_refund_number(self):
         """Generate unique refund number: RF-BRANDCODE-YYYYMMDD-XXX"""
-        today = timezone.now().strftime('%Y%m%d')
+        from apps.core.sequences import next_value
+
+        today = timezone.localdate()
         brand_code = self.original_bill.brand.code if self.original_bill.brand else '001'
-        prefix = f"RF-{brand_code}-{today}"
-        
-        last_refund = BillRefund.objects.filter(refund_number__startswith=prefix).order_by('-refund_number').first()
-        if last_refund:
-            last_num = int(last_refund.refund_number.split('-')[-1])
-            new_num = last_num + 1
-        else:
-            new_num = 1
-        
+        prefix = f"RF-{brand_code}-{today:%Y%m%d}"
+
+        def last_used():
+            last_refund = BillRefund.objects.filter(refund_number__startswith=prefix).order_by('-refund_number').first()
+            return int(last_refund.refund_number.split('-')[-1]) if last_refund else 0
+
+        new_num = next_value('refund', scope=brand_code, business_date=today, seed=last_used)
         return f"{prefix}-{new_num:03d}"
     
     def calculate_refund_totals(self):
@@ -175,6 +175,11 @@ class BillRefund(models.Model):
         self.refund_payments = payment_details
         self.save()
         
+        if self.refund_type == 'full' and self.original_bill.discount_type == 'promotion':
+            # Refunded sale no longer counts against the promotion's usage limits
+            from apps.promotions.usage import bill_transaction_id, release_usage
+            release_usage(bill_transaction_id(self.original_bill))
+        
         return True, "Refund completed"
 
 
@@ -0,0 +1,120 @@
+from django.db import models
+
+
+class SalesRollupBase(models.Model):
+    """
+    One hour of one store's sales, precomputed for management reports.
+
+    Rows are derived data: apps.pos.rollups rebuilds an (brand, store,
+    business_date, hour) slice from bills/payments whenever a bill of that
+    slice is closed, and the rebuild_sales_rollups command rebuilds whole days.
+    business_date/hour are local time (TIME_ZONE) of Bill.created_at
+    (Payment.created_at for PaymentRollup), like the `created_at__date`
+    filters the reports used before.
+    """
+    brand = models.ForeignKey('core.Brand', on_delete=models.CASCADE, related_name='+')
+    store = models.ForeignKey('core.Store', on_delete=models.CASCADE, null=True, related_name='+')
+    business_date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+
+    class Meta:
+        abstract = True
+
+
+class SalesRollup(SalesRollupBase):
+    """Bill totals per hour (paid bills), cancelled bills and voided items"""
+    bills = models.IntegerField(default=0, help_text='Paid bills')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    service = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_bills = models.IntegerField(default=0)
+    void_items = models.IntegerField(default=0, help_text='Voided items of bills of any status')
+    void_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'pos_sales_rollup'
+        unique_together = [['brand', 'store', 'business_date', 'hour']]
+        indexes = [
+            models.Index(fields=['brand', 'business_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.business_date} {self.hour:02d}h - {self.bills} bills - {self.revenue}"
+
+
+class PaymentRollup(SalesRollupBase):
+    """Payments of paid bills per hour and method"""
+    method = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'pos_payment_rollup'
+        unique_together = [['brand', 'store', 'business_date', 'hour', 'method']]
+        indexes = [
+            models.Index(fields=['brand', 'business_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.business_date} {self.hour:02d}h - {self.method} - {self.amount}"
+
+
+class ProductRollup(SalesRollupBase):
+    """Items sold (paid bills) and voided (any bill status) per hour and product"""
+    product = models.ForeignKey('core.Product', on_delete=models.CASCADE, related_name='+')
+    product_name = models.CharField(max_length=200)
+    category_name = models.CharField(max_length=100, blank=True, null=True)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    void_count = models.IntegerField(default=0)
+    void_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'pos_product_rollup'
+        unique_together = [['brand', 'store', 'business_date', 'hour', 'product']]
+        indexes = [
+            models.Index(fields=['brand', 'business_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.business_date} {self.hour:02d}h - {self.product_name} x{self.quantity}"
+
+
+class CashierRollup(SalesRollupBase):
+    """Bills and voided items per hour and bill creator"""
+    user = models.ForeignKey('core.User', on_delete=models.CASCADE, related_name='+')
+    bills = models.IntegerField(default=0, help_text='Bills of any status')
+    paid_bills = models.IntegerField(default=0)
+    cancelled_bills = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    void_count = models.IntegerField(default=0)
+    void_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'pos_cashier_rollup'
+        unique_together = [['brand', 'store', 'business_date', 'hour', 'user']]
+        indexes = [
+            models.Index(fields=['brand', 'business_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.business_date} {self.hour:02d}h - {self.user_id} - {self.revenue}"
+
+
+class DiscountRollup(SalesRollupBase):
+    """Bills with a bill-level discount (any status) per hour and discount percent"""
+    discount_percent = models.DecimalField(max_digits=5, decimal_places=2)
+    bills = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'pos_discount_rollup'
+        unique_together = [['brand', 'store', 'business_date', 'hour', 'discount_percent']]
+        indexes = [
+            models.Index(fields=['brand', 'business_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.business_date} {self.hour:02d}h - {self.discount_percent}% - {self.amount}"
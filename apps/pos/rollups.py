@@ -0,0 +1,345 @@
+"""
+Sales rollups - precomputed hourly aggregates for the management reports
+
+The sales / products / cashier / payment / void & discount / peak hours
+reports aggregated raw Bill, BillItem and Payment rows on every page view. A
+"month" report scanned every bill and item of the month (product reports
+joined items -> bills -> products -> categories), which grew with the history
+and competed with the POS terminals for the edge server.
+
+The rollup tables (apps.pos.models_rollup) hold one row per brand, store,
+business date, hour and dimension (payment method, product, cashier, discount
+percent). Reports sum rollup rows for past days and aggregate raw rows only
+for today so far (report_rows()), so a month report reads a few thousand
+small rows instead of the month's items.
+
+Maintenance:
+- Bill.save() of a closed bill (paid / cancelled / void) schedules
+  refresh_bill() after commit. It rebuilds the hour slices of the bill and of
+  its payments from the raw rows, so it is idempotent and also picks up item
+  voids, merges and late edits of that bill.
+- rebuild_day() (python manage.py rebuild_sales_rollups, nightly via cron)
+  rebuilds whole days, for history, bulk imports and queryset.update() paths
+  that bypass Bill.save().
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models_rollup import CashierRollup, DiscountRollup, PaymentRollup, ProductRollup, SalesRollup
+
+logger = logging.getLogger(__name__)
+
+# Bill statuses whose save refreshes the rollups (open/hold bills are only in "today so far")
+CLOSED_STATUSES = ('paid', 'cancelled', 'void')
+
+ALL_STORES = object()  # store_id filter: every store (None means bills without store)
+
+ROLLUP_MODELS = [SalesRollup, PaymentRollup, ProductRollup, CashierRollup, DiscountRollup]
+
+
+def day_bounds(business_date):
+    """(start, end) aware datetimes of a local business date"""
+    start = timezone.make_aware(datetime.combine(business_date, time.min))
+    return start, timezone.make_aware(datetime.combine(business_date + timedelta(days=1), time.min))
+
+
+def _window(queryset, time_field, store_field, brand_id, start, end, store_id, brand_field):
+    """Rows of [start, end) annotated with their local business_date and hour"""
+    queryset = queryset.filter(**{f'{time_field}__gte': start, f'{time_field}__lt': end})
+    if brand_id is not None:
+        queryset = queryset.filter(**{brand_field: brand_id})
+    if store_id is not ALL_STORES:
+        queryset = queryset.filter(**{store_field: store_id})
+    return queryset.annotate(business_date=TruncDate(time_field), hour=ExtractHour(time_field))
+
+
+class _Rows(dict):
+    """Unsaved rollup rows keyed by (brand, store, date, hour, dimension)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def add(self, brand_id, store_id, business_date, hour, dimension=None, attrs=None, **measures):
+        key = (brand_id, store_id, business_date, hour, dimension)
+        row = self.get(key)
+        if row is None:
+            row = self[key] = self.model(
+                brand_id=brand_id, store_id=store_id, business_date=business_date, hour=hour, **(attrs or {})
+            )
+        for name, value in measures.items():
+            setattr(row, name, getattr(row, name) + (value or 0))
+        return row
+
+
+def _bills(brand_id, start, end, store_id):
+    from .models import Bill
+    return _window(Bill.objects.all(), 'created_at', 'store_id', brand_id, start, end, store_id, 'brand_id')
+
+
+def _void_items(brand_id, start, end, store_id):
+    from .models import BillItem
+    return _window(
+        BillItem.objects.filter(is_void=True), 'bill__created_at', 'bill__store_id',
+        brand_id, start, end, store_id, 'bill__brand_id',
+    )
+
+
+def _sales_rows(brand_id, start, end, store_id):
+    rows = _Rows(SalesRollup)
+    paid = Q(status='paid')
+    bills = _bills(brand_id, start, end, store_id).values('brand_id', 'store_id', 'business_date', 'hour').annotate(
+        paid_bills=Count('id', filter=paid),
+        revenue=Sum('total', filter=paid),
+        subtotal_sum=Sum('subtotal', filter=paid),
+        discount=Sum('discount_amount', filter=paid),
+        tax=Sum('tax_amount', filter=paid),
+        service=Sum('service_charge', filter=paid),
+        cancelled_bills=Count('id', filter=Q(status='cancelled')),
+    )
+    for r in bills:
+        if not r['paid_bills'] and not r['cancelled_bills']:
+            continue
+        rows.add(
+            r['brand_id'], r['store_id'], r['business_date'], r['hour'],
+            bills=r['paid_bills'], revenue=r['revenue'], subtotal=r['subtotal_sum'], discount=r['discount'],
+            tax=r['tax'], service=r['service'], cancelled_bills=r['cancelled_bills'],
+        )
+    voids = _void_items(brand_id, start, end, store_id).values(
+        'bill__brand_id', 'bill__store_id', 'business_date', 'hour'
+    ).annotate(count=Count('id'), amount=Sum('total'))
+    for r in voids:
+        rows.add(
+            r['bill__brand_id'], r['bill__store_id'], r['business_date'], r['hour'],
+            void_items=r['count'], void_amount=r['amount'],
+        )
+    return list(rows.values())
+
+
+def _payment_rows(brand_id, start, end, store_id):
+    from .models import Payment
+
+    rows = _Rows(PaymentRollup)
+    payments = _window(
+        Payment.objects.filter(bill__status='paid'), 'created_at', 'bill__store_id',
+        brand_id, start, end, store_id, 'bill__brand_id',
+    ).values('bill__brand_id', 'bill__store_id', 'business_date', 'hour', 'method').annotate(
+        count=Count('id'), total_amount=Sum('amount'),
+    )
+    for r in payments:
+        rows.add(
+            r['bill__brand_id'], r['bill__store_id'], r['business_date'], r['hour'], r['method'],
+            attrs={'method': r['method']}, count=r['count'], amount=r['total_amount'],
+        )
+    return list(rows.values())
+
+
+def _product_rows(brand_id, start, end, store_id):
+    from .models import BillItem
+
+    rows = _Rows(ProductRollup)
+    sold = _window(
+        BillItem.objects.filter(is_void=False, bill__status='paid'), 'bill__created_at', 'bill__store_id',
+        brand_id, start, end, store_id, 'bill__brand_id',
+    )
+    voids = _void_items(brand_id, start, end, store_id)
+    fields = ('bill__brand_id', 'bill__store_id', 'business_date', 'hour', 'product_id', 'product__name', 'product__category__name')
+    for queryset, quantity_field, amount_field in (
+        (sold.values(*fields).annotate(units=Sum('quantity'), amount=Sum('total')), 'quantity', 'revenue'),
+        (voids.values(*fields).annotate(units=Count('id'), amount=Sum('total')), 'void_count', 'void_amount'),
+    ):
+        for r in queryset:
+            rows.add(
+                r['bill__brand_id'], r['bill__store_id'], r['business_date'], r['hour'], r['product_id'],
+                attrs={'product_id': r['product_id'], 'product_name': r['product__name'],
+                       'category_name': r['product__category__name']},
+                **{quantity_field: r['units'], amount_field: r['amount']},
+            )
+    return list(rows.values())
+
+
+def _cashier_rows(brand_id, start, end, store_id):
+    rows = _Rows(CashierRollup)
+    bills = _bills(brand_id, start, end, store_id).values(
+        'brand_id', 'store_id', 'business_date', 'hour', 'created_by_id'
+    ).annotate(
+        count=Count('id'),
+        paid_bills=Count('id', filter=Q(status='paid')),
+        cancelled_bills=Count('id', filter=Q(status='cancelled')),
+        revenue=Sum('total', filter=Q(status='paid')),
+    )
+    for r in bills:
+        rows.add(
+            r['brand_id'], r['store_id'], r['business_date'], r['hour'], r['created_by_id'],
+            attrs={'user_id': r['created_by_id']}, bills=r['count'], paid_bills=r['paid_bills'],
+            cancelled_bills=r['cancelled_bills'], revenue=r['revenue'],
+        )
+    voids = _void_items(brand_id, start, end, store_id).values(
+        'bill__brand_id', 'bill__store_id', 'business_date', 'hour', 'bill__created_by_id'
+    ).annotate(count=Count('id'), amount=Sum('total'))
+    for r in voids:
+        rows.add(
+            r['bill__brand_id'], r['bill__store_id'], r['business_date'], r['hour'], r['bill__created_by_id'],
+            attrs={'user_id': r['bill__created_by_id']}, void_count=r['count'], void_amount=r['amount'],
+        )
+    return list(rows.values())
+
+
+def _discount_rows(brand_id, start, end, store_id):
+    rows = _Rows(DiscountRollup)
+    bills = _bills(brand_id, start, end, store_id).filter(discount_amount__gt=0).values(
+        'brand_id', 'store_id', 'business_date', 'hour', 'discount_percent'
+    ).annotate(count=Count('id'), amount=Sum('discount_amount'))
+    for r in bills:
+        rows.add(
+            r['brand_id'], r['store_id'], r['business_date'], r['hour'], r['discount_percent'],
+            attrs={'discount_percent': r['discount_percent']}, bills=r['count'], amount=r['amount'],
+        )
+    return list(rows.values())
+
+
+_BUILDERS = {
+    SalesRollup: _sales_rows,
+    PaymentRollup: _payment_rows,
+    ProductRollup: _product_rows,
+    CashierRollup: _cashier_rows,
+    DiscountRollup: _discount_rows,
+}
+
+
+def _replace(start, end, brand_id=None, store_id=ALL_STORES):
+    """Replace the rollup rows of [start, end) (whole local hours) with fresh aggregates"""
+    slice_filter = {}
+    if brand_id is not None:
+        slice_filter['brand_id'] = brand_id
+    if store_id is not ALL_STORES:
+        slice_filter['store_id'] = store_id
+    local_start, local_end = timezone.localtime(start), timezone.localtime(end)
+    if end - start == timedelta(hours=1):
+        slice_filter.update(business_date=local_start.date(), hour=local_start.hour)
+    else:
+        slice_filter.update(business_date__gte=local_start.date(), business_date__lt=local_end.date())
+
+    created = 0
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                for model, builder in _BUILDERS.items():
+                    model.objects.filter(**slice_filter).delete()
+                    rows = builder(brand_id, start, end, store_id)
+                    model.objects.bulk_create(rows)
+                    created += len(rows)
+            return created
+        except IntegrityError:
+            # Same slice inserted by a concurrent refresh - rebuild again over it
+            if attempt:
+                raise
+            created = 0
+
+
+def refresh_slice(brand_id, store_id, business_date, hour):
+    """
+    Rebuild one hour of one store's rollup rows from bills and payments
+
+    Returns:
+        int: Rollup rows written
+    """
+    start = timezone.make_aware(datetime.combine(business_date, time(hour)))
+    return _replace(start, start + timedelta(hours=1), brand_id, store_id)
+
+
+def refresh_bill(bill_id):
+    """
+    Rebuild the rollup slices a bill contributes to: the hour it was created
+    (bills, items, voids, discounts) and the hours of its payments.
+    Errors are logged, never raised - the sale is already committed and the
+    nightly rebuild repairs the slice.
+    """
+    from .models import Bill, Payment
+
+    try:
+        bill = Bill.objects.only('brand_id', 'store_id', 'created_at').get(pk=bill_id)
+        slices = {timezone.localtime(bill.created_at).replace(minute=0, second=0, microsecond=0)}
+        for created_at in Payment.objects.filter(bill_id=bill_id).values_list('created_at', flat=True):
+            slices.add(timezone.localtime(created_at).replace(minute=0, second=0, microsecond=0))
+        for hour_start in slices:
+            refresh_slice(bill.brand_id, bill.store_id, hour_start.date(), hour_start.hour)
+    except Exception as e:
+        logger.error(f"Sales rollup refresh failed for bill {bill_id}: {e}", exc_info=True)
+
+
+def schedule_bill_refresh(bill):
+    """Refresh the rollups of a closed bill once the current transaction commits"""
+    if bill.status in CLOSED_STATUSES and bill.pk:
+        bill_id = bill.pk
+        transaction.on_commit(lambda: refresh_bill(bill_id))
+
+
+def rebuild_day(business_date, brand_id=None):
+    """
+    Rebuild all rollup rows of a local business date
+
+    Args:
+        business_date: date
+        brand_id: Only this brand (default: all brands)
+
+    Returns:
+        int: Rollup rows written
+    """
+    start, end = day_bounds(business_date)
+    return _replace(start, end, brand_id)
+
+
+def report_rows(model, brand, date_from, date_to, group_by, measures):
+    """
+    Sum rollup rows of a date range for a report, grouped by `group_by`
+
+    Past days come from the rollup table; today (if in range) is aggregated
+    from the raw bills/payments, so open bills and the last few minutes are
+    included.
+
+    Args:
+        model: Rollup model (SalesRollup, PaymentRollup, ...)
+        brand: Brand instance or id
+        date_from / date_to: Local business dates, inclusive
+        group_by: Rollup fields to group by (e.g. ['business_date'], ['product_id', 'product_name'])
+        measures: Rollup fields to sum
+
+    Returns:
+        list: One dict per group with the group_by and measure fields
+            (without group_by always one row, zeros if nothing matched)
+    """
+    brand_id = getattr(brand, 'pk', brand)
+    today = timezone.localdate()
+    groups = {}
+
+    def add(key, values):
+        group = groups.get(key)
+        if group is None:
+            groups[key] = dict(zip(group_by, key), **{m: values[m] or 0 for m in measures})
+        else:
+            for m in measures:
+                group[m] += values[m] or 0
+
+    past_to = min(date_to, today - timedelta(days=1))
+    if date_from <= past_to:
+        rows = model.objects.filter(brand_id=brand_id, business_date__gte=date_from, business_date__lte=past_to)
+        sums = {f'sum_{m}': Sum(m) for m in measures}
+        rows = rows.values(*group_by).annotate(**sums) if group_by else [rows.aggregate(**sums)]
+        for row in rows:
+            add(tuple(row[field] for field in group_by), {m: row[f'sum_{m}'] for m in measures})
+
+    if date_from <= today <= date_to:
+        start, end = day_bounds(today)
+        for row in _BUILDERS[model](brand_id, start, end, ALL_STORES):
+            values = {m: getattr(row, m) for m in measures}
+            add(tuple(getattr(row, field) for field in group_by), values)
+
+    if not group_by and not groups:
+        add((), dict.fromkeys(measures, 0))
+    return list(groups.values())
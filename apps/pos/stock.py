@@ -0,0 +1,125 @@
+"""
+Store stock service - batched stock checks and atomic sold_qty updates
+
+send_to_kitchen used to look up the StoreProductStock row of every pending
+item twice (check + deduction) and deduct with a read-modify-write save(),
+so two terminals sending the same product at once could lose an update.
+
+Here every relevant stock row is loaded in one query, and sold_qty is changed
+in the database with a single UPDATE (F('sold_qty') +/- qty per product via
+CASE), which is safe under concurrent sends and voids.
+
+Quantities are passed as (product_id, qty) pairs; repeated products are summed.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import StoreProductStock
+
+
+def _sum_quantities(quantities):
+    """{product_id: total qty} from (product_id, qty) pairs"""
+    totals = {}
+    for product_id, qty in quantities:
+        totals[product_id] = totals.get(product_id, Decimal('0')) + Decimal(str(qty))
+    return totals
+
+
+def get_stock_records(brand, product_ids):
+    """
+    Active stock records of the given products in one query
+
+    Returns:
+        dict: {product_id: StoreProductStock}; untracked products are missing
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    records = StoreProductStock.objects.filter(
+        brand=brand, is_active=True, product_id__in=product_ids
+    )
+    return {record.product_id: record for record in records}
+
+
+def check_stock(brand, items):
+    """
+    Items whose ordered quantity exceeds the remaining stock
+
+    Args:
+        brand: Brand of the bill
+        items: BillItems with product loaded (e.g. pending items of a bill)
+
+    Returns:
+        list: Warning dicts (product_name, quantity_ordered, remaining_stock,
+        is_out) for stock_warning_modal.html, in item order
+    """
+    items = list(items)
+    ordered = _sum_quantities((item.product_id, item.quantity) for item in items)
+    records = get_stock_records(brand, ordered)
+
+    warnings = []
+    for item in items:
+        record = records.get(item.product_id)
+        if record is None or item.product_id not in ordered:
+            continue
+        qty = ordered.pop(item.product_id)  # one warning per product
+        remaining = record.remaining_stock
+        if remaining < qty:
+            warnings.append({
+                'product_name': item.product.name,
+                'quantity_ordered': qty,
+                'remaining_stock': max(0, remaining),
+                'is_out': remaining <= 0,
+            })
+    return warnings
+
+
+def _apply(brand, quantities, sign):
+    totals = _sum_quantities(quantities)
+    if not totals:
+        return {}
+    qty_field = DecimalField(max_digits=10, decimal_places=2)
+    delta = Case(
+        *[When(product_id=product_id, then=Value(qty)) for product_id, qty in totals.items()],
+        default=Value(Decimal('0')),
+        output_field=qty_field,
+    )
+    if sign > 0:
+        sold_qty = F('sold_qty') + delta
+    else:
+        sold_qty = Greatest(F('sold_qty') - delta, Value(Decimal('0')), output_field=qty_field)
+
+    updated = StoreProductStock.objects.filter(
+        brand=brand, is_active=True, product_id__in=totals
+    ).update(sold_qty=sold_qty, updated_at=timezone.now())
+    if not updated:
+        return {}
+    # Post-update levels (includes concurrent changes by other terminals)
+    return get_stock_records(brand, totals)
+
+
+def deduct_stock(brand, quantities):
+    """
+    Add quantities sent to kitchen to sold_qty (one UPDATE for all products)
+
+    Args:
+        brand: Brand of the bill
+        quantities: Iterable of (product_id, qty) pairs
+
+    Returns:
+        dict: {product_id: StoreProductStock} with post-deduction levels of
+        the tracked products
+    """
+    return _apply(brand, quantities, 1)
+
+
+def restore_stock(brand, quantities):
+    """
+    Give voided quantities back (sold_qty never goes below 0)
+
+    Args / Returns: same as deduct_stock
+    """
+    return _apply(brand, quantities, -1)
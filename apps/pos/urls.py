@@ -1,5 +1,5 @@
 ﻿from django.urls import path
-from . import views
+from . import views, api_catalog
 
 app_name = 'pos'
 
@@ -10,6 +10,7 @@ urlpatterns = [
     path('kitchen-agent/start/', views.kitchen_agent_start, name='kitchen_agent_start'),
     path('kitchen-agent/stop/', views.kitchen_agent_stop, name='kitchen_agent_stop'),
     path('products/', views.product_list, name='products'),
+    path('api/catalog/', api_catalog.catalog_api, name='catalog_api'),
     
     # Bill operations
     path('bill/open/', views.open_bill, name='open_bill'),
@@ -22,20 +22,24 @@ def generate_queue_number(brand):
         >>> queue = generate_queue_number(brand)
         >>> print(queue)  # 1 (if first order today)
     """
+    from apps.core.sequences import next_value
     from apps.pos.models import Bill
     
     # Use local timezone date (Jakarta time)
     today = timezone.localtime(timezone.now()).date()
     
-    last_queue = Bill.objects.filter(
-        brand=brand,
-        bill_type='takeaway',
-        created_at__date=today,
-        queue_number__isnull=False
-    ).aggregate(max_queue=models.Max('queue_number'))
-    
-    max_queue = last_queue['max_queue'] or 0
-    return max_queue + 1
+    def last_used():
+        # Only when today's counter doesn't exist yet (continues legacy numbering)
+        last_queue = Bill.objects.filter(
+            brand=brand,
+            bill_type='takeaway',
+            created_at__date=today,
+            queue_number__isnull=False
+        ).aggregate(max_queue=models.Max('queue_number'))
+        return last_queue['max_queue'] or 0
+    
+    # Row-locked daily counter: concurrent terminals never get the same number
+    return next_value('queue', scope=brand.pk, business_date=today, seed=last_used)
 
 
 def get_active_queues(brand, limit=10):
@@ -10,11 +10,17 @@ import uuid
 import json
 
 from .models import Bill, BillItem, Payment, BillLog
+from .bill_panel import build_bill_panel
+from .catalog import get_catalog
 from apps.core.models import Product, Category, ModifierOption, Store, Modifier, POSTerminal
 from apps.core.models_session import StoreSession, CashierShift, ShiftPaymentSummary
 from apps.core.minio_client import get_minio_endpoint_for_request
+from apps.core.hotpath_log import get_hot_logger
 from apps.tables.models import Table
 
+# Hot-path views (add_item, send_to_kitchen, process_payment) log through this
+hotlog = get_hot_logger(__name__)
+
 
 def get_shift_deposit_summary(shift):
     """Get total deposit applied across all paid bills in a shift."""
@@ -46,35 +52,47 @@ def trigger_client_event(response, event_name, data=None):
     return response
 
 
-def render_bill_panel(request, bill):
-    """Helper to render bill panel with store_config context"""
-    store_config = Store.get_current()
-    
-    # Add active items count for conditional logic
-    if bill:
-        # Force fresh query to avoid cached items
-        bill.refresh_from_db()
-        active_items_count = bill.items.filter(status='pending', is_void=False).count()
-        # Check if ANY item was sent to kitchen (any non-pending status)
-        has_sent_items = bill.items.filter(is_void=False).exclude(status='pending').exists()
-    else:
-        active_items_count = 0
-        has_sent_items = False
-    
-    context = {
-        'bill': bill,
-        'store_config': store_config,
-        'active_items_count': active_items_count,
-        'has_sent_items': has_sent_items
-    }
+def render_bill_panel(request, bill, panel=None):
+    """
+    Helper to render bill panel with store_config context
+
+    Args:
+        bill: Bill instance, bill id or None (always reloaded fresh)
+        panel: Already built BillPanel for this bill (skips the reload)
+    """
+    if panel is None:
+        panel = build_bill_panel(bill)
+
+    context = panel.get_context()
+    context['store_config'] = Store.get_current()
     return render(request, 'pos/partials/bill_panel.html', context)
 
 
+def get_stock_status_dict(brand):
+    """
+    {product_id: {'remaining', 'daily_stock', 'is_out', 'is_low'}} for stock-tracked products.
+    Kept out of the catalog snapshot - it changes on every send to kitchen.
+    """
+    from apps.pos.models import StoreProductStock
+    stock_records = StoreProductStock.objects.filter(brand=brand, is_active=True).only(
+        'product_id', 'daily_stock', 'sold_qty', 'low_stock_alert'
+    )
+    stock_status_dict = {}
+    for sr in stock_records:
+        stock_status_dict[sr.product_id] = {
+            'remaining': sr.remaining_stock,
+            'daily_stock': sr.daily_stock,
+            'is_out': sr.is_out_of_stock,
+            'is_low': sr.is_low_stock,
+        }
+    return stock_status_dict
+
+
 @ensure_csrf_cookie
 def pos_main(request):
     """Main POS interface"""
-    from apps.core.models import Store, ProductPhoto, POSTerminal
-    from django.db.models import Prefetch
+    from apps.core.models import Store, POSTerminal
+    from apps.core.terminal_resolver import resolve_terminal, resolve_terminal_by_code
     from django.contrib.auth import authenticate, login
     import logging
     logger = logging.getLogger(__name__)
@@ -170,14 +188,14 @@ def pos_main(request):
         
         if terminal_code:
             # Validate terminal exists and is active
-            try:
-                terminal = POSTerminal.objects.get(terminal_code=terminal_code, is_active=True)
+            terminal = resolve_terminal_by_code(terminal_code)
+            if terminal:
                 # Store in session for subsequent requests
                 request.session['terminal_code'] = terminal_code
                 request.session['terminal_id'] = str(terminal.id)
                 request.terminal = terminal  # Attach to request
                 logger.info(f"Terminal detected from URL: {terminal_code}")
-            except POSTerminal.DoesNotExist:
+            else:
                 logger.warning(f"Terminal not found: {terminal_code}")
                 return render(request, 'pos/terminal_not_found.html', {
                     'terminal_code': terminal_code,
@@ -199,25 +217,25 @@ def pos_main(request):
                     logger.info(f"Using launcher terminal code (from config.json): {launcher_terminal}")
                     terminal_code = launcher_terminal
                     # Try to lookup terminal
-                    try:
-                        terminal = POSTerminal.objects.get(terminal_code=terminal_code, is_active=True)
+                    terminal = resolve_terminal_by_code(terminal_code)
+                    if terminal:
                         request.session['terminal_code'] = terminal_code
                         request.session['terminal_id'] = str(terminal.id)
                         request.terminal = terminal
                         logger.info(f"Terminal set from launcher config: {terminal_code}")
                         # Set variables so the check below passes
                         terminal_id = str(terminal.id)
-                    except POSTerminal.DoesNotExist:
+                    else:
                         logger.warning(f"Launcher terminal not found in DB: {launcher_terminal}")
                         # Clear invalid launcher terminal
                         request.session.pop('launcher_terminal_code', None)
             
             if terminal_code and terminal_id:
-                try:
-                    terminal = POSTerminal.objects.get(id=terminal_id, terminal_code=terminal_code, is_active=True)
+                terminal = resolve_terminal(terminal_id)
+                if terminal and terminal.terminal_code == terminal_code:
                     request.terminal = terminal
                     logger.info(f"Terminal from session: {terminal_code}")
-                except POSTerminal.DoesNotExist:
+                else:
                     # Terminal in session but not in DB or not active
                     logger.warning(f"Terminal in session not found in DB: {terminal_code}")
                     request.session.pop('terminal_code', None)
@@ -244,43 +262,26 @@ def pos_main(request):
     if not brand:
         return render(request, 'pos/no_brand.html')
     
-    categories = Category.objects.filter(brand=brand, is_active=True)
-    parent_categories = categories.filter(parent__isnull=True)
+    # Categories and products from the cached per-brand catalog snapshot
+    catalog = get_catalog(brand)
+    categories = catalog.categories
+    parent_categories = catalog.parent_categories
     parent_id = request.GET.get('parent')
     selected_parent = None
     if parent_id:
-        selected_parent = parent_categories.filter(id=parent_id).first()
-    if not selected_parent and parent_categories.exists():
-        selected_parent = parent_categories.first()
-    subcategories = categories.filter(parent=selected_parent) if selected_parent else Category.objects.none()
+        selected_parent = catalog.get_category(parent_id)
+        if selected_parent and selected_parent.parent_id is not None:
+            selected_parent = None
+    if not selected_parent and parent_categories:
+        selected_parent = parent_categories[0]
+    subcategories = catalog.get_subcategories(selected_parent)
     tables = Table.objects.filter(area__brand = brand)
     
-    # Order products by category for better display
-    products = Product.objects.filter(
-        category__brand = brand, 
-        is_active=True
-    ).select_related('category', 'category__parent').prefetch_related(
-        'product_modifiers__modifier',
-        Prefetch(
-            'photos',
-            queryset=ProductPhoto.objects.filter(is_primary=True).order_by('sort_order'),
-            to_attr='primary_photos'
-        )
-    ).order_by(
-        'category__sort_order',
-        'category__name',
-        'name'
-    )
-    if selected_parent:
-        products = products.filter(
-            models.Q(category=selected_parent) | models.Q(category__parent=selected_parent)
-        )
+    # Products ordered by category for better display
+    products = catalog.filter(parent_id=selected_parent.id if selected_parent else None)
     
     # Check for bill_id from query parameter (e.g., after join tables) or session
     bill_id = request.GET.get('bill_id') or request.session.get('active_bill_id')
-    bill = None
-    active_items_count = 0
-    has_sent_items = False
     
     # Debug logging
     import logging
@@ -289,23 +290,16 @@ def pos_main(request):
     logger.info(f"POS Main - bill_id from GET: {request.GET.get('bill_id')}")
     logger.info(f"POS Main - final bill_id: {bill_id}")
     
+    # Bill, items and panel flags in one pass (see apps.pos.bill_panel)
+    panel = build_bill_panel(bill_id or None, statuses=['open', 'hold'])
+    bill = panel.bill
     if bill_id:
-        # Query bill with prefetch_related to load items efficiently
-        bill = Bill.objects.filter(
-            id=bill_id, 
-            status__in=['open', 'hold']
-        ).prefetch_related('items').first()
-        
         logger.info(f"POS Main - bill found: {bill}")
         if bill:
             # Update session with new active bill
-            request.session['active_bill_id'] = bill.id
-            request.session.modified = True
-            # Calculate active items count (pending items only)
-            active_items_count = bill.items.filter(status='pending', is_void=False).count()
-            # Check if ANY item was ever sent to kitchen (including voided ones)
-            has_sent_items = bill.items.filter(status='sent').exists()
-            logger.info(f"POS Main - bill {bill.bill_number} has {bill.items.count()} total items")
+            if request.session.get('active_bill_id') != bill.id:
+                request.session['active_bill_id'] = bill.id
+            logger.info(f"POS Main - bill {bill.bill_number} has {panel.item_count} total items")
         else:
             # Bill not found or not open, clear session
             logger.warning(f"POS Main - bill_id {bill_id} not found or not open, clearing session")
@@ -314,31 +308,13 @@ def pos_main(request):
     
     held_count = Bill.objects.filter(brand=brand, status='hold').count()
     
-    # Build a dictionary of product quantities in the current bill
-    bill_items_dict = {}
-    if bill:
-        for item in bill.items.filter(status='pending', is_void=False):
-            if item.product_id in bill_items_dict:
-                bill_items_dict[item.product_id] += item.quantity
-            else:
-                bill_items_dict[item.product_id] = item.quantity
-    
     # MinIO settings for product images
     minio_endpoint = get_minio_endpoint_for_request(request)
     minio_bucket = 'product-images'
 
     # Build stock status dict from StoreProductStock
     # Only products in StoreProductStock are tracked; others are always available
-    from apps.pos.models import StoreProductStock
-    stock_records = StoreProductStock.objects.filter(brand=brand, is_active=True)
-    stock_status_dict = {}
-    for sr in stock_records:
-        stock_status_dict[sr.product_id] = {
-            'remaining': sr.remaining_stock,
-            'daily_stock': sr.daily_stock,
-            'is_out': sr.is_out_of_stock,
-            'is_low': sr.is_low_stock,
-        }
+    stock_status_dict = get_stock_status_dict(brand)
 
     context = {
         'categories': categories,
@@ -347,10 +323,7 @@ def pos_main(request):
         'selected_parent': selected_parent,
         'tables': tables,
         'products': products,
-        'bill': bill,
-        'bill_items_dict': bill_items_dict,
-        'active_items_count': active_items_count,
-        'has_sent_items': has_sent_items,
+        **panel.get_context(),
         'held_count': held_count,
         'store_config': store_config,
         'terminal': terminal,  # Add terminal to context
@@ -514,70 +487,28 @@ def kitchen_agent_stop(request):
 @login_required
 def product_list(request):
     """Product list partial - HTMX"""
-    from apps.core.models import ProductPhoto
-    from django.db.models import Prefetch
-    
     brand = request.user.brand
     category_id = request.GET.get('category')
     parent_id = request.GET.get('parent')
     search_query = request.GET.get('search', '').strip()
     
-    # Order products by category sort_order and name for better grouping
-    products = Product.objects.filter(
-        category__brand = brand, 
-        is_active=True
-    ).select_related('category', 'category__parent').prefetch_related(
-        'product_modifiers__modifier',
-        Prefetch(
-            'photos',
-            queryset=ProductPhoto.objects.filter(is_primary=True).order_by('sort_order'),
-            to_attr='primary_photos'
-        )
-    ).order_by(
-        'category__sort_order', 
-        'category__name', 
-        'name'
+    # Category filter + search against the cached catalog snapshot
+    products = get_catalog(brand).filter(
+        parent_id=parent_id, category_id=category_id, search=search_query
     )
     
-    if parent_id and parent_id != 'all':
-        products = products.filter(
-            models.Q(category_id=parent_id) | models.Q(category__parent_id=parent_id)
-        )
-    elif category_id and category_id != 'all':
-        products = products.filter(category_id=category_id)
-    
-    # Search filter
-    if search_query:
-        products = products.filter(name__icontains=search_query)
-    
     # Get active bill from session
     bill_id = request.session.get('active_bill_id')
-    bill = None
-    bill_items_dict = {}
-    if bill_id:
-        bill = Bill.objects.filter(id=bill_id, status__in=['open', 'hold']).prefetch_related('items').first()
-        if bill:
-            for item in bill.items.filter(status='pending', is_void=False):
-                if item.product_id in bill_items_dict:
-                    bill_items_dict[item.product_id] += item.quantity
-                else:
-                    bill_items_dict[item.product_id] = item.quantity
+    panel = build_bill_panel(bill_id or None, statuses=['open', 'hold'])
+    bill = panel.bill
+    bill_items_dict = panel.product_quantities
 
     # MinIO settings
     minio_endpoint = get_minio_endpoint_for_request(request)
     minio_bucket = 'product-images'
 
     # Stock status from StoreProductStock
-    from apps.pos.models import StoreProductStock
-    stock_records = StoreProductStock.objects.filter(brand=brand, is_active=True)
-    stock_status_dict = {}
-    for sr in stock_records:
-        stock_status_dict[sr.product_id] = {
-            'remaining': sr.remaining_stock,
-            'daily_stock': sr.daily_stock,
-            'is_out': sr.is_out_of_stock,
-            'is_low': sr.is_low_stock,
-        }
+    stock_status_dict = get_stock_status_dict(brand)
 
     is_modal = request.GET.get('modal') == '1'
     template = 'pos/partials/product_grid_mini.html' if is_modal else 'pos/partials/product_grid.html'
@@ -692,28 +623,21 @@ def add_item(request, bill_id):
                 return trigger_client_event(response, 'billNotFound', {'message': 'Bill not found or already closed. Please select a table to start new order.'})
         
         product_id = request.POST.get('product_id')
-        
-        # DEBUG: Log what we received
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"=== ADD ITEM DEBUG ===")
-        logger.info(f"Received product_id: '{product_id}' (type: {type(product_id)})")
-        logger.info(f"All POST data: {dict(request.POST)}")
+        hotlog.debug('add_item.request', bill=bill.id, product_id=product_id, post_keys=list(request.POST.keys()))
         
         # Handle product_id conversion (UUID)
         if product_id:
             original_id = product_id
             try:
                 product_id = uuid.UUID(str(product_id))
-                logger.info(f"Converted '{original_id}' -> {product_id} (uuid)")
             except (ValueError, TypeError) as e:
-                logger.error(f"Error converting product_id '{original_id}': {e}")
+                hotlog.warning('add_item.invalid_product_id', product_id=original_id, error=e)
                 return HttpResponse(
                     f'<div class="p-3 bg-red-100 text-red-700 rounded">Invalid product ID: {original_id}</div>',
                     status=400
                 )
         else:
-            logger.error("No product_id provided in POST data")
+            hotlog.warning('add_item.missing_product_id', bill=bill.id)
             return HttpResponse(
                 '<div class="p-3 bg-red-100 text-red-700 rounded">Product ID is required</div>',
                 status=400
@@ -728,17 +652,12 @@ def add_item(request, bill_id):
         if modifiers:
             modifiers = list(dict.fromkeys(modifiers))
         
-        logger.info(f"Looking for Product with id={product_id}")
-        logger.info(f"Received modifiers: {modifiers}")
-        
         try:
             product = Product.objects.get(id=product_id)
-            logger.info(f"Found product: {product.name}")
         except Product.DoesNotExist:
-            logger.error(f"Product with id={product_id} not found in database")
-            # List available products for debugging
-            available_ids = list(Product.objects.values_list('id', flat=True)[:10])
-            logger.error(f"Available product IDs (first 10): {available_ids}")
+            hotlog.warning('add_item.product_not_found', product_id=product_id)
+            # List available products for debugging (only with diagnostic dumps on)
+            hotlog.dump('add_item.available_product', lambda: Product.objects.values_list('id', flat=True)[:10])
             return HttpResponse(
                 f'<div class="p-3 bg-red-100 text-red-700 rounded">Product not found (ID: {product_id})</div>', 
                 status=404
@@ -767,7 +686,7 @@ def add_item(request, bill_id):
         for mod_id in modifier_ids:
             opt = options_map.get(str(mod_id))
             if not opt:
-                logger.error(f"ModifierOption with id={mod_id} not found")
+                hotlog.warning('add_item.modifier_not_found', modifier_id=mod_id, product=product.id)
                 continue
             modifier_price += opt.price_adjustment
             modifier_data.append({
@@ -802,7 +721,9 @@ def add_item(request, bill_id):
                 created_by=request.user,
             )
         
-        bill.calculate_totals()
+        bill.apply_item_change(item)
+        hotlog.debug('add_item.done', bill=bill.bill_number, item=item.id, product=product.name,
+                     quantity=quantity, modifiers=len(modifier_data), merged=existing_item is not None)
         
         BillLog.objects.create(
             bill=bill,
@@ -815,9 +736,7 @@ def add_item(request, bill_id):
         return trigger_client_event(response, 'itemAdded')
         
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error adding item: {str(e)}", exc_info=True)
+        hotlog.exception('add_item.failed', bill=bill_id, error=e)
         return HttpResponse(f'<div class="p-3 bg-red-100 text-red-700 rounded">Error: {str(e)}</div>', status=500)
 
 
@@ -848,8 +767,9 @@ def quick_add_product(request, bill_id, product_id):
         if existing_item:
             existing_item.quantity += 1
             existing_item.save()
+            item = existing_item
         else:
-            BillItem.objects.create(
+            item = BillItem.objects.create(
                 bill=bill,
                 product=product,
                 quantity=1,
@@ -861,29 +781,18 @@ def quick_add_product(request, bill_id, product_id):
                 created_by=request.user,
             )
         
-        bill.calculate_totals()
+        bill.apply_item_change(item)
         
-        # Build updated bill_items_dict
-        bill_items_dict = {}
-        for item in bill.items.filter(status='pending', is_void=False):
-            if item.product_id in bill_items_dict:
-                bill_items_dict[item.product_id] += item.quantity
-            else:
-                bill_items_dict[item.product_id] = item.quantity
+        # Fresh bill + items once, shared by product card and bill panel
+        panel = build_bill_panel(bill)
+        bill = panel.bill
+        bill_items_dict = panel.product_quantities
         
         # Return updated product card and bill panel
         from django.template.loader import render_to_string
-        from apps.core.models import ProductPhoto
-        from django.db.models import Prefetch
-        
-        product = Product.objects.filter(id=product_id).select_related('category', 'category__parent').prefetch_related(
-            'product_modifiers__modifier',
-            Prefetch(
-                'photos',
-                queryset=ProductPhoto.objects.filter(is_primary=True).order_by('sort_order'),
-                to_attr='primary_photos'
-            )
-        ).first()
+        
+        # Card data (photos) from the catalog snapshot; inactive products aren't in it
+        product = get_catalog(bill.brand_id).products_by_id.get(str(product.id), product)
         
         minio_endpoint = get_minio_endpoint_for_request(request)
         minio_bucket = 'product-images'
@@ -896,7 +805,7 @@ def quick_add_product(request, bill_id, product_id):
             'minio_bucket': minio_bucket,
         }, request=request)
         
-        bill_panel_html = render_bill_panel(request, bill).content.decode('utf-8')
+        bill_panel_html = render_bill_panel(request, bill, panel=panel).content.decode('utf-8')
         
         return JsonResponse({
             'product_card_html': product_card_html,
@@ -936,29 +845,18 @@ def quick_remove_product(request, bill_id, product_id):
                 existing_item.is_void = True
                 existing_item.save()
             
-            bill.calculate_totals()
+            bill.apply_item_change(existing_item)
         
-        # Build updated bill_items_dict
-        bill_items_dict = {}
-        for item in bill.items.filter(status='pending', is_void=False):
-            if item.product_id in bill_items_dict:
-                bill_items_dict[item.product_id] += item.quantity
-            else:
-                bill_items_dict[item.product_id] = item.quantity
+        # Fresh bill + items once, shared by product card and bill panel
+        panel = build_bill_panel(bill)
+        bill = panel.bill
+        bill_items_dict = panel.product_quantities
         
         # Return updated product card and bill panel
         from django.template.loader import render_to_string
-        from apps.core.models import ProductPhoto
-        from django.db.models import Prefetch
-        
-        product = Product.objects.filter(id=product_id).select_related('category', 'category__parent').prefetch_related(
-            'product_modifiers__modifier',
-            Prefetch(
-                'photos',
-                queryset=ProductPhoto.objects.filter(is_primary=True).order_by('sort_order'),
-                to_attr='primary_photos'
-            )
-        ).first()
+        
+        # Card data (photos) from the catalog snapshot; inactive products aren't in it
+        product = get_catalog(bill.brand_id).products_by_id.get(str(product.id), product)
         
         minio_endpoint = get_minio_endpoint_for_request(request)
         minio_bucket = 'product-images'
@@ -971,7 +869,7 @@ def quick_remove_product(request, bill_id, product_id):
             'minio_bucket': minio_bucket,
         }, request=request)
         
-        bill_panel_html = render_bill_panel(request, bill).content.decode('utf-8')
+        bill_panel_html = render_bill_panel(request, bill, panel=panel).content.decode('utf-8')
         
         return JsonResponse({
             'product_card_html': product_card_html,
@@ -1010,7 +908,7 @@ def void_item(request, item_id):
         item.save()
         
         # Recalculate bill totals
-        item.bill.calculate_totals()
+        item.bill.apply_item_change(item)
         
         # Create audit log
         BillLog.objects.create(
@@ -1024,9 +922,8 @@ def void_item(request, item_id):
             }
         )
         
-        # Refresh bill with table relation
-        bill = Bill.objects.select_related('table', 'table__area').get(id=item.bill.id)
-        return render_bill_panel(request, bill)
+        # Re-render from a fresh bill (render_bill_panel reloads it)
+        return render_bill_panel(request, item.bill_id)
     
     # GET method - Show PIN modal for SENT items
     if request.method == 'GET':
@@ -1065,19 +962,18 @@ def void_item(request, item_id):
 
     # Restore stock if item was already sent to kitchen (stock was deducted at send time)
     if was_sent:
-        from apps.pos.models import StoreProductStock
-        stock_record = StoreProductStock.objects.filter(
-            product_id=item.product_id,
-            brand=item.bill.brand,
-            is_active=True
-        ).first()
-        if stock_record:
-            stock_record.restore_stock(item.quantity)
-            print(f"  [Stock] Restored {item.quantity} for {item.product.name} "
-                  f"(remaining: {stock_record.remaining_stock})")
+        from apps.pos.stock import restore_stock
+        stock_levels = restore_stock(item.bill.brand, [(item.product_id, item.quantity)])
+        for stock_record in stock_levels.values():
+            hotlog.debug('void_item.stock_restored', product=stock_record.product_name,
+                         quantity=item.quantity, remaining=stock_record.remaining_stock)
+
+        # Drop the item from open KDS cards
+        from apps.kitchen.services import push_kds_item_voided
+        push_kds_item_voided(item.bill, item.id)
 
     # Recalculate bill totals
-    item.bill.calculate_totals()
+    item.bill.apply_item_change(item)
 
     # Create audit log
     BillLog.objects.create(
@@ -1093,9 +989,8 @@ def void_item(request, item_id):
         }
     )
     
-    # Refresh bill with table relation
-    bill = Bill.objects.select_related('table', 'table__area').get(id=item.bill.id)
-    return render_bill_panel(request, bill)
+    # Re-render from a fresh bill (render_bill_panel reloads it)
+    return render_bill_panel(request, item.bill_id)
 
 
 @login_required
@@ -1111,11 +1006,10 @@ def update_item_qty(request, item_id):
         item.quantity -= 1
     
     item.save()
-    item.bill.calculate_totals()
+    item.bill.apply_item_change(item)
     
-    # Refresh bill with table relation
-    bill = Bill.objects.select_related('table', 'table__area').get(id=item.bill.id)
-    return render_bill_panel(request, bill)
+    # Re-render from a fresh bill (render_bill_panel reloads it)
+    return render_bill_panel(request, item.bill_id)
 
 
 @login_required
@@ -1227,13 +1121,12 @@ def update_item(request, item_id):
         logger.info(f"Final price: unit={item.unit_price}, modifiers={modifier_total}, total={item.unit_price + modifier_total}")
         
         item.save()
-        item.bill.calculate_totals()
+        item.bill.apply_item_change(item)
         
         logger.info(f"Item {item_id} updated successfully")
         
-        # Refresh bill with table relation
-        bill = Bill.objects.select_related('table', 'table__area').get(id=item.bill.id)
-        return render_bill_panel(request, bill)
+        # Re-render from a fresh bill (render_bill_panel reloads it)
+        return render_bill_panel(request, item.bill_id)
         
     except Exception as e:
         logger.error(f"Error updating item {item_id}: {str(e)}", exc_info=True)
@@ -1549,20 +1442,16 @@ def refresh_bill_panel(request, bill_id):
 
 
 def _notify_kds_new_orders(bill, kitchen_orders):
-    """Send WebSocket push to KDS tablets for instant refresh. Non-blocking."""
-    try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        channel_layer = get_channel_layer()
-        if not channel_layer:
-            return
-        for ko in kitchen_orders:
-            async_to_sync(channel_layer.group_send)(
-                f"kds_{bill.brand_id}",
-                {'type': 'new_order', 'order_id': ko.id, 'station': ko.station}
-            )
-    except Exception as e:
-        logger.warning(f"KDS WebSocket notification failed: {e}")
+    """Push new KDS cards to tablets over WebSocket. Non-blocking."""
+    from apps.kitchen.services import push_kds_update
+    for ko in kitchen_orders:
+        ko.bill = bill
+        push_kds_update(ko, 'new')
+
+
+def _item_status_rows(bill):
+    """(id, product, status) of every bill item - diagnostic dumps only"""
+    return bill.items.order_by('id').values_list('id', 'product__name', 'status')
 
 
 @login_required
@@ -1590,25 +1479,9 @@ def send_to_kitchen(request, bill_id):
     # Skip if force=1 (cashier confirmed from modal)
     force_send = request.POST.get('force') == '1'
     if not force_send:
-        from apps.pos.models import StoreProductStock
-        stock_warnings = []
-
-        for item in pending_items.select_related('product'):
-            stock_record = StoreProductStock.objects.filter(
-                product_id=item.product_id,
-                brand=bill.brand,
-                is_active=True
-            ).first()
-
-            if stock_record:
-                remaining = stock_record.remaining_stock
-                if remaining < item.quantity:
-                    stock_warnings.append({
-                        'product_name': item.product.name,
-                        'quantity_ordered': item.quantity,
-                        'remaining_stock': max(0, remaining),
-                        'is_out': remaining <= 0,
-                    })
+        from apps.pos.stock import check_stock
+        # All stock records in one query; quantities summed per product
+        stock_warnings = check_stock(bill.brand, pending_items.select_related('product'))
 
         if stock_warnings:
             # Return confirmation modal instead of sending
@@ -1624,89 +1497,64 @@ def send_to_kitchen(request, bill_id):
     try:
         from apps.kitchen.services import create_kitchen_tickets
         
-        print(f"\n{'='*60}")
-        print(f"DEBUG: send_to_kitchen for Bill #{bill.bill_number}")
-        print(f"Total bill items: {bill.items.count()}")
-        print(f"Pending items to send: {pending_items.count()}")
-        
         # Get item IDs before update
         pending_item_ids = list(pending_items.values_list('id', flat=True))
-        print(f"Pending item IDs: {pending_item_ids}")
+        hotlog.debug('send_kitchen.start', bill=bill.bill_number, pending_item_ids=pending_item_ids)
         
-        # Print status of all items BEFORE update
-        print("\nItem status BEFORE update:")
-        for item in bill.items.all():
-            print(f"  - Item #{item.id}: {item.product.name} - Status: {item.status}")
+        # Item status BEFORE update (diagnostic dump, no query unless enabled)
+        hotlog.dump('send_kitchen.item_before', lambda: _item_status_rows(bill))
         
         # IMPORTANT: Update status BEFORE creating kitchen tickets to prevent race condition
         updated_count = pending_items.update(status='sent')
-        print(f"\nUpdated {updated_count} items to 'sent' status")
+        hotlog.debug('send_kitchen.marked_sent', bill=bill.bill_number, updated=updated_count)
 
         # === STOCK DEDUCTION ===
         # Deduct stock from StoreProductStock for items just sent to kitchen
-        from apps.pos.models import StoreProductStock
-        for item in bill.items.filter(id__in=pending_item_ids).select_related('product'):
-            stock_record = StoreProductStock.objects.filter(
-                product_id=item.product_id,
-                brand=bill.brand,
-                is_active=True
-            ).first()
-            if stock_record:
-                stock_record.deduct_stock(item.quantity)
-                print(f"  [Stock] Deducted {item.quantity} from {item.product.name} "
-                      f"(remaining: {stock_record.remaining_stock})")
+        # (single atomic UPDATE, safe with other terminals sending at the same time)
+        from apps.pos.stock import deduct_stock
+        stock_levels = deduct_stock(
+            bill.brand,
+            bill.items.filter(id__in=pending_item_ids).values_list('product_id', 'quantity')
+        )
+        for stock_record in stock_levels.values():
+            hotlog.debug('send_kitchen.stock', product=stock_record.product_name,
+                         remaining=stock_record.remaining_stock)
 
-        # Print status of all items AFTER update
-        print("\nItem status AFTER update:")
-        for item in bill.items.all():
-            print(f"  - Item #{item.id}: {item.product.name} - Status: {item.status}")
+        hotlog.dump('send_kitchen.item_after', lambda: _item_status_rows(bill))
 
         # === KDS DISPLAY: Always create KitchenOrder records ===
         # KDS tablets need data regardless of printer configuration
         from apps.kitchen.services import create_kitchen_orders_for_items
         kitchen_orders = create_kitchen_orders_for_items(bill, item_ids=pending_item_ids)
-        print(f"\n[KDS] Created {len(kitchen_orders)} KitchenOrder(s) for display")
-        for ko in kitchen_orders:
-            print(f"  - KitchenOrder #{ko.id}: station={ko.station}, status={ko.status}")
+        hotlog.debug('send_kitchen.kds_orders', bill=bill.bill_number,
+                     orders=[(ko.id, ko.station) for ko in kitchen_orders])
 
         # Send WebSocket notification to KDS tablets for instant refresh
         if kitchen_orders:
             _notify_kds_new_orders(bill, kitchen_orders)
 
         # Get terminal config for auto print flags
-        from apps.core.models import POSTerminal
-        terminal = None
-        if hasattr(request, 'terminal') and request.terminal:
-            terminal = request.terminal
-        elif 'terminal_id' in request.session:
-            try:
-                terminal = POSTerminal.objects.get(id=request.session['terminal_id'])
-            except POSTerminal.DoesNotExist:
-                pass
+        from apps.core.terminal_resolver import get_request_terminal
+        terminal = get_request_terminal(request)
         
         # Create kitchen tickets ONLY if auto_print_kitchen_order is enabled
         # Kitchen Printer Agent will poll and print these tickets automatically
         tickets = []
         if terminal and terminal.auto_print_kitchen_order:
-            print(f"\n[Auto Print Kitchen] ENABLED - Creating kitchen tickets")
-            print(f"Calling create_kitchen_tickets with item_ids: {pending_item_ids}")
             tickets = create_kitchen_tickets(bill, item_ids=pending_item_ids)
-            print(f"{'='*60}\n")
-            
-            print(f"DEBUG: Created {len(tickets)} kitchen ticket(s) for bill #{bill.bill_number}")
-            for ticket in tickets:
-                print(f"  - Ticket #{ticket.id}: {ticket.printer_target.upper()} ({ticket.items.count()} items)")
+            hotlog.debug('send_kitchen.tickets', bill=bill.bill_number,
+                         tickets=[(t.id, t.printer_target) for t in tickets])
+            hotlog.dump('send_kitchen.ticket', lambda: [(t.id, t.printer_target, t.items.count()) for t in tickets])
         else:
-            print(f"\n[Auto Print Kitchen] DISABLED - Skipping kitchen ticket creation")
-            print(f"Items marked as 'sent' but no tickets created for Kitchen Printer Agent")
-            print(f"{'='*60}\n")
+            # Items are marked as 'sent' but no tickets are created for the Kitchen Printer Agent
+            hotlog.debug('send_kitchen.auto_print_disabled', bill=bill.bill_number)
         
         BillLog.objects.create(
             bill=bill, 
             action='send_kitchen', 
             user=request.user,
             details={
-                'items_count': pending_items.count(),
+                'items_count': updated_count,
                 'tickets_count': len(tickets),
                 'tickets': [t.id for t in tickets] if tickets else [],
                 'kitchen_orders_count': len(kitchen_orders),
@@ -1722,7 +1570,7 @@ def send_to_kitchen(request, bill_id):
         # Show success notification
         notification = {
             "showNotification": {
-                "message": f"✓ Berhasil kirim {pending_items.count()} item ke {len(tickets)} station",
+                "message": f"✓ Berhasil kirim {updated_count} item ke {len(tickets)} station",
                 "type": "success"
             }
         }
@@ -1731,8 +1579,7 @@ def send_to_kitchen(request, bill_id):
         return trigger_client_event(response, 'sentToKitchen')
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        hotlog.exception('send_kitchen.failed', bill=bill_id, error=e)
         return HttpResponse(f'<div class="p-3 bg-red-100 text-red-700 rounded">Error: {str(e)}</div>')
 
 
@@ -1743,17 +1590,14 @@ def payment_modal(request, bill_id):
     bill = get_object_or_404(Bill, id=bill_id)
 
     # Get terminal from session to filter available payment methods
-    terminal = None
+    from apps.core.terminal_resolver import get_request_terminal
     terminal_payment_methods = []
     profiles_data = []
     use_profiles = False
 
-    if 'terminal_id' in request.session:
-        try:
-            terminal = POSTerminal.objects.get(id=request.session['terminal_id'])
-            terminal_payment_methods = terminal.default_payment_methods or []
-        except POSTerminal.DoesNotExist:
-            pass
+    terminal = get_request_terminal(request)
+    if terminal:
+        terminal_payment_methods = terminal.default_payment_methods or []
 
     # Try profile-based payment methods first
     # Priority: 1) Terminal M2M profiles → 2) Company-wide profiles → 3) Legacy hardcoded
@@ -1885,8 +1729,6 @@ def send_receipt_to_local_printer(bill, terminal_id=None):
         import requests
         from datetime import datetime
         
-        print(f"\n[Receipt Print] Starting for Bill #{bill.bill_number}")
-        
         # Prepare receipt data
         receipt_data = {
             'bill_number': bill.bill_number,
@@ -1938,7 +1780,7 @@ def send_receipt_to_local_printer(bill, terminal_id=None):
             
             receipt_data['items'].append(item_data)
         
-        print(f"[Receipt Print] Data prepared: {len(receipt_data['items'])} items")
+        hotlog.debug('receipt_print.prepared', bill=bill.bill_number, items=len(receipt_data['items']))
         
         # Send to local API (use host.docker.internal for Docker to reach host machine)
         local_api_url = 'http://host.docker.internal:5000/api/print/receipt'
@@ -1954,29 +1796,25 @@ def send_receipt_to_local_printer(bill, terminal_id=None):
                 result = response.json()
                 if result.get('success'):
                     print_to = result.get('print_to', 'printer')
-                    if print_to == 'file':
-                        print(f"[Receipt Print] ✅ SUCCESS - Saved to file: {result.get('file_path')}")
-                    else:
-                        print(f"[Receipt Print] ✅ SUCCESS - Printed to: {result.get('printer')}")
+                    hotlog.info('receipt_print.done', bill=bill.bill_number, print_to=print_to,
+                                target=result.get('file_path') if print_to == 'file' else result.get('printer'))
                     return True
                 else:
-                    print(f"[Receipt Print] ❌ FAILED - {result.get('error')}")
+                    hotlog.warning('receipt_print.failed', bill=bill.bill_number, error=result.get('error'))
                     return False
             else:
-                print(f"[Receipt Print] ❌ HTTP {response.status_code}")
+                hotlog.warning('receipt_print.http_error', bill=bill.bill_number, status=response.status_code)
                 return False
                 
         except requests.exceptions.ConnectionError:
-            print(f"[Receipt Print] ⚠️ Local API not running (port 5000)")
+            hotlog.warning('receipt_print.api_unavailable', bill=bill.bill_number, url=local_api_url)
             return False
         except requests.exceptions.Timeout:
-            print(f"[Receipt Print] ⚠️ Request timeout")
+            hotlog.warning('receipt_print.timeout', bill=bill.bill_number, url=local_api_url)
             return False
             
     except Exception as e:
-        print(f"[Receipt Print] ❌ ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        hotlog.exception('receipt_print.error', bill=bill.bill_number, error=e)
         return False
 
 
@@ -1986,52 +1824,34 @@ def send_receipt_to_local_printer(bill, terminal_id=None):
 @require_http_methods(["POST"])
 def process_payment(request, bill_id):
     """Process payment - supports split payment with multiple payment methods"""
-    print(f"\n{'='*50}")
-    print(f"PROCESS PAYMENT CALLED - Bill ID: {bill_id}")
-    print(f"Request method: {request.method}")
-    print(f"User: {request.user}")
-    print(f"{'='*50}\n")
+    hotlog.debug('payment.request', bill=bill_id, user=request.user.username, post_keys=list(request.POST.keys()))
     
     try:
-        # Debug: Log all POST data
-        print(f"\n=== PAYMENT DEBUG ===")
-        print(f"Bill ID: {bill_id}")
-        print(f"POST data: {dict(request.POST)}")
-        print(f"====================\n")
-        
         # Check if bill exists
-        print("Step 1: Checking if bill exists...")
         try:
             bill = Bill.objects.get(id=bill_id)
-            print(f"  ? Bill found: {bill.bill_number}")
         except Bill.DoesNotExist:
-            print(f"  ? Bill not found")
+            hotlog.warning('payment.bill_not_found', bill=bill_id)
             return JsonResponse({
                 'error': f'Bill #{bill_id} not found'
             }, status=404)
         
         # Check if bill is open
-        print(f"Step 2: Checking bill status...")
-        print(f"  Bill status: {bill.status}")
         if bill.status not in ['open', 'hold']:
-            print(f"  ? Bill is not open or hold")
+            hotlog.warning('payment.bill_not_open', bill=bill.bill_number, status=bill.status)
             return JsonResponse({
                 'error': f'Bill #{bill_id} is {bill.status}, cannot process payment'
             }, status=400)
-        print(f"  ? Bill is open or hold")
         
         # Helper function to parse amount (handle comma format)
-        print("Step 3: Defining parse_amount function...")
         def parse_amount(value):
             if not value:
                 return Decimal('0')
             # Remove commas and convert to Decimal
             cleaned = str(value).replace(',', '')
-            print(f"  parse_amount: '{value}' -> '{cleaned}'")
             return Decimal(cleaned)
         
         # Check if this is a split payment (multiple payment methods)
-        print("Step 4: Checking for split payments...")
         payment_count = 0
         total_paid = Decimal('0')
         existing_paid = bill.get_paid_amount()  # Sum of any pre-existing payments
@@ -2071,10 +1891,8 @@ def process_payment(request, bill_id):
             return profile_obj, metadata, '; '.join(ref_parts), eft_desc
 
         # Process split payments array
-        print("Step 5: Processing split payments array...")
         for key in request.POST.keys():
             if key.startswith('payments[') and key.endswith('][method]'):
-                print(f"  Found split payment key: {key}")
                 index = key.split('[')[1].split(']')[0]
                 method = request.POST.get(f'payments[{index}][method]')
                 amount = parse_amount(request.POST.get(f'payments[{index}][amount]', 0))
@@ -2082,7 +1900,7 @@ def process_payment(request, bill_id):
                 profile_id = request.POST.get(f'payments[{index}][profile_id]', '')
                 prompt_data = request.POST.get(f'payments[{index}][prompt_data]', '')
 
-                print(f"  Split payment {index}: method={method}, amount={amount}, ref={reference}")
+                hotlog.debug('payment.split', bill=bill.bill_number, index=index, method=method, amount=amount)
 
                 if amount > 0:
                     profile_obj, metadata, ref_summary, eft_desc = _resolve_profile(profile_id, prompt_data)
@@ -2125,20 +1943,14 @@ def process_payment(request, bill_id):
         profile_id = request.POST.get('profile_id', '')
         prompt_data = request.POST.get('prompt_data', '')
 
-        print(f"Processing current payment...")
-        print(f"  method: {method}")
-        print(f"  amount_raw: {amount_raw} (type: {type(amount_raw)})")
-        print(f"  reference: {reference}")
-
         try:
             amount = parse_amount(amount_raw)
-            print(f"  amount parsed: {amount} (type: {type(amount)})")
         except Exception as e:
-            print(f"ERROR parsing amount: {e}")
+            hotlog.warning('payment.invalid_amount', bill=bill.bill_number, amount=amount_raw, error=e)
             raise
+        hotlog.debug('payment.current', bill=bill.bill_number, method=method, amount=amount)
 
         if amount > 0:
-            print(f"Amount > 0, creating payment...")
             profile_obj, metadata, ref_summary, eft_desc = _resolve_profile(profile_id, prompt_data)
 
             # Cap payment to remaining bill balance (prevents storing cash change as revenue)
@@ -2201,7 +2013,8 @@ def process_payment(request, bill_id):
                     total_paid += dep.amount
                     payment_count += 1
                     profile_name = dep.payment_profile.name if dep.payment_profile else dep.payment_method
-                    print(f"  Applied deposit Rp {dep.amount} ({profile_name}) from {rsv.reservation_code}")
+                    hotlog.info('payment.deposit_applied', bill=bill.bill_number, amount=dep.amount,
+                                profile=profile_name, reservation=rsv.reservation_code)
                 if deposits.exists():
                     BillLog.objects.create(
                         bill=bill,
@@ -2217,8 +2030,7 @@ def process_payment(request, bill_id):
             # Track reservation for completion after bill paid
             rsv_for_completion = Reservation.objects.filter(bill=bill, status='checked_in').first()
         except Exception as e:
-            import logging
-            logging.getLogger(__name__).error(f'Error applying reservation deposit for bill {bill.id}: {e}')
+            hotlog.error('payment.deposit_failed', bill=bill.id, error=e)
 
         # Check if bill is fully paid (now includes deposit)
         if bill.get_remaining() <= 0:
@@ -2239,8 +2051,7 @@ def process_payment(request, bill_id):
                         details={'bill_number': bill.bill_number, 'bill_total': float(bill.total)},
                     )
             except Exception as e:
-                import logging
-                logging.getLogger(__name__).error(f'Error completing reservation for bill {bill.id}: {e}')
+                hotlog.error('payment.reservation_complete_failed', bill=bill.id, error=e)
 
             # Update table status and unjoin if part of group
             if bill.table:
@@ -2288,28 +2099,22 @@ def process_payment(request, bill_id):
             
             # Queue receipt print via Print Agent
             from apps.pos.print_queue import queue_print_receipt
-            print(f"\n[VIEWS] Calling queue_print_receipt for Bill #{bill.bill_number}")
-            print(f"[VIEWS] terminal_id from session: {request.session.get('terminal_id')}")
+            terminal_id = request.session.get('terminal_id')
             try:
-                queue_print_receipt(bill, terminal_id=request.session.get('terminal_id'))
-                print(f"[VIEWS] ✅ queue_print_receipt completed")
+                queue_print_receipt(bill, terminal_id=terminal_id)
             except Exception as e:
-                print(f"[VIEWS] ❌ Print queue failed: {e}")
-                import traceback
-                traceback.print_exc()
+                hotlog.exception('payment.print_queue_failed', bill=bill.bill_number, terminal=terminal_id, error=e)
                 pass  # Don't fail if printing fails
             
             # Send receipt to local printer (POS Launcher)
-            print(f"\n[VIEWS] Calling send_receipt_to_local_printer for Bill #{bill.bill_number}")
             try:
-                send_receipt_to_local_printer(bill, terminal_id=request.session.get('terminal_id'))
-                print(f"[VIEWS] ✅ send_receipt_to_local_printer completed")
+                send_receipt_to_local_printer(bill, terminal_id=terminal_id)
             except Exception as e:
-                print(f"[VIEWS] ❌ Local printer failed: {e}")
-                import traceback
-                traceback.print_exc()
+                hotlog.exception('payment.local_print_failed', bill=bill.bill_number, terminal=terminal_id, error=e)
                 pass  # Don't fail if printing fails
             
+            hotlog.info('payment.closed', bill=bill.bill_number, payments=payment_count, total=bill.total)
+            
             response = render(request, 'pos/partials/payment_success.html', {
                 'bill': bill,
                 'split_payment': payment_count > 1,
@@ -2321,10 +2126,7 @@ def process_payment(request, bill_id):
         return payment_modal(request, bill_id)
         
     except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"ERROR in process_payment: {str(e)}")
-        print(error_detail)
+        hotlog.exception('payment.failed', bill=bill_id, error=e)
         return JsonResponse({
             'error': f'Payment processing failed: {str(e)}'
         }, status=400)
@@ -2550,6 +2352,7 @@ def merge_bills(request):
         # Update target bill guest count
         total_guests = sum([b.guest_count for b in source_bills]) + target_bill.guest_count
         target_bill.guest_count = total_guests
+        target_bill.save(update_fields=['guest_count'])
         
         # Recalculate totals for target bill
         target_bill.calculate_totals()
@@ -3168,18 +2971,9 @@ def shift_open(request):
         
         opening_cash = Decimal(request.POST.get('opening_cash', '0'))
         notes = request.POST.get('notes', '')
-        terminal = request.terminal if hasattr(request, 'terminal') else None
-        
-        # Fallback: Try to get terminal from session
-        if not terminal:
-            terminal_id = request.session.get('terminal_id')
-            if terminal_id:
-                from apps.core.models import POSTerminal
-                try:
-                    terminal = POSTerminal.objects.get(id=terminal_id, is_active=True)
-                    request.terminal = terminal  # Cache for future use
-                except POSTerminal.DoesNotExist:
-                    pass
+        # request.terminal, or the cached terminal from session (attached to request)
+        from apps.core.terminal_resolver import get_request_terminal
+        terminal = get_request_terminal(request)
         
         logger.info(f"Terminal check - Has attr: {hasattr(request, 'terminal')}, Terminal: {terminal}")
         logger.info(f"Opening cash: {opening_cash}, Notes: {notes}")
@@ -1,5 +1,5 @@
 ﻿from django.contrib import admin
-from .models import Promotion, PromotionUsage, PromotionSyncLog
+from .models import Promotion, PromotionUsage, PromotionUsageCounter, PromotionSyncLog
 
 
 @admin.register(Promotion)
@@ -18,6 +18,14 @@ class PromotionUsageAdmin(admin.ModelAdmin):
     readonly_fields = ['used_at']
 
 
+@admin.register(PromotionUsageCounter)
+class PromotionUsageCounterAdmin(admin.ModelAdmin):
+    list_display = ['promotion', 'scope', 'key', 'uses', 'updated_at']
+    list_filter = ['scope']
+    search_fields = ['promotion__code', 'key']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(PromotionSyncLog)
 class PromotionSyncLogAdmin(admin.ModelAdmin):
     list_display = ['sync_type', 'sync_status', 'promotions_received', 'promotions_added', 'promotions_updated', 'started_at', 'duration_seconds']
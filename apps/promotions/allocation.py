@@ -0,0 +1,406 @@
+"""
+Promotion allocation - best non-conflicting combination of promotions
+
+apply_promotions_to_cart used to walk promotions in execution_priority order
+and stop at the first non-stackable success, evaluating every promotion
+against the full cart. It often missed a better discount, and the same units
+could be discounted by several stackable promotions.
+
+PromotionAllocator searches the combinations instead:
+
+- Promotions are applied in execution_stage order (item_level -> cart_level
+  -> payment_level), then by execution_priority
+- item_level promotions consume the units they discount (and the "buy" units
+  of buy X get Y); later item_level promotions only see unconsumed units
+- cart_level/payment_level promotions see the cart net of earlier discounts
+  (minimum purchase and tier thresholds always use the whole net cart)
+- a combination holds any number of stackable promotions and at most one
+  non-stackable promotion
+- depth-first search (include before exclude, so the first answer is the
+  greedy one) with a branch-and-bound cut: current discount + standalone
+  discounts of the remaining promotions must beat the best found so far
+- dominance cut: the "exclude" branch of a promotion is skipped when
+  including it cannot cost the later promotions more than it gives (no unit
+  they need, no minimum purchase / tier threshold crossed, and their loss
+  from the lower net prices is at most its discount)
+- PROMOTION_SOLVER_BUDGET_MS bounds the search; on timeout the best
+  combination found so far is used (result marked not optimal)
+
+Benchmark: python manage.py benchmark_promotions
+"""
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+from .engine import Cart
+
+STAGE_ORDER = {'item_level': 0, 'cart_level': 1, 'payment_level': 2}
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+# Calculators that only look at cart.subtotal, not at the items
+CART_TOTAL_TYPES = frozenset({'threshold_tier', 'payment_discount'})
+
+
+def stage_rank(promotion):
+    """Position of a promotion's execution_stage (unknown stages run with cart_level)"""
+    return STAGE_ORDER.get(promotion.execution_stage, 1)
+
+
+class AllocationState:
+    """
+    Units still free for item_level promotions and discount allocated per cart item
+
+    remaining/allocated are worked out on first access (allocate callable):
+    most states are pruned by their total discount alone.
+    """
+
+    __slots__ = ('_remaining', '_allocated', 'discount', '_allocate')
+
+    def __init__(self, remaining, allocated, discount, allocate=None):
+        self._remaining = remaining  # tuple of int per cart item
+        self._allocated = allocated  # tuple of Decimal per cart item
+        self.discount = discount
+        self._allocate = allocate
+
+    def _resolve(self):
+        self._remaining, self._allocated = self._allocate()
+        self._allocate = None
+
+    @property
+    def remaining(self):
+        if self._allocate is not None:
+            self._resolve()
+        return self._remaining
+
+    @property
+    def allocated(self):
+        if self._allocate is not None:
+            self._resolve()
+        return self._allocated
+
+
+def _thresholds(promotion):
+    """Net cart amounts at which the promotion's discount can jump"""
+    if promotion.promo_type == 'threshold_tier':
+        return tuple(tier['threshold'] for tier in promotion.tiers)
+    if promotion.promo_type in ('amount_discount', 'free_item') and promotion.min_purchase:
+        return (promotion.min_purchase,)
+    return ()
+
+
+def _net_rate(promotion):
+    """
+    Upper bound of the discount lost per rupiah taken off the promotion's base
+    (net value of its items, or the net cart for cart-total types)
+    """
+    promo_type = promotion.promo_type
+    if promo_type in ('percent_discount', 'happy_hour', 'payment_discount'):
+        return promotion.discount_percent / 100
+    if promo_type == 'threshold_tier':
+        return max((t['discount_percent'] for t in promotion.tiers if t['discount_type'] == 'percent'), default=ZERO) / 100
+    if promo_type == 'buy_x_get_y':
+        return promotion.get_discount_percent / 100
+    if promo_type in ('amount_discount', 'combo'):
+        return Decimal('1')
+    return ZERO
+
+
+def _cap(promotion):
+    """Largest discount the promotion can give, if capped (None otherwise)"""
+    if promotion.promo_type in ('percent_discount', 'happy_hour', 'payment_discount'):
+        return promotion.max_discount
+    if promotion.promo_type == 'amount_discount':
+        return promotion.discount_amount
+    return None
+
+
+def _spread(allocated, weights, amount):
+    """Add amount to allocated[i] proportionally to weights {i: weight}"""
+    total = sum(weights.values())
+    if total <= 0:
+        return
+    for index, weight in weights.items():
+        allocated[index] += amount * weight / total
+
+
+class PromotionAllocator:
+    """
+    Find the best combination of promotions for one cart.
+
+    Args:
+        engine: PromotionEngine (its calculators price each promotion)
+        cart: Cart to allocate
+        promotions: Candidate CompiledPromotions (e.g. get_applicable_promotions)
+        budget_ms: Search time budget (default PROMOTION_SOLVER_BUDGET_MS)
+    """
+
+    def __init__(self, engine, cart, promotions, budget_ms=None):
+        self.engine = engine
+        self.cart = cart
+        self.items = list(cart.items)
+        # Stable sort: candidates already come in execution_priority order
+        self.promotions = sorted(promotions, key=lambda p: (stage_rank(p), p.execution_priority))
+        if budget_ms is None:
+            budget_ms = getattr(settings, 'PROMOTION_SOLVER_BUDGET_MS', 50)
+        self.budget = budget_ms / 1000
+        self.nodes = 0
+        self.timed_out = False
+        self.best_state = None
+        self.best_results = []
+        # Cart item indices each promotion's calculator can use
+        self._relevant = {id(p): self._relevant_items(p) for p in self.promotions}
+
+    def _relevant_items(self, promotion):
+        if promotion.promo_type in CART_TOTAL_TYPES:
+            return ()
+        if promotion.promo_type == 'free_item':
+            return tuple(i for i, item in enumerate(self.items) if item.product_id == promotion.free_product_id)
+        scope = promotion.scope
+        return tuple(i for i, item in enumerate(self.items) if scope.matches(item.product_id, item.category_id))
+
+    # ------------------------------------------------------------------
+    # Evaluation of one promotion on top of a partial allocation
+    # ------------------------------------------------------------------
+
+    def evaluate(self, promotion, state):
+        """(PromotionResult, new AllocationState or None if no discount)"""
+        item_stage = stage_rank(promotion) == 0
+        net_subtotal = self.cart.subtotal - state.discount
+        if net_subtotal <= 0:
+            return None, None
+
+        positions = {}
+        residual_items = []
+        for index in self._relevant[id(promotion)]:
+            item = self.items[index]
+            # Calculators only read items, so untouched lines are passed as is
+            if item_stage:
+                quantity = state.remaining[index]
+                if quantity <= 0:
+                    continue
+                residual = item if quantity == item.quantity else item.with_quantity(quantity)
+            else:
+                allocated = state.allocated[index]
+                if allocated >= item.subtotal:
+                    continue
+                residual = item if not allocated else item.with_quantity(
+                    item.quantity, (item.subtotal - allocated) / item.quantity
+                )
+            positions[id(residual)] = index
+            residual_items.append(residual)
+        if not residual_items and promotion.promo_type not in CART_TOTAL_TYPES:
+            return None, None
+
+        residual_cart = Cart(residual_items, self.cart.brand, self.cart.store)
+        # Minimum purchase / tier thresholds look at the whole net cart
+        residual_cart.subtotal = net_subtotal
+        result = self.engine.calculate_promotion(promotion, residual_cart)
+        if not result.success:
+            return result, None
+        # Net prices have long fractions; discounts are kept to cents
+        result.discount_amount = min(result.discount_amount, net_subtotal).quantize(CENT, ROUND_HALF_UP)
+        if result.discount_amount <= 0:
+            return result, None
+
+        def allocate():
+            remaining = list(state.remaining)
+            allocated = list(state.allocated)
+            self._allocate(promotion, result, item_stage, residual_items, positions, remaining, allocated)
+            return tuple(remaining), tuple(allocated)
+
+        return result, AllocationState(None, None, state.discount + result.discount_amount, allocate)
+
+    def _allocate(self, promotion, result, item_stage, residual_items, positions, remaining, allocated):
+        """Consume units (item_level only) and spread the discount over cart items"""
+        amount = result.discount_amount
+        explicit = {}  # index -> discount reported by the calculator
+        weights = {}  # index -> value the discount applies to
+
+        if promotion.promo_type == 'free_item':
+            # The free product (one unit) carries the discount
+            free_item = next((i for i in residual_items if i.product_id == promotion.free_product_id), None)
+            if free_item is not None:
+                index = positions[id(free_item)]
+                if item_stage:
+                    remaining[index] -= 1
+                weights[index] = free_item.price
+
+        for entry in result.affected_items:
+            if isinstance(entry, dict):
+                item, units, discount = entry['item'], entry.get('discount_qty'), entry.get('discount')
+            else:
+                item, units, discount = entry, None, None
+            index = positions.get(id(item))
+            if index is None:
+                continue
+            units = item.quantity if units is None else units
+            if item_stage:
+                remaining[index] -= units
+            weights[index] = weights.get(index, ZERO) + item.price * units
+            if discount is not None:
+                explicit[index] = explicit.get(index, ZERO) + discount
+
+        if item_stage and promotion.promo_type == 'buy_x_get_y' and promotion.get_qty:
+            # The "buy" units of each set are used up too, most expensive first
+            free_units = sum(e.get('discount_qty', 0) for e in result.affected_items if isinstance(e, dict))
+            buy_units = (free_units // promotion.get_qty) * promotion.buy_qty
+            qualifying = sorted(
+                (i for i in residual_items if promotion.scope.matches(i.product_id, i.category_id)),
+                key=lambda i: i.price, reverse=True
+            )
+            for item in qualifying:
+                if buy_units <= 0:
+                    break
+                index = positions[id(item)]
+                units = min(remaining[index], buy_units)
+                remaining[index] -= units
+                buy_units -= units
+
+        explicit_total = sum(explicit.values())
+        if explicit_total > 0:
+            # Calculator's per-item split, scaled to the capped total
+            _spread(allocated, explicit, amount)
+        elif weights:
+            _spread(allocated, weights, amount)
+        else:
+            # Cart-wide promotion: spread over the net value of every item
+            _spread(allocated, {
+                index: item.subtotal - allocated[index] for index, item in enumerate(self.items)
+                if item.subtotal > allocated[index]
+            }, amount)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def solve(self):
+        """
+        Run the search.
+
+        Returns:
+            (results, total_discount): PromotionResults of the best
+            combination in application order, and their total discount
+        """
+        start = time.perf_counter()
+        self.deadline = start + self.budget
+        root = AllocationState(
+            tuple(item.quantity for item in self.items),
+            tuple(ZERO for _ in self.items),
+            ZERO,
+        )
+        self.best_state = root
+
+        # Standalone discounts on the full cart: drop promotions that give
+        # nothing, and use the rest as optimistic bounds
+        self.candidates = []
+        standalone = []
+        for promotion in self.promotions:
+            result, state = self.evaluate(promotion, root)
+            if state is not None:
+                self.candidates.append(promotion)
+                standalone.append(result.discount_amount)
+
+        count = len(self.candidates)
+        self._item_stage = [stage_rank(p) == 0 for p in self.candidates]
+        self._cart_total = [p.promo_type in CART_TOTAL_TYPES for p in self.candidates]
+        self._thresholds = [_thresholds(p) for p in self.candidates]
+        self._rates = [_net_rate(p) for p in self.candidates]
+        self._caps = [_cap(p) for p in self.candidates]
+        # Any non-stackable promotion from position k on
+        self._exclusive_from = [False] * (count + 1)
+        for k in range(count - 1, -1, -1):
+            self._exclusive_from[k] = self._exclusive_from[k + 1] or not self.candidates[k].is_stackable
+        self._stackable_suffix = [ZERO] * (count + 1)
+        self._exclusive_suffix = [ZERO] * (count + 1)
+        for k in range(count - 1, -1, -1):
+            stackable = self.candidates[k].is_stackable
+            self._stackable_suffix[k] = self._stackable_suffix[k + 1] + (standalone[k] if stackable else ZERO)
+            self._exclusive_suffix[k] = max(self._exclusive_suffix[k + 1], ZERO if stackable else standalone[k])
+
+        self._search(0, root, [], False)
+        self.elapsed_ms = (time.perf_counter() - start) * 1000
+        return list(self.best_results), self.best_state.discount
+
+    def _search(self, k, state, chosen, has_exclusive):
+        if state.discount > self.best_state.discount:
+            self.best_state = state
+            self.best_results = list(chosen)
+        if k == len(self.candidates):
+            return
+
+        bound = state.discount + self._stackable_suffix[k] + (ZERO if has_exclusive else self._exclusive_suffix[k])
+        if bound <= self.best_state.discount:
+            return
+        if time.perf_counter() > self.deadline:
+            self.timed_out = True
+            return
+
+        promotion = self.candidates[k]
+        if promotion.is_stackable or not has_exclusive:
+            self.nodes += 1
+            result, new_state = self.evaluate(promotion, state)
+            if new_state is not None:
+                chosen.append(result)
+                self._search(k + 1, new_state, chosen, has_exclusive or not promotion.is_stackable)
+                chosen.pop()
+                if self._include_dominates(k, state, new_state):
+                    return
+        self._search(k + 1, state, chosen, has_exclusive)
+
+    def _include_dominates(self, k, state, new_state):
+        """
+        True when any combination of the later promotions does at least as
+        well after candidate k as without it, so the exclude branch is moot
+        """
+        promotion = self.candidates[k]
+        if not promotion.is_stackable and self._exclusive_from[k + 1]:
+            return False  # it would block a later non-stackable promotion
+        gain = new_state.discount - state.discount
+        net_before = self.cart.subtotal - state.discount
+        net_after = net_before - gain
+        # Lowest net cart any later combination can reach
+        later_max = self._stackable_suffix[k + 1] + self._exclusive_suffix[k + 1]
+        floor = net_after - later_max
+
+        consumed = ()
+        if self._item_stage[k]:
+            consumed = {i for i, (old, new) in enumerate(zip(state.remaining, new_state.remaining)) if new < old}
+
+        loss = ZERO
+        for j in range(k + 1, len(self.candidates)):
+            if any(floor < threshold <= net_before for threshold in self._thresholds[j]):
+                return False  # a minimum purchase / tier could be missed
+            relevant = self._relevant[id(self.candidates[j])]
+            if self._item_stage[j] and not self._cart_total[j]:
+                # Original prices, remaining units: only shared units matter
+                if consumed and not consumed.isdisjoint(relevant):
+                    return False
+                continue
+            rate = self._rates[j]
+            if not rate:
+                continue
+            if self._cart_total[j]:
+                delta, base = gain, floor
+            else:
+                delta = sum(new_state.allocated[i] - state.allocated[i] for i in relevant)
+                if delta <= 0:
+                    continue
+                base = sum(self.items[i].subtotal - new_state.allocated[i] for i in relevant) - later_max
+            cap = self._caps[j]
+            if cap and rate * base >= cap:
+                continue  # stays at its cap whatever happens
+            loss += rate * delta
+            if loss > gain:
+                return False
+        return True
+
+    def apply_item_discounts(self):
+        """Write the best allocation to cart items (discount_amount, final_price/subtotal)"""
+        if self.best_state is None:
+            return
+        for item, discount in zip(self.items, self.best_state.allocated):
+            item.discount_amount = discount
+            item.final_subtotal = item.subtotal - discount
+            item.final_price = item.final_subtotal / item.quantity if item.quantity else item.price
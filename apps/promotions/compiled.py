@@ -0,0 +1,327 @@
+"""
+Compiled promotion sets per brand
+
+PromotionEngine used to query Promotion for every cart evaluation and each
+calculator re-parsed rules_json/scope_json (json.loads) several times per
+promotion, matching items with linear `in` checks on JSON lists.
+
+A CompiledPromotionSet holds a brand's active promotions with rules and scope
+parsed once into typed values (Decimal amounts, int quantities, frozenset
+scopes) plus a product/category -> candidate promotions index. Sets are cached
+per process, so cart evaluation needs no database access in steady state.
+
+Invalidation:
+- Promotion save()/delete() and PromotionSyncLog completion call
+  invalidate_promotions() (HO sync goes through update_or_create -> save)
+- a version number in the shared Django cache tells other worker processes
+  to rebuild on their next evaluation; it is bumped on transaction commit,
+  so no worker caches pre-commit promotions
+- PROMOTION_CACHE_TTL seconds as a safety net for queryset.update() writes
+
+Date and time windows are checked at evaluation time in local time
+(TIME_ZONE, like the per-day usage counters and apply_promotion), so a cached
+set stays correct across midnight and happy-hour boundaries.
+"""
+import json
+import logging
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'promotions:version'
+
+_lock = threading.Lock()
+_sets = {}  # str(brand_id) -> CompiledPromotionSet
+
+
+def _parse_json(value, default):
+    if not value:
+        return default
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _decimal(value, default=Decimal('0')):
+    if value is None or value == '':
+        return default
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return default
+
+
+def _int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _ids(values):
+    return frozenset(str(v) for v in (values or []))
+
+
+class PromotionScope:
+    """Parsed scope_json: which cart items a promotion applies to"""
+
+    __slots__ = ('apply_to', 'products', 'categories', 'exclude_products', 'exclude_categories')
+
+    def __init__(self, scope):
+        self.apply_to = scope.get('apply_to', 'all')
+        self.products = _ids(scope.get('products'))
+        self.categories = _ids(scope.get('categories'))
+        self.exclude_products = _ids(scope.get('exclude_products'))
+        self.exclude_categories = _ids(scope.get('exclude_categories'))
+
+    def matches(self, product_id, category_id):
+        """Same rules as the former PromotionEngine._item_matches_scope"""
+        if self.apply_to == 'all':
+            return product_id not in self.exclude_products and category_id not in self.exclude_categories
+        if self.apply_to == 'category':
+            return category_id in self.categories
+        if self.apply_to == 'product':
+            return product_id in self.products
+        return False
+
+
+class CompiledPromotion:
+    """
+    Read-only promotion with parsed rules/scope.
+
+    Exposes the Promotion fields the engine and API responses use (id, code,
+    name, promo_type, execution_stage, is_stackable, ...), so it can stand in
+    for the model instance in PromotionResult.
+    """
+
+    def __init__(self, promotion):
+        self.id = promotion.id
+        self.pk = promotion.pk
+        self.brand_id = promotion.brand_id
+        self.code = promotion.code
+        self.name = promotion.name
+        self.description = promotion.description
+        self.promo_type = promotion.promo_type
+        self.execution_stage = promotion.execution_stage
+        self.execution_priority = promotion.execution_priority
+        self.is_auto_apply = promotion.is_auto_apply
+        self.is_stackable = promotion.is_stackable
+        self.member_only = promotion.member_only
+        self.require_voucher = promotion.require_voucher
+        self.start_date = promotion.start_date
+        self.end_date = promotion.end_date
+        self.time_start = promotion.time_start
+        self.time_end = promotion.time_end
+        self.max_uses = promotion.max_uses
+        self.max_uses_per_day = promotion.max_uses_per_day
+        self.max_uses_per_customer = promotion.max_uses_per_customer
+        self.current_uses = promotion.current_uses
+
+        # Raw dicts, for API responses
+        self.rules = _parse_json(promotion.rules_json, {})
+        self.scope_data = _parse_json(promotion.scope_json, {})
+        self.scope = PromotionScope(self.scope_data)
+
+        rules = self.rules
+        # percent_discount / happy_hour / payment_discount
+        self.discount_percent = _decimal(rules.get('discount_percent'))
+        self.max_discount = _decimal(rules.get('max_discount_amount'), None) or None
+        # amount_discount
+        self.discount_amount = _decimal(rules.get('discount_amount'))
+        self.min_purchase = _decimal(rules.get('min_purchase_amount'))
+        # buy_x_get_y
+        self.buy_qty = _int(rules.get('buy_quantity'))
+        self.get_qty = _int(rules.get('get_quantity'))
+        self.get_discount_percent = _decimal(rules.get('get_discount_percent'), Decimal('100'))
+        # combo
+        self.required_qty = _int(rules.get('required_quantity'))
+        self.combo_price = _decimal(rules.get('combo_price'))
+        # free_item
+        free_product_id = rules.get('free_product_id')
+        self.free_product_id = str(free_product_id) if free_product_id else None
+        self.free_product_price = _decimal(rules.get('free_product_price'))
+        # payment_discount
+        self.payment_methods = tuple(rules.get('payment_methods') or ())
+        # threshold_tier: highest threshold first
+        self.tiers = tuple(sorted(
+            (
+                {
+                    'threshold': _decimal(tier.get('threshold')),
+                    'discount_type': tier.get('discount_type', 'percent'),
+                    'discount_percent': _decimal(tier.get('discount_percent')),
+                    'discount_amount': _decimal(tier.get('discount_amount')),
+                }
+                for tier in (rules.get('tiers') or [])
+            ),
+            key=lambda tier: tier['threshold'],
+            reverse=True,
+        ))
+
+    def __repr__(self):
+        return f"<CompiledPromotion {self.code}>"
+
+    def is_valid_at(self, today, current_time):
+        """Date range, time window and total usage limit"""
+        if not (self.start_date <= today <= self.end_date):
+            return False
+        if self.time_start and self.time_end and not (self.time_start <= current_time <= self.time_end):
+            return False
+        if self.max_uses and self.current_uses >= self.max_uses:
+            return False
+        return True
+
+
+def compile_promotion(promotion):
+    """CompiledPromotion for a Promotion instance (returned as is if already compiled)"""
+    if isinstance(promotion, CompiledPromotion):
+        return promotion
+    return CompiledPromotion(promotion)
+
+
+class CompiledPromotionSet:
+    """Active promotions of one brand, in execution order, with a scope index"""
+
+    def __init__(self, brand_id, promotions, version):
+        self.brand_id = str(brand_id) if brand_id else None
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+        # Ordered by execution_priority, execution_stage (the former queryset order)
+        self.promotions = promotions
+        self.by_id = {str(p.id): p for p in promotions}
+        self._position = {p.id: index for index, p in enumerate(promotions)}
+        self._universal = []
+        self._by_product = {}
+        self._by_category = {}
+        for promo in promotions:
+            scope = promo.scope
+            if scope.apply_to == 'all':
+                self._universal.append(promo)
+            elif scope.apply_to == 'product':
+                for product_id in scope.products:
+                    self._by_product.setdefault(product_id, []).append(promo)
+            elif scope.apply_to == 'category':
+                for category_id in scope.categories:
+                    self._by_category.setdefault(category_id, []).append(promo)
+
+    def active(self, now=None):
+        """Promotions valid right now (dates, time window, usage limit), local time"""
+        now = timezone.localtime(now)
+        today, current_time = now.date(), now.time()
+        return [p for p in self.promotions if p.is_valid_at(today, current_time)]
+
+    def candidates(self, items, now=None, customer_id=None, customer_phone='', exhausted=None):
+        """
+        Valid promotions that apply to at least one of the items, in execution order
+
+        Args:
+            items: Objects with product_id/category_id (str), e.g. CartItems
+            customer_id / customer_phone: Customer, for max_uses_per_customer
+            exhausted: Ids of promotions with a used-up per-day/per-customer
+                limit, if already known (default: read from the usage counters)
+        """
+        found = {p.id: p for p in self._universal}
+        for item in items:
+            for promo in self._by_product.get(item.product_id, ()):
+                found[promo.id] = promo
+            if item.category_id:
+                for promo in self._by_category.get(item.category_id, ()):
+                    found[promo.id] = promo
+        if not found:
+            return []
+
+        now = timezone.localtime(now)
+        today, current_time = now.date(), now.time()
+        valid = [p for p in found.values() if p.is_valid_at(today, current_time)]
+        if exhausted is None:
+            from .usage import exhausted_promotion_ids
+            exhausted = exhausted_promotion_ids(valid, customer_id, customer_phone, today)
+        return sorted(
+            (p for p in valid if p.id not in exhausted),
+            key=lambda p: self._position[p.id]
+        )
+
+
+def _shared_version():
+    """Promotion version in the shared cache (0 if unavailable)"""
+    try:
+        return cache.get(VERSION_CACHE_KEY, 0)
+    except Exception as e:
+        logger.debug(f"Promotion version lookup failed: {e}")
+        return 0
+
+
+def _load(brand_id, version):
+    from apps.promotions.models import Promotion
+
+    start = time.perf_counter()
+    promotions = [
+        CompiledPromotion(promo) for promo in Promotion.objects.filter(
+            brand_id=brand_id,
+            is_active=True,
+            end_date__gte=timezone.localdate(),
+        ).order_by('execution_priority', 'execution_stage')
+    ]
+    logger.info(
+        f"Promotion set compiled for brand {brand_id}: {len(promotions)} promotions "
+        f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    return CompiledPromotionSet(brand_id, promotions, version)
+
+
+def get_promotion_set(brand):
+    """
+    Return the CompiledPromotionSet of a brand, rebuilding it if stale
+
+    Args:
+        brand: Brand instance or brand id (None gives an empty set)
+    """
+    if not brand:
+        return CompiledPromotionSet(None, [], None)
+    brand_id = str(getattr(brand, 'pk', brand))
+    version = _shared_version()
+    ttl = getattr(settings, 'PROMOTION_CACHE_TTL', 300)
+
+    promo_set = _sets.get(brand_id)
+    if promo_set is not None and promo_set.version == version and time.monotonic() - promo_set.loaded_at < ttl:
+        return promo_set
+
+    with _lock:
+        promo_set = _sets.get(brand_id)
+        if promo_set is None or promo_set.version != version or time.monotonic() - promo_set.loaded_at >= ttl:
+            promo_set = _load(brand_id, version)
+            _sets[brand_id] = promo_set
+    return promo_set
+
+
+def invalidate_promotions():
+    """
+    Drop compiled promotion sets here and in every other worker process
+
+    Runs once the current transaction commits; a worker rebuilding before
+    that would cache pre-commit promotions under the new version.
+    """
+    transaction.on_commit(_invalidate)
+
+
+def _invalidate():
+    with _lock:
+        _sets.clear()
+    try:
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            # Key missing (first invalidation or cache flushed)
+            cache.set(VERSION_CACHE_KEY, 1, None)
+    except Exception as e:
+        logger.warning(f"Promotion version bump failed, other workers reload after TTL: {e}")
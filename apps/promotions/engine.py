@@ -1,12 +1,16 @@
 """
 Promotion Engine - Calculate and apply promotions to cart
 All logic in Python (not JavaScript) for consistency between testing and POS
+
+Promotions are evaluated from the brand's cached CompiledPromotionSet
+(apps.promotions.compiled): rules and scope are parsed once, not per call.
 """
 from decimal import Decimal
 from typing import List, Dict, Any, Tuple
+
 from django.utils import timezone
-from django.db.models import Q
-import json
+
+from .compiled import CompiledPromotion, compile_promotion, get_promotion_set
 
 
 class CartItem:
@@ -23,22 +27,65 @@ class CartItem:
         self.discount_amount = Decimal('0')
         self.final_price = self.price
         self.final_subtotal = self.subtotal
+    
+    @classmethod
+    def from_product(cls, product, quantity=1, price=None):
+        """CartItem for a catalog Product (Decimal price used as is, no string conversions)"""
+        item = cls.__new__(cls)
+        item.product_id = str(product.id)
+        item.product_name = product.name
+        item.sku = product.sku
+        item.price = product.price if price is None else price
+        item.quantity = quantity
+        item.category_id = str(product.category_id) if product.category_id else None
+        item.subtotal = item.price * quantity
+        item.applied_promotions = []
+        item.discount_amount = Decimal('0')
+        item.final_price = item.price
+        item.final_subtotal = item.subtotal
+        return item
+    
+    def with_quantity(self, quantity, price=None):
+        """Copy of this item with another quantity (and unit price), for partial evaluation"""
+        item = CartItem.__new__(CartItem)
+        item.__dict__.update(self.__dict__)
+        item.quantity = quantity
+        if price is not None:
+            item.price = price
+        item.subtotal = item.price * quantity
+        item.applied_promotions = []
+        item.discount_amount = Decimal('0')
+        item.final_price = item.price
+        item.final_subtotal = item.subtotal
+        return item
 
 
 class Cart:
     """Represents shopping cart"""
-    def __init__(self, items: List[CartItem], brand, store):
+    def __init__(self, items: List[CartItem], brand, store, customer_id=None, customer_phone=''):
         self.items = items
         self.brand = brand
         self.store = store
+        # Customer, for max_uses_per_customer
+        self.customer_id = customer_id
+        self.customer_phone = customer_phone
         self.subtotal = sum(item.subtotal for item in items)
         self.discount_amount = Decimal('0')
         self.total = self.subtotal
         self.applied_promotions = []
 
+    @classmethod
+    def from_bill(cls, bill):
+        """Cart of a POS bill's non-void items (unit price incl. modifiers)"""
+        items = [
+            CartItem.from_product(item.product, item.quantity, item.unit_price + item.modifier_price)
+            for item in bill.items.filter(is_void=False).select_related('product')
+        ]
+        return cls(items, bill.brand, bill.store, customer_phone=bill.customer_phone)
+
 
 class PromotionResult:
-    """Result of promotion calculation"""
+    """Result of promotion calculation (promotion is a CompiledPromotion)"""
     def __init__(self, promotion, discount_amount, affected_items=None, message=''):
         self.promotion = promotion
         self.discount_amount = Decimal(str(discount_amount))
@@ -56,83 +103,35 @@ class PromotionEngine:
         self.brand = brand
         self.store = store
     
-    def get_applicable_promotions(self, cart: Cart) -> List:
-        """Get all promotions that could apply to this cart"""
-        from apps.promotions.models import Promotion
-        
-        now = timezone.now()
-        today = now.date()
-        current_time = now.time()
-        
-        # Get active promotions
-        promotions = Promotion.objects.filter(
-            brand=self.brand,
-            is_active=True,
-            start_date__lte=today,
-            end_date__gte=today
-        ).order_by('execution_priority', 'execution_stage')
-        
-        # Filter by time if specified
-        applicable = []
-        for promo in promotions:
-            # Check time range
-            if promo.time_start and promo.time_end:
-                if not (promo.time_start <= current_time <= promo.time_end):
-                    continue
-            
-            # Check usage limits
-            if promo.max_uses and promo.current_uses >= promo.max_uses:
-                continue
-            
-            # Check if promotion applies to cart items
-            if self._promotion_applies_to_cart(promo, cart):
-                applicable.append(promo)
-        
-        return applicable
+    def get_applicable_promotions(self, cart: Cart) -> List[CompiledPromotion]:
+        """
+        Get all promotions that could apply to this cart
+        (valid now, usage left, scope matches at least one item)
+        """
+        return get_promotion_set(self.brand).candidates(
+            cart.items, customer_id=cart.customer_id, customer_phone=cart.customer_phone
+        )
     
     def _promotion_applies_to_cart(self, promotion, cart: Cart) -> bool:
         """Check if promotion applies to any items in cart"""
-        scope = promotion.get_scope()
-        apply_to = scope.get('apply_to', 'all')
-        
-        if apply_to == 'all':
+        scope = compile_promotion(promotion).scope
+        if scope.apply_to == 'all':
             return True
-        
-        # Check if any cart item matches scope
-        for item in cart.items:
-            if self._item_matches_scope(item, scope):
-                return True
-        
-        return False
+        return any(self._item_matches_scope(item, scope) for item in cart.items)
     
-    def _item_matches_scope(self, item: CartItem, scope: Dict) -> bool:
-        """Check if item matches promotion scope"""
-        apply_to = scope.get('apply_to', 'all')
-        
-        if apply_to == 'all':
-            # Check exclusions
-            excluded_products = scope.get('exclude_products', [])
-            if item.product_id in excluded_products:
-                return False
-            
-            excluded_categories = scope.get('exclude_categories', [])
-            if item.category_id in excluded_categories:
-                return False
-            
-            return True
-        
-        elif apply_to == 'category':
-            categories = scope.get('categories', [])
-            return item.category_id in categories
-        
-        elif apply_to == 'product':
-            products = scope.get('products', [])
-            return item.product_id in products
-        
-        return False
+    def _item_matches_scope(self, item: CartItem, scope) -> bool:
+        """Check if item matches promotion scope (PromotionScope)"""
+        return scope.matches(item.product_id, item.category_id)
     
     def calculate_promotion(self, promotion, cart: Cart) -> PromotionResult:
-        """Calculate discount for a specific promotion"""
+        """
+        Calculate discount for a specific promotion
+        
+        Args:
+            promotion: CompiledPromotion (a Promotion instance is compiled first)
+            cart: Cart to evaluate
+        """
+        promotion = compile_promotion(promotion)
         promo_type = promotion.promo_type
         
         # Route to specific calculator based on type
@@ -161,11 +160,9 @@ class PromotionEngine:
     
     def _calculate_percent_discount(self, promotion, cart: Cart) -> PromotionResult:
         """Calculate percent discount (e.g., 20% off)"""
-        rules = promotion.get_rules()
-        scope = promotion.get_scope()
-        
-        discount_percent = Decimal(str(rules.get('discount_percent', 0)))
-        max_discount = rules.get('max_discount_amount')
+        scope = promotion.scope
+        discount_percent = promotion.discount_percent
+        max_discount = promotion.max_discount
         
         if discount_percent <= 0:
             return PromotionResult(promotion, 0, message='Invalid discount percent')
@@ -184,8 +181,8 @@ class PromotionEngine:
                 })
         
         # Apply max discount cap
-        if max_discount and total_discount > Decimal(str(max_discount)):
-            total_discount = Decimal(str(max_discount))
+        if max_discount and total_discount > max_discount:
+            total_discount = max_discount
         
         message = f'{discount_percent}% discount'
         if max_discount:
@@ -195,17 +192,15 @@ class PromotionEngine:
     
     def _calculate_amount_discount(self, promotion, cart: Cart) -> PromotionResult:
         """Calculate fixed amount discount (e.g., Rp 10,000 off)"""
-        rules = promotion.get_rules()
-        scope = promotion.get_scope()
-        
-        discount_amount = Decimal(str(rules.get('discount_amount', 0)))
-        min_purchase = rules.get('min_purchase_amount', 0)
+        scope = promotion.scope
+        discount_amount = promotion.discount_amount
+        min_purchase = promotion.min_purchase
         
         if discount_amount <= 0:
             return PromotionResult(promotion, 0, message='Invalid discount amount')
         
         # Check minimum purchase
-        if min_purchase and cart.subtotal < Decimal(str(min_purchase)):
+        if min_purchase and cart.subtotal < min_purchase:
             return PromotionResult(
                 promotion, 0, 
                 message=f'Minimum purchase Rp {min_purchase:,.0f} required'
@@ -232,12 +227,10 @@ class PromotionEngine:
     
     def _calculate_buy_x_get_y(self, promotion, cart: Cart) -> PromotionResult:
         """Calculate Buy X Get Y discount (e.g., Buy 2 Get 1 Free)"""
-        rules = promotion.get_rules()
-        scope = promotion.get_scope()
-        
-        buy_qty = int(rules.get('buy_quantity', 0))
-        get_qty = int(rules.get('get_quantity', 0))
-        get_discount_percent = Decimal(str(rules.get('get_discount_percent', 100)))  # 100 = free
+        scope = promotion.scope
+        buy_qty = promotion.buy_qty
+        get_qty = promotion.get_qty
+        get_discount_percent = promotion.get_discount_percent  # 100 = free
         
         if buy_qty <= 0 or get_qty <= 0:
             return PromotionResult(promotion, 0, message='Invalid buy/get quantities')
@@ -297,11 +290,9 @@ class PromotionEngine:
     
     def _calculate_combo(self, promotion, cart: Cart) -> PromotionResult:
         """Calculate combo deal (e.g., 3 items for special price)"""
-        rules = promotion.get_rules()
-        scope = promotion.get_scope()
-        
-        required_qty = int(rules.get('required_quantity', 0))
-        combo_price = Decimal(str(rules.get('combo_price', 0)))
+        scope = promotion.scope
+        required_qty = promotion.required_qty
+        combo_price = promotion.combo_price
         
         if required_qty <= 0 or combo_price <= 0:
             return PromotionResult(promotion, 0, message='Invalid combo configuration')
@@ -327,29 +318,72 @@ class PromotionEngine:
                 message=f'Need {required_qty} items for combo'
             )
         
-        # Calculate normal price for combo items
-        normal_price_per_combo = sum(
-            item.price * min(item.quantity, required_qty)
-            for item in applicable_items
+        # Each combo is required_qty units, most expensive units first;
+        # a combo only discounts when its units cost more than combo_price.
+        # Units are walked as [price, item, remaining] runs, never one by one
+        # (quantities come from API requests)
+        runs = sorted(
+            ([item.price, item, item.quantity] for item in applicable_items),
+            key=lambda run: run[0], reverse=True
         )
-        
-        # Calculate discount
-        total_discount = (normal_price_per_combo - combo_price) * num_combos
-        
-        if total_discount < 0:
-            total_discount = Decimal('0')
+        total_discount = Decimal('0')
+        per_item = {}  # id(item) -> [item, units, discount]
+        combos_left = num_combos
+        index = 0
+        while combos_left:
+            price, item, remaining = runs[index]
+            whole = min(remaining // required_qty, combos_left)
+            if whole:
+                # Combos entirely within this run all discount the same
+                combo_discount = price * required_qty - combo_price
+                if combo_discount <= 0:
+                    break
+                total_discount += combo_discount * whole
+                entry = per_item.setdefault(id(item), [item, 0, Decimal('0')])
+                entry[1] += required_qty * whole
+                entry[2] += combo_discount * whole
+                runs[index][2] -= required_qty * whole
+                combos_left -= whole
+                if not runs[index][2]:
+                    index += 1
+                continue
+            
+            # One combo spanning the end of this run and the next ones
+            combo_units = []  # (price, item, units)
+            needed = required_qty
+            while needed:
+                price, item, remaining = runs[index]
+                take = min(remaining, needed)
+                combo_units.append((price, item, take))
+                needed -= take
+                runs[index][2] -= take
+                if not runs[index][2]:
+                    index += 1
+            normal_price = sum(price * units for price, _, units in combo_units)
+            if normal_price <= combo_price:
+                break
+            combo_discount = normal_price - combo_price
+            total_discount += combo_discount
+            for price, item, units in combo_units:
+                entry = per_item.setdefault(id(item), [item, 0, Decimal('0')])
+                entry[1] += units
+                entry[2] += combo_discount * price * units / normal_price
+            combos_left -= 1
+        
+        affected_items = [
+            {'item': item, 'discount_qty': qty, 'discount': discount}
+            for item, qty, discount in per_item.values()
+        ]
         
         message = f'{required_qty} items for Rp {combo_price:,.0f}'
         
-        return PromotionResult(promotion, total_discount, applicable_items, message)
+        return PromotionResult(promotion, total_discount, affected_items, message)
     
     def _calculate_free_item(self, promotion, cart: Cart) -> PromotionResult:
         """Calculate free item promotion"""
-        rules = promotion.get_rules()
-        
-        min_purchase = Decimal(str(rules.get('min_purchase_amount', 0)))
-        free_product_id = rules.get('free_product_id')
-        free_product_price = Decimal(str(rules.get('free_product_price', 0)))
+        min_purchase = promotion.min_purchase
+        free_product_id = promotion.free_product_id
+        free_product_price = promotion.free_product_price
         
         if cart.subtotal < min_purchase:
             return PromotionResult(
@@ -380,18 +414,16 @@ class PromotionEngine:
     
     def _calculate_payment_discount(self, promotion, cart: Cart) -> PromotionResult:
         """Calculate payment method discount"""
-        rules = promotion.get_rules()
-        
-        discount_percent = Decimal(str(rules.get('discount_percent', 0)))
-        max_discount = rules.get('max_discount_amount')
-        payment_methods = rules.get('payment_methods', [])
+        discount_percent = promotion.discount_percent
+        max_discount = promotion.max_discount
+        payment_methods = promotion.payment_methods
         
         # This will be applied at payment stage
         # For now, just calculate potential discount
         discount = cart.subtotal * (discount_percent / 100)
         
-        if max_discount and discount > Decimal(str(max_discount)):
-            discount = Decimal(str(max_discount))
+        if max_discount and discount > max_discount:
+            discount = max_discount
         
         message = f'{discount_percent}% off with {", ".join(payment_methods)}'
         
@@ -399,56 +431,73 @@ class PromotionEngine:
     
     def _calculate_threshold_tier(self, promotion, cart: Cart) -> PromotionResult:
         """Calculate tiered discount (spend more, save more)"""
-        rules = promotion.get_rules()
-        tiers = rules.get('tiers', [])
+        # Sorted by threshold descending at compile time
+        sorted_tiers = promotion.tiers
         
-        if not tiers:
+        if not sorted_tiers:
             return PromotionResult(promotion, 0, message='No tiers configured')
         
-        # Sort tiers by threshold descending
-        sorted_tiers = sorted(
-            tiers, 
-            key=lambda x: x.get('threshold', 0), 
-            reverse=True
-        )
-        
         # Find applicable tier
         applicable_tier = None
         for tier in sorted_tiers:
-            threshold = Decimal(str(tier.get('threshold', 0)))
-            if cart.subtotal >= threshold:
+            if cart.subtotal >= tier['threshold']:
                 applicable_tier = tier
                 break
         
         if not applicable_tier:
             # Show next tier
-            next_tier = sorted_tiers[-1]
-            next_threshold = Decimal(str(next_tier.get('threshold', 0)))
-            remaining = next_threshold - cart.subtotal
+            remaining = sorted_tiers[-1]['threshold'] - cart.subtotal
             return PromotionResult(
                 promotion, 0,
                 message=f'Spend Rp {remaining:,.0f} more to get discount'
             )
         
         # Calculate discount based on tier type
-        discount_type = applicable_tier.get('discount_type', 'percent')
+        discount_type = applicable_tier['discount_type']
         
         if discount_type == 'percent':
-            discount_percent = Decimal(str(applicable_tier.get('discount_percent', 0)))
+            discount_percent = applicable_tier['discount_percent']
             discount = cart.subtotal * (discount_percent / 100)
             message = f'{discount_percent}% off (tier discount)'
         else:
-            discount = Decimal(str(applicable_tier.get('discount_amount', 0)))
+            discount = applicable_tier['discount_amount']
             message = f'Rp {discount:,.0f} off (tier discount)'
         
         return PromotionResult(promotion, discount, [], message)
     
-    def apply_promotions_to_cart(self, cart: Cart, auto_apply_only=True) -> Dict[str, Any]:
+    def apply_promotions_to_cart(self, cart: Cart, auto_apply_only=True, budget_ms=None) -> Dict[str, Any]:
         """
-        Apply all applicable promotions to cart
+        Apply the best combination of applicable promotions to cart
+        (see apps.promotions.allocation for the combination rules)
         Returns summary of applied promotions
         """
         applicable_promotions = self.get_applicable_promotions(cart)
+        return self._apply(cart, applicable_promotions, auto_apply_only, budget_ms)
+    
+    def evaluate_carts(self, carts: List[Cart], auto_apply_only=True, budget_ms=None, now=None,
+                       exhausted=None) -> List[Dict[str, Any]]:
+        """
+        Apply promotions to many (hypothetical, customer-less) carts in one
+        pass, e.g. one single-item cart per product for "price after promo" on
+        menu boards. The compiled promotion set, the clock and the per-day
+        usage counters are read once for all carts.
+        
+        Returns:
+            list: apply_promotions_to_cart summaries, in cart order
+        """
+        from .usage import exhausted_promotion_ids
+        
+        promo_set = get_promotion_set(self.brand)
+        now = now or timezone.now()
+        if exhausted is None:
+            exhausted = exhausted_promotion_ids(promo_set.active(now), usage_date=timezone.localdate(now))
+        return [
+            self._apply(cart, promo_set.candidates(cart.items, now, exhausted=exhausted), auto_apply_only, budget_ms)
+            for cart in carts
+        ]
+    
+    def _apply(self, cart, applicable_promotions, auto_apply_only, budget_ms):
+        from .allocation import PromotionAllocator
         
         if auto_apply_only:
             applicable_promotions = [
@@ -456,19 +505,9 @@ class PromotionEngine:
                 if p.is_auto_apply
             ]
         
-        applied_results = []
-        total_discount = Decimal('0')
-        
-        for promotion in applicable_promotions:
-            result = self.calculate_promotion(promotion, cart)
-            
-            if result.success:
-                applied_results.append(result)
-                total_discount += result.discount_amount
-                
-                # Check if stackable
-                if not promotion.is_stackable:
-                    break  # Stop after first non-stackable promotion
+        allocator = PromotionAllocator(self, cart, applicable_promotions, budget_ms=budget_ms)
+        applied_results, total_discount = allocator.solve()
+        allocator.apply_item_discounts()
         
         # Update cart totals
         cart.discount_amount = total_discount
@@ -480,5 +519,7 @@ class PromotionEngine:
             'cart': cart,
             'applied_promotions': applied_results,
             'total_discount': total_discount,
-            'final_total': cart.total
+            'final_total': cart.total,
+            # False when the search hit its time budget (best combination found so far)
+            'optimal': not allocator.timed_out,
         }
@@ -0,0 +1,166 @@
+"""
+Benchmark the promotion combination search against the former priority walk
+
+Runs entirely in memory (synthetic products and unsaved promotions), so it
+needs no promotion data and writes nothing.
+
+Usage:
+    python manage.py benchmark_promotions
+    python manage.py benchmark_promotions --carts 500 --items 30 --promotions 50 --budget 50
+"""
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from apps.promotions.allocation import PromotionAllocator
+from apps.promotions.compiled import CompiledPromotion, CompiledPromotionSet
+from apps.promotions.engine import Cart, CartItem, PromotionEngine
+from apps.promotions.models import Promotion
+
+PROMO_TYPES = [
+    'percent_discount', 'amount_discount', 'buy_x_get_y', 'combo',
+    'free_item', 'happy_hour', 'threshold_tier', 'payment_discount',
+]
+# Stage each promotion type normally runs at
+STAGES = {
+    'percent_discount': 'item_level', 'amount_discount': 'cart_level', 'buy_x_get_y': 'item_level',
+    'combo': 'item_level', 'free_item': 'item_level', 'happy_hour': 'item_level',
+    'threshold_tier': 'cart_level', 'payment_discount': 'payment_level',
+}
+
+
+def _priority_walk(engine, cart, promotions):
+    """The former apply_promotions_to_cart: full-cart evaluation, stop at first non-stackable"""
+    total = Decimal('0')
+    for promotion in promotions:
+        result = engine.calculate_promotion(promotion, cart)
+        if result.success:
+            total += result.discount_amount
+            if not promotion.is_stackable:
+                break
+    return total
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the promotion combination search on synthetic carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carts', type=int, default=200, help='Number of carts to evaluate')
+        parser.add_argument('--items', type=int, default=30, help='Cart lines per cart')
+        parser.add_argument('--promotions', type=int, default=50, help='Active promotions')
+        parser.add_argument('--products', type=int, default=80, help='Catalog size')
+        parser.add_argument('--stackable', type=float, default=0.3, help='Share of stackable promotions')
+        parser.add_argument('--budget', type=int, help='Search budget in ms (default: PROMOTION_SOLVER_BUDGET_MS)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        categories = [str(uuid.uuid4()) for _ in range(8)]
+        products = [
+            (str(uuid.uuid4()), rnd.choice(categories), Decimal(rnd.randrange(15, 86) * 1000))
+            for _ in range(options['products'])
+        ]
+
+        promotions = [
+            self._promotion(rnd, i, products, categories, options['stackable'])
+            for i in range(options['promotions'])
+        ]
+        promotions.sort(key=lambda p: (p.execution_priority, p.execution_stage))  # Promotion set order
+        promo_set = CompiledPromotionSet(None, promotions, None)
+        engine = PromotionEngine(None, None)
+
+        walk_discounts, search_discounts, timings, nodes = [], [], [], []
+        improved = timeouts = 0
+        for _ in range(options['carts']):
+            lines = rnd.sample(products, min(options['items'], len(products)))
+            cart_items = [
+                CartItem(pid, f'P-{pid[:4]}', pid[:8], price, rnd.randint(1, 3), cid)
+                for pid, cid, price in lines
+            ]
+            candidates = promo_set.candidates(cart_items)
+
+            walk_discounts.append(_priority_walk(engine, Cart(cart_items, None, None), candidates))
+
+            start = time.perf_counter()
+            allocator = PromotionAllocator(engine, Cart(cart_items, None, None), candidates, budget_ms=options['budget'])
+            _, discount = allocator.solve()
+            timings.append((time.perf_counter() - start) * 1000)
+            search_discounts.append(discount)
+            nodes.append(allocator.nodes)
+            timeouts += allocator.timed_out
+            improved += discount > walk_discounts[-1]
+
+        timings.sort()
+        self.stdout.write(
+            f"{options['carts']} carts x {options['items']} lines, {options['promotions']} promotions"
+        )
+        self.stdout.write(
+            f"Priority walk (no unit tracking, may double-discount): "
+            f"avg discount Rp {statistics.mean(walk_discounts):,.0f}"
+        )
+        self.stdout.write(
+            f"Allocation search:                                    "
+            f"avg discount Rp {statistics.mean(search_discounts):,.0f}"
+        )
+        self.stdout.write(f"Search found a larger discount on {improved} cart(s)")
+        self.stdout.write(
+            f"Search time: avg {statistics.mean(timings):.1f} ms, "
+            f"p50 {timings[len(timings) // 2]:.1f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms, max {timings[-1]:.1f} ms"
+        )
+        self.stdout.write(f"Nodes: avg {statistics.mean(nodes):.0f}, max {max(nodes)}")
+        style = self.style.WARNING if timeouts else self.style.SUCCESS
+        self.stdout.write(style(f"Budget exceeded on {timeouts} cart(s)"))
+
+    def _promotion(self, rnd, index, products, categories, stackable_share):
+        promo_type = PROMO_TYPES[index % len(PROMO_TYPES)]
+        if promo_type in ('buy_x_get_y', 'combo'):
+            # Unit deals target specific products/categories
+            apply_to = rnd.choice(['product', 'category'])
+        else:
+            apply_to = rnd.choice(['all', 'product', 'category'])
+        scope = {'apply_to': apply_to}
+        if apply_to == 'product':
+            scope['products'] = [p[0] for p in rnd.sample(products, 10)]
+        elif apply_to == 'category':
+            scope['categories'] = rnd.sample(categories, 1)
+        rules = {
+            'percent_discount': {'discount_percent': rnd.choice([5, 10, 15, 20]),
+                                 'max_discount_amount': rnd.choice([None, 25000, 50000])},
+            'amount_discount': {'discount_amount': rnd.choice([5000, 10000, 20000]),
+                                'min_purchase_amount': rnd.choice([0, 100000, 250000])},
+            'buy_x_get_y': {'buy_quantity': rnd.choice([1, 2]), 'get_quantity': 1,
+                            'get_discount_percent': rnd.choice([50, 100])},
+            'combo': {'required_quantity': rnd.choice([2, 3]), 'combo_price': rnd.choice([50000, 80000])},
+            'free_item': {'min_purchase_amount': 100000, 'free_product_id': rnd.choice(products)[0],
+                          'free_product_price': 20000},
+            'happy_hour': {'discount_percent': 10},
+            'threshold_tier': {'tiers': [
+                {'threshold': 300000, 'discount_type': 'percent', 'discount_percent': 5},
+                {'threshold': 800000, 'discount_type': 'amount', 'discount_amount': 75000},
+            ]},
+            'payment_discount': {'discount_percent': 10, 'max_discount_amount': 30000,
+                                 'payment_methods': ['qris']},
+        }[promo_type]
+        today = date.today()
+        return CompiledPromotion(Promotion(
+            code=f'BENCH-{index:03d}',
+            name=f'Bench {index}',
+            promo_type=promo_type,
+            apply_to=apply_to,
+            execution_stage=STAGES[promo_type],
+            execution_priority=rnd.randint(1, 999),
+            is_active=True,
+            is_auto_apply=True,
+            is_stackable=rnd.random() < stackable_share,
+            start_date=today - timedelta(days=1),
+            end_date=today + timedelta(days=30),
+            rules_json=json.dumps(rules),
+            scope_json=json.dumps(scope),
+        ))
@@ -0,0 +1,38 @@
+"""
+Rebuild promotion usage counters (per day / per customer) from PromotionUsage
+
+Usage:
+    python manage.py reconcile_promotion_usage
+    python manage.py reconcile_promotion_usage --days 30
+    python manage.py reconcile_promotion_usage --promotion PROMO-CODE
+
+Schedule daily, outside opening hours:
+    # Linux cron (daily at 3am)
+    0 3 * * * cd /path/to/pos && python manage.py reconcile_promotion_usage
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.promotions.models import Promotion
+from apps.promotions.usage import reconcile_usage
+
+
+class Command(BaseCommand):
+    help = 'Rebuild promotion usage counters from PromotionUsage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Business days of day counters to rebuild (default 7)')
+        parser.add_argument('--promotion', type=str, help='Only this promotion code')
+
+    def handle(self, *args, **options):
+        promotion_ids = None
+        if options['promotion']:
+            promotion_ids = list(Promotion.objects.filter(code=options['promotion']).values_list('id', flat=True))
+            if not promotion_ids:
+                raise CommandError(f"Promotion {options['promotion']} not found")
+
+        stats = reconcile_usage(days=options['days'], promotion_ids=promotion_ids)
+
+        self.stdout.write(f"Promotions with usage limits: {stats['promotions']}")
+        style = self.style.WARNING if stats['corrected'] or stats['created'] else self.style.SUCCESS
+        self.stdout.write(style(f"Counters corrected: {stats['corrected']}, created: {stats['created']}"))
+        self.stdout.write(f"Stale counters deleted: {stats['deleted']}")
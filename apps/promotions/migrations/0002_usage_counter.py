@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromotionUsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('day', 'Per Day'), ('customer', 'Per Customer')], max_length=10)),
+                ('key', models.CharField(help_text='Usage date (YYYY-MM-DD) or customer id/phone', max_length=64)),
+                ('uses', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('promotion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_counters', to='promotions.promotion')),
+            ],
+            options={
+                'db_table': 'promotion_usage_counter',
+                'unique_together': {('promotion', 'scope', 'key')},
+            },
+        ),
+    ]
@@ -81,6 +81,17 @@ class Promotion(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from apps.promotions.compiled import invalidate_promotions
+        invalidate_promotions()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from apps.promotions.compiled import invalidate_promotions
+        invalidate_promotions()
+        return result
+    
     def get_rules(self):
         """Parse and return rules JSON as dict"""
         import json
@@ -242,6 +253,34 @@ class PromotionUsage(models.Model):
         return f"{self.promotion_code} - {self.usage_date}"
 
 
+class PromotionUsageCounter(models.Model):
+    """
+    Usage counter per promotion and day / customer, for max_uses_per_day and
+    max_uses_per_customer checks without scanning PromotionUsage.
+    Incremented atomically by apps.promotions.usage, rebuilt from
+    PromotionUsage by the reconcile_promotion_usage command.
+    """
+    SCOPE_DAY = 'day'
+    SCOPE_CUSTOMER = 'customer'
+    SCOPE_CHOICES = [
+        (SCOPE_DAY, 'Per Day'),
+        (SCOPE_CUSTOMER, 'Per Customer'),
+    ]
+    
+    promotion = models.ForeignKey(Promotion, on_delete=models.CASCADE, related_name='usage_counters')
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=64, help_text='Usage date (YYYY-MM-DD) or customer id/phone')
+    uses = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'promotion_usage_counter'
+        unique_together = [['promotion', 'scope', 'key']]
+    
+    def __str__(self):
+        return f"{self.promotion_id}:{self.scope}:{self.key} = {self.uses}"
+
+
 class PromotionSyncLog(models.Model):
     """Track sync operations for debugging and monitoring"""
     
@@ -294,3 +333,10 @@ class PromotionSyncLog(models.Model):
     
     def __str__(self):
         return f"{self.sync_type} - {self.sync_status} - {self.started_at}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Completed sync: drop compiled promotion sets (covers bulk writes during sync)
+        if self.completed_at:
+            from apps.promotions.compiled import invalidate_promotions
+            invalidate_promotions()
@@ -14,7 +14,12 @@ urlpatterns = [
     path('simulator/clear/', views.test_clear_cart, name='simulator_clear'),
     path('simulator/remove/', views.test_remove_item, name='simulator_remove'),
     
+    # POS bill promotion (HTMX)
+    path('bill/<int:bill_id>/apply/', views.apply_promotion, name='apply_promotion'),
+    path('bill/<int:bill_id>/remove/', views.remove_promotion, name='remove_promotion'),
+    
     # API Endpoints (for POS integration)
     path('api/calculate/', views.api_calculate_promotions, name='api_calculate'),
     path('api/applicable/', views.api_get_applicable_promotions, name='api_applicable'),
+    path('api/evaluate/', views.api_evaluate_promotions, name='api_evaluate'),
 ]
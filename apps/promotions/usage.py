@@ -0,0 +1,361 @@
+"""
+Promotion usage counters - atomic usage limits
+
+apply_promotion used to count usage with `promo.current_uses += 1;
+promo.save()`: concurrent applies lost increments, every apply rewrote the
+whole promotion row (and dropped the compiled promotion sets), and
+max_uses_per_day / max_uses_per_customer were never enforced because that
+meant counting PromotionUsage rows.
+
+A bill's promotion discount (Bill.discount_type 'promotion') reserves its use
+when the cashier applies it (promotions:apply_promotion) and gives it back when
+it is removed, when the bill is cancelled/voided (Bill.save) or fully refunded
+(BillRefund.complete). Candidate lists (CompiledPromotionSet.candidates) leave
+out promotions whose per-day / per-customer limit is used up.
+
+record_usage() reserves one use in a single transaction:
+- current_uses is incremented with a conditional UPDATE
+  (current_uses < max_uses), so two terminals can't both take the last use
+- per-day and per-customer uses live in PromotionUsageCounter rows keyed by
+  (promotion, 'day', date) and (promotion, 'customer', customer id/phone),
+  incremented the same way (uses < limit)
+- any limit reached raises PromotionLimitReached and rolls the increments back
+
+Counters are only kept for promotions that have the corresponding limit. A
+counter row is seeded from PromotionUsage (indexed count) when first created,
+so limits added mid-day start from the real usage. check_limits() reads the
+counters with one indexed query.
+
+Counters are local to this edge server; current_uses is overwritten by the HO
+sync. reconcile_usage() (python manage.py reconcile_promotion_usage, daily via
+cron) rebuilds the counters from PromotionUsage and prunes old day counters.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class PromotionLimitReached(Exception):
+    """A usage limit of the promotion is used up"""
+
+    def __init__(self, limit, message):
+        super().__init__(message)
+        self.limit = limit  # 'max_uses', 'max_uses_per_day' or 'max_uses_per_customer'
+        self.message = message
+
+
+def bill_transaction_id(bill):
+    """Stable PromotionUsage.transaction_id (UUID) for a POS bill"""
+    return uuid.uuid5(uuid.NAMESPACE_OID, f'pos.bill.{bill.pk}')
+
+
+def _customer_key(customer_id=None, customer_phone=''):
+    if customer_id:
+        return str(customer_id)
+    return customer_phone or None
+
+
+def _customer_usages(promotion_id, customer_id=None, customer_phone=''):
+    from .models import PromotionUsage
+
+    usages = PromotionUsage.objects.filter(promotion_id=promotion_id)
+    if customer_id:
+        return usages.filter(customer_id=customer_id)
+    return usages.filter(customer_id__isnull=True, customer_phone=customer_phone)
+
+
+def _increment(promotion_id, scope, key, limit, seed):
+    """
+    Add one use to a counter if it stays within limit
+
+    Raises:
+        PromotionLimitReached: Counter already at limit
+    """
+    from .models import PromotionUsageCounter
+
+    counters = PromotionUsageCounter.objects.filter(promotion_id=promotion_id, scope=scope, key=key)
+    for _ in range(2):
+        # The WHERE is re-checked after the row lock, so the limit holds under concurrency
+        if counters.filter(uses__lt=limit).update(uses=F('uses') + 1, updated_at=timezone.now()):
+            return
+        if counters.exists():
+            raise PromotionLimitReached(f'max_uses_per_{scope}', f'Usage limit per {scope} reached ({limit})')
+
+        used = seed()
+        if used >= limit:
+            raise PromotionLimitReached(f'max_uses_per_{scope}', f'Usage limit per {scope} reached ({limit})')
+        try:
+            with transaction.atomic():
+                PromotionUsageCounter.objects.create(
+                    promotion_id=promotion_id, scope=scope, key=key, uses=used + 1
+                )
+            return
+        except IntegrityError:
+            # Created by a concurrent transaction - increment that row
+            continue
+
+    raise RuntimeError(f"Could not update {scope} usage counter of promotion {promotion_id}")
+
+
+def exhausted_promotion_ids(promotions, customer_id=None, customer_phone='', usage_date=None):
+    """
+    Promotions whose per-day or per-customer limit is used up
+
+    One indexed counter query for all promotions, none when no promotion has
+    such a limit (max_uses is checked by CompiledPromotion.is_valid_at).
+
+    Args:
+        promotions: Promotions or CompiledPromotions
+        customer_id / customer_phone: Customer, for max_uses_per_customer
+        usage_date: Business date (default: today, local time)
+
+    Returns:
+        set: Ids of exhausted promotions
+    """
+    from .models import PromotionUsageCounter
+
+    customer_key = _customer_key(customer_id, customer_phone)
+    day_limited = [p for p in promotions if p.max_uses_per_day]
+    customer_limited = [p for p in promotions if p.max_uses_per_customer] if customer_key else []
+    if not day_limited and not customer_limited:
+        return set()
+
+    lookups = Q()
+    if day_limited:
+        usage_date = usage_date or timezone.localdate()
+        lookups |= Q(
+            promotion_id__in=[p.id for p in day_limited],
+            scope=PromotionUsageCounter.SCOPE_DAY, key=usage_date.isoformat(),
+        )
+    if customer_limited:
+        lookups |= Q(
+            promotion_id__in=[p.id for p in customer_limited],
+            scope=PromotionUsageCounter.SCOPE_CUSTOMER, key=customer_key,
+        )
+
+    by_id = {str(p.id): p for p in promotions}
+    exhausted = set()
+    for promotion_id, scope, uses in PromotionUsageCounter.objects.filter(lookups).values_list('promotion_id', 'scope', 'uses'):
+        promotion = by_id[str(promotion_id)]
+        limit = promotion.max_uses_per_day if scope == PromotionUsageCounter.SCOPE_DAY else promotion.max_uses_per_customer
+        if uses >= limit:
+            exhausted.add(promotion.id)
+    return exhausted
+
+
+def check_limits(promotion, customer_id=None, customer_phone='', usage_date=None):
+    """
+    Check the usage limits of a promotion (without reserving a use)
+
+    Args:
+        promotion: Promotion or CompiledPromotion
+        customer_id / customer_phone: Customer, for max_uses_per_customer
+        usage_date: Business date (default: today, local time)
+
+    Returns:
+        tuple: (allowed, message)
+    """
+    from .models import PromotionUsageCounter
+
+    if promotion.max_uses and promotion.current_uses >= promotion.max_uses:
+        return False, f'Usage limit reached ({promotion.max_uses})'
+
+    customer_key = _customer_key(customer_id, customer_phone)
+    lookups = Q()
+    if promotion.max_uses_per_day:
+        usage_date = usage_date or timezone.localdate()
+        lookups |= Q(scope=PromotionUsageCounter.SCOPE_DAY, key=usage_date.isoformat())
+    if promotion.max_uses_per_customer and customer_key:
+        lookups |= Q(scope=PromotionUsageCounter.SCOPE_CUSTOMER, key=customer_key)
+    if not lookups:
+        return True, ''
+
+    counters = PromotionUsageCounter.objects.filter(lookups, promotion_id=promotion.id)
+    for scope, uses in counters.values_list('scope', 'uses'):
+        limit = promotion.max_uses_per_day if scope == PromotionUsageCounter.SCOPE_DAY else promotion.max_uses_per_customer
+        if uses >= limit:
+            return False, f'Usage limit per {scope} reached ({limit})'
+    return True, ''
+
+
+def record_usage(promotion, transaction_id, brand, store, discount_amount, original_amount, final_amount,
+                 order_number='', customer_id=None, customer_phone='', member_tier='', usage_date=None):
+    """
+    Reserve one use of a promotion and log it in PromotionUsage
+
+    Call inside the transaction that saves the sale, so a failed sale gives
+    the use back.
+
+    Args:
+        promotion: Promotion or CompiledPromotion
+        transaction_id: UUID of the sale (bill_transaction_id(bill) for bills)
+        brand / store: Where it was used
+        discount_amount / original_amount / final_amount: Amounts of the sale
+        customer_id / customer_phone / member_tier: Customer, if known
+        usage_date: Business date (default: today, local time)
+
+    Returns:
+        PromotionUsage
+
+    Raises:
+        PromotionLimitReached: A limit is used up (nothing is recorded)
+    """
+    from .models import Promotion, PromotionUsage, PromotionUsageCounter
+
+    usage_date = usage_date or timezone.localdate()
+    customer_key = _customer_key(customer_id, customer_phone)
+
+    with transaction.atomic():
+        promotions = Promotion.objects.filter(pk=promotion.id)
+        updated = promotions.filter(
+            Q(max_uses__isnull=True) | Q(max_uses=0) | Q(current_uses__lt=F('max_uses'))
+        ).update(current_uses=F('current_uses') + 1, last_used_at=timezone.now())
+        if not updated:
+            raise PromotionLimitReached('max_uses', f'Usage limit reached ({promotion.max_uses})')
+
+        if promotion.max_uses_per_day:
+            _increment(
+                promotion.id, PromotionUsageCounter.SCOPE_DAY, usage_date.isoformat(), promotion.max_uses_per_day,
+                lambda: PromotionUsage.objects.filter(promotion_id=promotion.id, usage_date=usage_date).count(),
+            )
+        if promotion.max_uses_per_customer and customer_key:
+            _increment(
+                promotion.id, PromotionUsageCounter.SCOPE_CUSTOMER, customer_key, promotion.max_uses_per_customer,
+                lambda: _customer_usages(promotion.id, customer_id, customer_phone).count(),
+            )
+
+        usage = PromotionUsage.objects.create(
+            promotion_id=promotion.id,
+            promotion_code=promotion.code,
+            transaction_id=transaction_id,
+            order_number=order_number,
+            customer_id=customer_id,
+            customer_phone=customer_phone,
+            member_tier=member_tier,
+            discount_amount=discount_amount,
+            original_amount=original_amount,
+            final_amount=final_amount,
+            brand=brand,
+            store=store,
+            usage_date=usage_date,
+        )
+
+    if promotion.max_uses and promotion.current_uses + 1 >= promotion.max_uses:
+        # Possibly the last use: drop the promotion from the compiled sets
+        from .compiled import invalidate_promotions
+        invalidate_promotions()
+    return usage
+
+
+def release_usage(transaction_id, promotion=None):
+    """
+    Give back the uses recorded for a sale (promotion removed, bill voided)
+
+    Args:
+        transaction_id: UUID passed to record_usage()
+        promotion: Only release this promotion (default: all of the sale)
+
+    Returns:
+        int: Number of uses released
+    """
+    from .models import Promotion, PromotionUsage, PromotionUsageCounter
+
+    usages = PromotionUsage.objects.filter(transaction_id=transaction_id)
+    if promotion is not None:
+        usages = usages.filter(promotion_id=promotion.id)
+
+    released = 0
+    with transaction.atomic():
+        for usage in usages.select_for_update():
+            Promotion.objects.filter(pk=usage.promotion_id).update(
+                current_uses=Greatest(F('current_uses') - 1, Value(0))
+            )
+            keys = Q(scope=PromotionUsageCounter.SCOPE_DAY, key=usage.usage_date.isoformat())
+            customer_key = _customer_key(usage.customer_id, usage.customer_phone)
+            if customer_key:
+                keys |= Q(scope=PromotionUsageCounter.SCOPE_CUSTOMER, key=customer_key)
+            PromotionUsageCounter.objects.filter(keys, promotion_id=usage.promotion_id, uses__gt=0).update(
+                uses=F('uses') - 1, updated_at=timezone.now()
+            )
+            usage.delete()
+            released += 1
+    return released
+
+
+def reconcile_usage(days=7, promotion_ids=None):
+    """
+    Rebuild usage counters from PromotionUsage
+
+    Day counters are rebuilt for the last `days` business days (older ones
+    are deleted), customer counters for all time. Each promotion is
+    reconciled in its own transaction with its counter rows locked.
+
+    Args:
+        days: Number of business days (including today) to rebuild
+        promotion_ids: Only these promotions (default: all with a day or
+            customer limit)
+
+    Returns:
+        dict: promotions, corrected, created, deleted
+    """
+    from .models import Promotion, PromotionUsage, PromotionUsageCounter
+
+    since = timezone.localdate() - timedelta(days=max(days, 1) - 1)
+    promotions = Promotion.objects.filter(Q(max_uses_per_day__gt=0) | Q(max_uses_per_customer__gt=0))
+    if promotion_ids is not None:
+        promotions = promotions.filter(pk__in=promotion_ids)
+
+    stats = {'promotions': 0, 'corrected': 0, 'created': 0, 'deleted': 0}
+    for promotion in promotions.only('id', 'max_uses_per_day', 'max_uses_per_customer'):
+        with transaction.atomic():
+            counters = {
+                (counter.scope, counter.key): counter
+                for counter in PromotionUsageCounter.objects.select_for_update().filter(promotion=promotion)
+            }
+            usages = PromotionUsage.objects.filter(promotion=promotion)
+
+            expected = {}
+            if promotion.max_uses_per_day:
+                for row in usages.filter(usage_date__gte=since).values('usage_date').annotate(uses=Count('id')):
+                    expected[(PromotionUsageCounter.SCOPE_DAY, row['usage_date'].isoformat())] = row['uses']
+            if promotion.max_uses_per_customer:
+                rows = usages.values('customer_id', 'customer_phone').annotate(uses=Count('id'))
+                for row in rows:
+                    key = _customer_key(row['customer_id'], row['customer_phone'])
+                    if key:
+                        scope_key = (PromotionUsageCounter.SCOPE_CUSTOMER, key)
+                        expected[scope_key] = expected.get(scope_key, 0) + row['uses']
+
+            changed, stale = [], []
+            for scope_key, counter in counters.items():
+                uses = expected.pop(scope_key, 0)
+                scope, key = scope_key
+                if not uses and (scope == PromotionUsageCounter.SCOPE_CUSTOMER or key < since.isoformat()):
+                    stale.append(counter.pk)
+                elif counter.uses != uses:
+                    counter.uses = uses
+                    changed.append(counter)
+            if changed:
+                PromotionUsageCounter.objects.bulk_update(changed, ['uses'])
+            if stale:
+                PromotionUsageCounter.objects.filter(pk__in=stale).delete()
+            PromotionUsageCounter.objects.bulk_create([
+                PromotionUsageCounter(promotion=promotion, scope=scope, key=key, uses=uses)
+                for (scope, key), uses in expected.items()
+            ])
+
+        stats['promotions'] += 1
+        stats['corrected'] += len(changed)
+        stats['created'] += len(expected)
+        stats['deleted'] += len(stale)
+
+    if stats['corrected'] or stats['created']:
+        logger.info(f"Promotion usage counters reconciled: {stats}")
+    return stats
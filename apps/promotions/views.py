@@ -3,14 +3,27 @@ from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from django.utils import timezone
 import json
 from decimal import Decimal
 
 from .models import Promotion, PromotionUsage
 from apps.pos.models import Bill
+from apps.pos.views import render_bill_panel
 from apps.core.models import Product, Store
 from .engine import PromotionEngine, Cart, CartItem
 
+MAX_LINE_QUANTITY = 9999  # per cart line in the pricing APIs
+
+
+def _line_quantity(value):
+    """Cart line quantity from API input (ValueError unless 1..MAX_LINE_QUANTITY)"""
+    quantity = int(value)
+    if not 1 <= quantity <= MAX_LINE_QUANTITY:
+        raise ValueError(f'quantity must be between 1 and {MAX_LINE_QUANTITY}')
+    return quantity
+
 
 def trigger_client_event(response, event_name, data=None):
     if data:
@@ -23,67 +36,91 @@ def trigger_client_event(response, event_name, data=None):
 @login_required
 @require_http_methods(["POST"])
 def apply_promotion(request, bill_id):
-    """Apply promotion to bill - HTMX"""
-    bill = get_object_or_404(Bill, id=bill_id, status='open')
-    promo_id = request.POST.get('promo_id')
+    """
+    Apply a promotion as the bill discount - HTMX
     
-    promo = get_object_or_404(Promotion, id=promo_id)
+    One promotion per bill (Bill.discount_type 'promotion', discount_reference
+    = promotion code). The use is reserved here, so usage limits hold across
+    terminals, and given back on remove / cancel / full refund.
+    """
+    from .compiled import compile_promotion
+    from .usage import PromotionLimitReached, bill_transaction_id, check_limits, record_usage, release_usage
     
-    if not promo.is_valid_now():
-        return HttpResponse('<div class="p-3 bg-red-100 text-red-700 rounded">Promo tidak berlaku</div>')
+    bill = get_object_or_404(Bill, id=bill_id, status__in=['open', 'hold'])
+    promo = get_object_or_404(Promotion, id=request.POST.get('promo_id'), brand=bill.brand, is_active=True)
     
-    if BillPromotion.objects.filter(bill=bill, promotion=promo).exists():
+    if bill.discount_type == 'promotion' and bill.discount_reference == promo.code:
         return HttpResponse('<div class="p-3 bg-yellow-100 text-yellow-700 rounded">Promo sudah digunakan</div>')
     
-    discount = promo.calculate_discount(bill)
+    compiled = compile_promotion(promo)
+    now = timezone.localtime()
+    if not compiled.is_valid_at(now.date(), now.time()):
+        return HttpResponse('<div class="p-3 bg-red-100 text-red-700 rounded">Promo tidak berlaku</div>')
+    
+    allowed, _ = check_limits(compiled, customer_phone=bill.customer_phone)
+    if not allowed:
+        return HttpResponse('<div class="p-3 bg-red-100 text-red-700 rounded">Batas pemakaian promo sudah tercapai</div>')
     
+    result = PromotionEngine(bill.brand, bill.store).calculate_promotion(compiled, Cart.from_bill(bill))
+    discount = result.discount_amount.quantize(Decimal('0.01'))
     if discount <= 0:
         return HttpResponse(
             '<div class="p-3 bg-yellow-100 text-yellow-700 rounded">Promo tidak berlaku untuk pesanan ini</div>'
         )
     
-    BillPromotion.objects.create(
-        bill=bill,
-        promotion=promo,
-        discount_amount=discount,
-        applied_by=request.user,
-    )
-    
-    promo.current_uses += 1
-    promo.save()
-    
-    bill.discount_amount += discount
-    bill.calculate_totals()
+    transaction_id = bill_transaction_id(bill)
+    try:
+        with transaction.atomic():
+            # Replacing another promotion gives its use back
+            release_usage(transaction_id)
+            record_usage(
+                compiled,
+                transaction_id=transaction_id,
+                brand=bill.brand,
+                store=bill.store,
+                discount_amount=discount,
+                original_amount=bill.subtotal,
+                final_amount=bill.subtotal - discount,
+                order_number=bill.bill_number,
+                customer_phone=bill.customer_phone,
+            )
+            bill.discount_type = 'promotion'
+            bill.discount_reference = promo.code
+            bill.discount_percent = Decimal('0')
+            bill.discount_amount = discount
+            bill.save(update_fields=['discount_type', 'discount_reference', 'discount_percent', 'discount_amount'])
+            bill.calculate_totals()
+    except PromotionLimitReached:
+        return HttpResponse('<div class="p-3 bg-red-100 text-red-700 rounded">Batas pemakaian promo sudah tercapai</div>')
     
-    response = render(request, 'pos/partials/bill_panel.html', {'bill': bill})
+    response = render_bill_panel(request, bill)
     return trigger_client_event(response, 'promoApplied')
 
 
 @login_required
 @require_http_methods(["POST"])
-def remove_promotion(request, bill_promo_id):
-    """Remove applied promotion from bill - HTMX"""
-    bill_promo = get_object_or_404(BillPromotion, id=bill_promo_id)
-    bill = bill_promo.bill
+def remove_promotion(request, bill_id):
+    """Remove the promotion discount from a bill - HTMX"""
+    from .usage import bill_transaction_id, release_usage
     
-    if bill.status != 'open':
-        return HttpResponse('<div class="p-3 bg-red-100 text-red-700 rounded">Bill sudah ditutup</div>')
+    bill = get_object_or_404(Bill, id=bill_id)
     
-    if bill_promo.voucher:
-        bill_promo.voucher.status = 'active'
-        bill_promo.voucher.used_at = None
-        bill_promo.voucher.used_by = None
-        bill_promo.voucher.used_bill = None
-        bill_promo.voucher.save()
+    if bill.status not in ['open', 'hold']:
+        return HttpResponse('<div class="p-3 bg-red-100 text-red-700 rounded">Bill sudah ditutup</div>')
     
-    bill_promo.promotion.current_uses -= 1
-    bill_promo.promotion.save()
+    if bill.discount_type != 'promotion':
+        return HttpResponse('<div class="p-3 bg-yellow-100 text-yellow-700 rounded">Tidak ada promo di bill ini</div>')
     
-    bill.discount_amount -= bill_promo.discount_amount
-    bill_promo.delete()
-    bill.calculate_totals()
+    with transaction.atomic():
+        release_usage(bill_transaction_id(bill))
+        bill.discount_type = ''
+        bill.discount_reference = ''
+        bill.discount_percent = Decimal('0')
+        bill.discount_amount = Decimal('0')
+        bill.save(update_fields=['discount_type', 'discount_reference', 'discount_percent', 'discount_amount'])
+        bill.calculate_totals()
     
-    return render(request, 'pos/partials/bill_panel.html', {'bill': bill})
+    return render_bill_panel(request, bill)
 
 
 # ============================================
@@ -336,14 +373,13 @@ def api_calculate_promotions(request):
                 'error': 'No items provided'
             }, status=400)
         
-        from apps.core.models import StoreBrand
-        store_config = Store.get_current()
-        
-        # Get first brand for this store
-        store_brand = StoreBrand.objects.filter(store=store_config).select_related('brand').first()
-        if not store_brand:
+        # Store and first brand from the cached store context (no queries)
+        from apps.core.store_context import get_store_context
+        store_ctx = get_store_context()
+        store_config = store_ctx.store
+        brand = store_ctx.primary_brand
+        if not brand:
             return JsonResponse({'success': False, 'error': 'No brand configured'}, status=400)
-        brand = store_brand.brand
         
         # Build cart items
         cart_items = []
@@ -353,7 +389,7 @@ def api_calculate_promotions(request):
                 product_name=item_data['product_name'],
                 sku=item_data['sku'],
                 price=item_data['price'],
-                quantity=item_data['quantity'],
+                quantity=_line_quantity(item_data['quantity']),
                 category_id=item_data.get('category_id')
             )
             cart_items.append(cart_item)
@@ -389,6 +425,8 @@ def api_calculate_promotions(request):
             'applied_promotions': applied_promotions
         })
     
+    except (ValueError, KeyError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid request: {e}'}, status=400)
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -409,40 +447,22 @@ def api_get_applicable_promotions(request):
     GET /promotions/api/applicable/
     """
     try:
-        from apps.core.models import StoreBrand
-        from django.utils import timezone
+        from apps.core.store_context import get_store_context
+        from .compiled import get_promotion_set
         
-        store_config = Store.get_current()
-        
-        # Get all brands for this store
-        store_brands = StoreBrand.objects.filter(store=store_config).select_related('brand')
-        brand_ids = [sb.brand_id for sb in store_brands]
-        if not brand_ids:
+        # All brands of this store (cached store context)
+        brands = get_store_context().brands
+        if not brands:
             return JsonResponse({'success': False, 'error': 'No brand configured'}, status=400)
-        now = timezone.now()
-        today = now.date()
-        current_time = now.time()
-        
-        # Get active promotions
-        promotions = Promotion.objects.filter(
-            brand_id__in=brand_ids,
-            is_active=True,
-            start_date__lte=today,
-            end_date__gte=today
-        ).order_by('execution_priority')
-        
-        # Filter by time and usage limits
+        
+        # Valid promotions (dates, time window, usage limits) from the compiled sets
+        promotions = []
+        for brand in brands:
+            promotions.extend(get_promotion_set(brand).active())
+        promotions.sort(key=lambda p: p.execution_priority)
+        
         applicable = []
         for promo in promotions:
-            # Check time range
-            if promo.time_start and promo.time_end:
-                if not (promo.time_start <= current_time <= promo.time_end):
-                    continue
-            
-            # Check usage limits
-            if promo.max_uses and promo.current_uses >= promo.max_uses:
-                continue
-            
             applicable.append({
                 'id': str(promo.id),
                 'code': promo.code,
@@ -453,8 +473,8 @@ def api_get_applicable_promotions(request):
                 'is_stackable': promo.is_stackable,
                 'execution_stage': promo.execution_stage,
                 'execution_priority': promo.execution_priority,
-                'rules': promo.get_rules(),
-                'scope': promo.get_scope()
+                'rules': promo.rules,
+                'scope': promo.scope_data
             })
         
         return JsonResponse({
@@ -468,3 +488,64 @@ def api_get_applicable_promotions(request):
             'success': False,
             'error': str(e)
         }, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@login_required
+def api_evaluate_promotions(request):
+    """
+    API endpoint to price many products / hypothetical carts in one call
+    Used by menu boards, the customer display and the QR order cart
+    
+    POST /promotions/api/evaluate/
+    Body: {
+        "brand_id": "uuid",            (optional, default: store's first brand)
+        "products": ["uuid", ...],     (or "all" for the whole catalog)
+        "carts": [
+            {"id": "cart-1", "items": [{"product_id": "uuid", "quantity": 2}]}
+        ]
+    }
+    Prices come from the catalog, only auto-apply promotions are used.
+    Quantities must be 1..MAX_LINE_QUANTITY per line (400 otherwise).
+    """
+    try:
+        from apps.core.store_context import get_store_context
+        from .whatif import evaluate_carts, product_prices
+        
+        data = json.loads(request.body)
+        brands = get_store_context().brands
+        if not brands:
+            return JsonResponse({'success': False, 'error': 'No brand configured'}, status=400)
+        brand = brands[0]
+        if data.get('brand_id'):
+            brand = next((b for b in brands if str(b.id) == str(data['brand_id'])), None)
+            if brand is None:
+                return JsonResponse({'success': False, 'error': 'Unknown brand'}, status=400)
+        
+        products = data.get('products') or []
+        carts = data.get('carts') or []
+        if not products and not carts:
+            return JsonResponse({'success': False, 'error': 'No products or carts provided'}, status=400)
+        
+        response = {'success': True, 'brand_id': str(brand.id)}
+        if products:
+            response['products'] = product_prices(brand, None if products == 'all' else products)
+        if carts:
+            summaries = evaluate_carts(brand, [
+                [(item['product_id'], _line_quantity(item.get('quantity', 1))) for item in cart.get('items', [])]
+                for cart in carts
+            ])
+            response['carts'] = [
+                {'id': cart.get('id'), **summary}
+                for cart, summary in zip(carts, summaries)
+            ]
+        return JsonResponse(response)
+    
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid request: {e}'}, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
@@ -0,0 +1,171 @@
+"""
+What-if promotion pricing - many products / hypothetical carts per call
+
+Menu boards and the customer display show "price after promo" for every
+product on screen. With api_calculate_promotions that was one HTTP call (and
+one Cart/CartItem build with Decimal string conversions) per product.
+api_evaluate_promotions is staff-only (login_required), like the other
+promotion APIs; the QR guest menu does not show promo prices, as guest
+orders are charged the list price.
+
+product_prices() prices one unit of each product and evaluate_carts() prices
+hypothetical carts given as (product_id, quantity) lines. Both take product
+data from the brand's CatalogSnapshot, run all carts in one
+PromotionEngine.evaluate_carts() pass against the compiled promotion set,
+and cache the results per process.
+
+Cache key per brand: (catalog version, promotion version, time bucket).
+The time bucket is the set of promotions valid right now (date range,
+happy-hour window, usage limits incl. per-day counters), so cached prices turn
+over exactly when a window opens or closes or a daily limit is used up,
+rather than on a fixed clock.
+"""
+import threading
+
+from django.utils import timezone
+
+MAX_CACHED_CARTS = 2048  # per brand; the cart cache is cleared when full
+
+_lock = threading.Lock()
+_caches = {}  # str(brand_id) -> _PriceCache
+
+
+class _PriceCache:
+    __slots__ = ('key', 'exhausted', 'products', 'carts')
+
+    def __init__(self, key, exhausted):
+        self.key = key
+        self.exhausted = exhausted  # promotions with a used-up per-day limit
+        self.products = {}  # product_id -> price dict
+        self.carts = {}  # cart signature -> summary dict
+
+
+def _cache_for(brand_id, catalog, promo_set, now):
+    from .usage import exhausted_promotion_ids
+
+    active = promo_set.active(now)
+    exhausted = exhausted_promotion_ids(active, usage_date=timezone.localdate(now))
+    time_bucket = frozenset(p.id for p in active if p.id not in exhausted)
+    key = (catalog.version, catalog.loaded_at, promo_set.version, promo_set.loaded_at, time_bucket)
+    price_cache = _caches.get(brand_id)
+    if price_cache is None or price_cache.key != key:
+        with _lock:
+            price_cache = _caches.get(brand_id)
+            if price_cache is None or price_cache.key != key:
+                price_cache = _PriceCache(key, exhausted)
+                _caches[brand_id] = price_cache
+    return price_cache
+
+
+def _summary(result):
+    """JSON-ready summary of an apply_promotions_to_cart result"""
+    cart = result['cart']
+    return {
+        'subtotal': float(cart.subtotal),
+        'discount_amount': float(cart.discount_amount),
+        'total': float(cart.total),
+        'optimal': result['optimal'],
+        'applied_promotions': [
+            {
+                'promotion_id': str(promo_result.promotion.id),
+                'promotion_code': promo_result.promotion.code,
+                'promotion_name': promo_result.promotion.name,
+                'discount_amount': float(promo_result.discount_amount),
+                'message': promo_result.message,
+            }
+            for promo_result in result['applied_promotions']
+        ],
+    }
+
+
+def product_prices(brand, product_ids=None, now=None):
+    """
+    Price after auto-apply promotions of one unit of each product
+
+    Args:
+        brand: Brand instance or id
+        product_ids: Products to price (default: the whole active catalog);
+            unknown ids are left out
+
+    Returns:
+        dict: {product_id: {'price', 'final_price', 'discount_amount', 'promotions'}}
+    """
+    from apps.pos.catalog import get_catalog
+
+    from .compiled import get_promotion_set
+    from .engine import Cart, CartItem, PromotionEngine
+
+    brand_id = str(getattr(brand, 'pk', brand))
+    now = now or timezone.now()
+    catalog = get_catalog(brand_id)
+    promo_set = get_promotion_set(brand_id)
+    price_cache = _cache_for(brand_id, catalog, promo_set, now)
+
+    if product_ids is None:
+        product_ids = catalog.products_by_id.keys()
+    wanted = [str(pid) for pid in product_ids if str(pid) in catalog.products_by_id]
+
+    missing = [pid for pid in wanted if pid not in price_cache.products]
+    if missing:
+        carts = [Cart([CartItem.from_product(catalog.products_by_id[pid])], brand, None) for pid in missing]
+        results = PromotionEngine(brand_id, None).evaluate_carts(carts, now=now, exhausted=price_cache.exhausted)
+        for pid, result in zip(missing, results):
+            cart = result['cart']
+            price_cache.products[pid] = {
+                'price': float(cart.subtotal),
+                'final_price': float(cart.total),
+                'discount_amount': float(cart.discount_amount),
+                'promotions': [r.promotion.code for r in result['applied_promotions']],
+            }
+
+    return {pid: price_cache.products[pid] for pid in wanted}
+
+
+def evaluate_carts(brand, carts, now=None):
+    """
+    Price hypothetical carts with auto-apply promotions
+
+    Args:
+        brand: Brand instance or id
+        carts: List of carts, each a list of (product_id, quantity) pairs;
+            lines with unknown products or quantity < 1 are ignored
+
+    Returns:
+        list: One summary per cart (subtotal, discount_amount, total,
+        optimal, applied_promotions), in cart order
+    """
+    from apps.pos.catalog import get_catalog
+
+    from .compiled import get_promotion_set
+    from .engine import Cart, CartItem, PromotionEngine
+
+    brand_id = str(getattr(brand, 'pk', brand))
+    now = now or timezone.now()
+    catalog = get_catalog(brand_id)
+    promo_set = get_promotion_set(brand_id)
+    price_cache = _cache_for(brand_id, catalog, promo_set, now)
+
+    signatures = []
+    for lines in carts:
+        quantities = {}
+        for product_id, quantity in lines:
+            product_id = str(product_id)
+            if product_id in catalog.products_by_id and quantity >= 1:
+                quantities[product_id] = quantities.get(product_id, 0) + int(quantity)
+        # Line order kept: calculators break price ties by cart order
+        signatures.append(tuple(quantities.items()))
+
+    summaries = {sig: price_cache.carts[sig] for sig in signatures if sig in price_cache.carts}
+    missing = [sig for sig in dict.fromkeys(signatures) if sig not in summaries]
+    if missing:
+        hypothetical = [
+            Cart([CartItem.from_product(catalog.products_by_id[pid], qty) for pid, qty in sig], brand, None)
+            for sig in missing
+        ]
+        results = PromotionEngine(brand_id, None).evaluate_carts(hypothetical, now=now, exhausted=price_cache.exhausted)
+        if len(price_cache.carts) + len(missing) > MAX_CACHED_CARTS:
+            price_cache.carts.clear()
+        for sig, result in zip(missing, results):
+            summaries[sig] = price_cache.carts[sig] = _summary(result)
+
+    return [summaries[sig] for sig in signatures]
@@ -128,7 +128,7 @@ def guest_add_item_custom(request, brand_id, table_id):
     unit_price = product.price + modifier_price
     
     # Create bill item
-    BillItem.objects.create(
+    item = BillItem.objects.create(
         bill=bill,
         product=product,
         quantity=quantity,
@@ -139,7 +139,7 @@ def guest_add_item_custom(request, brand_id, table_id):
         status='pending',
     )
     
-    bill.calculate_totals()
+    bill.apply_item_change(item)
     
     return render(request, 'qr_order/partials/cart.html', {
         'bill': bill,
@@ -246,8 +246,9 @@ def guest_add_item(request, brand_id, table_id):
     if existing_item:
         existing_item.quantity += quantity
         existing_item.save()
+        item = existing_item
     else:
-        BillItem.objects.create(
+        item = BillItem.objects.create(
             bill=bill,
             product=product,
             quantity=quantity,
@@ -258,7 +259,7 @@ def guest_add_item(request, brand_id, table_id):
             status='pending',
         )
     
-    bill.calculate_totals()
+    bill.apply_item_change(item)
     
     return render(request, 'qr_order/partials/cart.html', {
         'bill': bill,
@@ -330,13 +331,14 @@ def guest_submit_order(request, brand_id, table_id):
         return HttpResponse('<div class="p-4 bg-yellow-100 text-yellow-700 rounded">Tidak ada item baru untuk dikirim</div>')
     
     # Send to kitchen — uses new KitchenTicket + KitchenOrder system
-    from apps.kitchen.services import create_kitchen_orders_for_items, create_kitchen_tickets
+    from apps.kitchen.services import create_kitchen_orders_for_items, create_kitchen_tickets, push_kds_update
 
     pending_item_ids = list(pending_items.values_list('id', flat=True))
     pending_items.update(status='sent')
 
-    # Create KitchenOrder for KDS display
-    create_kitchen_orders_for_items(bill, item_ids=pending_item_ids)
+    # Create KitchenOrder for KDS display and push the new cards to tablets
+    for kitchen_order in create_kitchen_orders_for_items(bill, item_ids=pending_item_ids):
+        push_kds_update(kitchen_order, 'new')
 
     # Create KitchenTicket for kitchen printer agent
     create_kitchen_tickets(bill, item_ids=pending_item_ids)
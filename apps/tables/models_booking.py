@@ -176,17 +176,19 @@ class Reservation(models.Model):
         super().save(*args, **kwargs)
 
     def generate_code(self):
-        date_str = self.reservation_date.strftime('%Y%m%d') if self.reservation_date else timezone.now().strftime('%Y%m%d')
-        prefix = f"RSV-{date_str}"
-        last = Reservation.objects.filter(reservation_code__startswith=prefix).order_by('-reservation_code').first()
-        if last:
+        from apps.core.sequences import next_value
+
+        code_date = self.reservation_date or timezone.localdate()
+        prefix = f"RSV-{code_date:%Y%m%d}"
+
+        def last_used():
+            last = Reservation.objects.filter(reservation_code__startswith=prefix).order_by('-reservation_code').first()
             try:
-                last_num = int(last.reservation_code.split('-')[-1])
-                new_num = last_num + 1
+                return int(last.reservation_code.split('-')[-1]) if last else 0
             except (ValueError, IndexError):
-                new_num = 1
-        else:
-            new_num = 1
+                return 0
+
+        new_num = next_value('reservation', business_date=code_date, seed=last_used)
         return f"{prefix}-{new_num:03d}"
 
     @property
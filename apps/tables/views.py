@@ -406,7 +406,8 @@ def merge_tables(request):
             user=request.user,
         )
     
-    return render(request, 'pos/partials/bill_panel.html', {'bill': main_bill})
+    from apps.pos.views import render_bill_panel
+    return render_bill_panel(request, main_bill)
 
 
 @login_required
@@ -51,6 +51,7 @@ def build_agent():
             '--hidden-import=escpos.printer.win32raw',
             '--hidden-import=win32print',
             '--hidden-import=psycopg2',
+            '--collect-data=tzdata',  # zoneinfo has no system tz database on Windows
         ])
     else:
         print("\n[INFO] Building for Linux...")
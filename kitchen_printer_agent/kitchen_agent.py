@@ -3,7 +3,7 @@ Kitchen Printer Agent - Production Ready
 Autonomous agent untuk kitchen ticket printing
 
 Design Principles:
-- Database polling untuk new tickets
+- Push mode: wake on Postgres NOTIFY, slow polling only as safety net
 - Support Windows & Linux printers
 - Network printer (RAW ESC/POS) & USB (Win32Raw)
 - Offline-first dengan retry logic
@@ -14,10 +14,13 @@ import sys
 import time
 import json
 import logging
+import queue
+import select
 import socket
 import threading
 from datetime import datetime
 from enum import Enum
+from zoneinfo import ZoneInfo
 from abc import ABC, abstractmethod
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
@@ -38,6 +41,7 @@ except ImportError:
 
 try:
     import psycopg2
+    from psycopg2 import sql
     HAS_PSYCOPG2 = True
 except ImportError:
     HAS_PSYCOPG2 = False
@@ -121,6 +125,7 @@ class Config:
             "agent": {
                 "name": "Kitchen-Agent-1",
                 "version": "1.0.0",
+                "timezone": "Asia/Jakarta",
                 "station_ids": [1, 2, 3],
                  "heartbeat_interval": 30,
                  "brand_ids": [],
@@ -135,10 +140,20 @@ class Config:
             },
             
             "polling": {
+                "mode": "notify",
+                "notify_channel": "kitchen_tickets",
                 "interval_seconds": 2,
+                "safety_interval_seconds": 30,
+                "lease_seconds": 120,
                 "max_tickets_per_poll": 10,
                 "retry_failed_tickets": True
             },
+            "dispatch": {
+                "queue_size": 20,
+                "max_batch_tickets": 5,
+                "breaker_failure_threshold": 3,
+                "breaker_reset_seconds": 30
+            },
             "health_check": {
                 "interval_seconds": 60,
                 "timeout_seconds": 5
@@ -153,7 +168,14 @@ class Config:
             "printer": {
                 "_comment": "Printer config is fetched from database (kitchen_stationprinter table)",
                 "default_timeout": 5,
-                "fallback_brand": "HRPT"
+                "fallback_brand": "HRPT",
+                "keepalive": True,
+                "idle_timeout_seconds": 30
+            },
+
+            "cache": {
+                "_comment": "Printer routing/template cache, also invalidated via NOTIFY",
+                "ttl_seconds": 300
             },
             
             "logging": {
@@ -263,6 +285,125 @@ class EpsonProfile(PrinterProfile):
         return b'\n\n\n' + b'\x1dV\x00'
 
 
+# ============================================================================
+# PRINTER CONNECTION POOL
+# ============================================================================
+
+class PrinterConnectionPool:
+    """Persistent TCP connections to network printers.
+
+    Avoids a TCP connect + printer handshake per ticket during rush hour.
+    Connections use SO_KEEPALIVE, are closed after `idle_timeout` seconds
+    without use (many printers accept only one client on port 9100, so an
+    idle agent should not hog it) and are re-established once on send error.
+    """
+
+    def __init__(self, idle_timeout=30, keepalive=True):
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.connections = {}  # (host, port) -> [socket, last_used]
+        self.busy = {}  # (host, port) -> sends in progress
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('PrinterConnectionPool')
+
+    def _connect(self, host, port, timeout):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        if self.keepalive:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.connect((host, port))
+        return sock
+
+    @staticmethod
+    def _is_alive(sock):
+        """Detect a connection the printer closed while we were idle"""
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return True
+            # Readable with no data means the peer closed the connection
+            return sock.recv(1, socket.MSG_PEEK) != b''
+        except (OSError, ValueError):
+            return False
+
+    def _acquire(self, key, timeout):
+        with self.lock:
+            entry = self.connections.pop(key, None)
+            self.busy[key] = self.busy.get(key, 0) + 1
+        if entry:
+            sock, last_used = entry
+            if time.time() - last_used < self.idle_timeout and self._is_alive(sock):
+                sock.settimeout(timeout)
+                return sock
+            self._close(sock)
+        return self._connect(key[0], key[1], timeout)
+
+    def _release(self, key, sock=None):
+        with self.lock:
+            if sock is not None:
+                self.connections[key] = [sock, time.time()]
+            self.busy[key] -= 1
+            if not self.busy[key]:
+                del self.busy[key]
+
+    def send(self, host, port, data, timeout):
+        """Send data over a pooled connection, reconnecting once on error"""
+        key = (host, port)
+        for attempt in (1, 2):
+            try:
+                sock = self._acquire(key, timeout)
+            except OSError:
+                self._release(key)
+                raise
+            try:
+                sock.sendall(data)
+                self._release(key, sock)
+                return
+            except OSError as e:
+                self._close(sock)
+                self._release(key)
+                if attempt == 2:
+                    raise
+                self.logger.warning(f"Connection to {host}:{port} lost ({e}) - reconnecting")
+
+    def is_connected(self, host, port):
+        """
+        True while the pool holds a live connection to the printer or is
+        sending on one. Health checks use this instead of opening a second
+        connection, which single-client printers would refuse mid-print.
+        """
+        key = (host, port)
+        with self.lock:
+            if self.busy.get(key):
+                return True
+            entry = self.connections.get(key)
+            return bool(entry) and self._is_alive(entry[0])
+
+    def evict_idle(self):
+        """Close connections idle longer than idle_timeout"""
+        now = time.time()
+        with self.lock:
+            stale = [key for key, (_, last_used) in self.connections.items()
+                     if now - last_used >= self.idle_timeout]
+            socks = [self.connections.pop(key)[0] for key in stale]
+        for sock in socks:
+            self._close(sock)
+
+    def close_all(self):
+        with self.lock:
+            socks = [sock for sock, _ in self.connections.values()]
+            self.connections.clear()
+        for sock in socks:
+            self._close(sock)
+
+    @staticmethod
+    def _close(sock):
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+
 # ============================================================================
 # PRINTER INTERFACE
 # ============================================================================
@@ -275,6 +416,10 @@ class PrinterInterface:
         self.default_timeout = config.get('printer', 'default_timeout', default=5)
         self.fallback_brand = config.get('printer', 'fallback_brand', default='HRPT')
         self.logger = logging.getLogger('PrinterInterface')
+        self.pool = PrinterConnectionPool(
+            idle_timeout=config.get('printer', 'idle_timeout_seconds', default=30),
+            keepalive=config.get('printer', 'keepalive', default=True),
+        )
         
         # Cache printer profiles
         self.profiles = {
@@ -286,32 +431,40 @@ class PrinterInterface:
     def print_ticket(self, ticket_data, printer_config, db=None):
         """Print kitchen ticket with dynamic printer config"""
         try:
-            # Get printer profile
-            brand = printer_config.get('brand', self.fallback_brand).upper()
-            profile = self.profiles.get(brand, self.profiles['HRPT'])
-            chars = printer_config.get('chars_per_line', 42)
-
-            # Route to appropriate formatter based on ticket type
-            if ticket_data.get('printer_target') == 'checker' and db:
-                raw_data = self._format_checker_ticket(ticket_data, profile, chars, db)
-            else:
-                raw_data = self._format_ticket(ticket_data, profile, chars, db)
-
-            # Print based on type
-            printer_type = printer_config.get('type', 'network')
-
-            if printer_type == 'network':
-                return self._print_network(raw_data, printer_config)
-            elif printer_type == 'win32':
-                return self._print_win32(raw_data, printer_config)
-            else:
-                self.logger.error(f"Unknown printer type: {printer_type}")
-                return False
-
+            return self.send_raw(self.render_ticket(ticket_data, printer_config, db), printer_config)
         except Exception as e:
             self.logger.error(f"Print failed: {e}")
             return False
 
+    def render_ticket(self, ticket_data, printer_config, db=None):
+        """Build the complete ESC/POS byte payload (ends with feed_and_cut)"""
+        # Get printer profile
+        brand = printer_config.get('brand', self.fallback_brand).upper()
+        profile = self.profiles.get(brand, self.profiles['HRPT'])
+        chars = printer_config.get('chars_per_line', 42)
+
+        # Pre-rendered at ticket creation - stream as-is if it was rendered
+        # for this printer's profile and width (printer may have changed since)
+        if ticket_data.get('rendered_payload') and ticket_data.get('rendered_profile') == f"{brand}/{chars}":
+            return ticket_data['rendered_payload']
+
+        # Route to appropriate formatter based on ticket type
+        if ticket_data.get('printer_target') == 'checker' and db:
+            return self._format_checker_ticket(ticket_data, profile, chars, db)
+        return self._format_ticket(ticket_data, profile, chars, db)
+
+    def send_raw(self, raw_data, printer_config):
+        """Send rendered bytes (one or several concatenated tickets) to a printer"""
+        printer_type = printer_config.get('type', 'network')
+
+        if printer_type == 'network':
+            return self._print_network(raw_data, printer_config)
+        elif printer_type == 'win32':
+            return self._print_win32(raw_data, printer_config)
+        else:
+            self.logger.error(f"Unknown printer type: {printer_type}")
+            return False
+
     def _format_ticket(self, ticket, profile, chars_per_line=42, db=None):
         """Format kitchen ticket with template from database"""
         data = bytearray()
@@ -474,7 +627,7 @@ class PrinterInterface:
         return bytes(data)
     
     def _print_network(self, data, printer_config):
-        """Print via network socket (RAW)"""
+        """Print via pooled network socket (RAW)"""
         host = printer_config.get('host')
         port = printer_config.get('port', 9100)
         timeout = printer_config.get('timeout', self.default_timeout)
@@ -482,11 +635,7 @@ class PrinterInterface:
         self.logger.info(f"Printing to network: {host}:{port}")
         
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            sock.connect((host, port))
-            sock.sendall(data)
-            sock.close()
+            self.pool.send(host, port, data, timeout)
             
             self.logger.info("Print successful")
             return True
@@ -517,6 +666,68 @@ class PrinterInterface:
             return False
 
 
+# ============================================================================
+# ROUTING CACHE
+# ============================================================================
+
+class RoutingCache:
+    """In-process TTL cache for printer routing and ticket templates.
+
+    StationPrinter rows and checker/kitchen templates change a few times a
+    month but were re-read for every ticket. Entries are keyed by
+    (kind, station_code, brand_id) and expire after `ttl` seconds; the
+    Django admin also sends a 'config_changed' NOTIFY so edits apply at once.
+    Shared by the main loop and printer worker threads, hence the lock.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.entries = {}  # (kind, station_code, brand_id) -> (value, expires_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger('RoutingCache')
+
+    def get_or_load(self, key, loader, cache_none=True):
+        """Return the cached value for key, calling loader() on miss/expiry"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader()
+        if value is not None or cache_none:
+            with self.lock:
+                self.entries[key] = (value, now + self.ttl)
+        return value
+
+    def invalidate(self, brand_id=None):
+        """Drop entries for one brand (plus brand-less fallbacks), or all"""
+        with self.lock:
+            if brand_id is None:
+                count = len(self.entries)
+                self.entries.clear()
+            else:
+                brand_id = str(brand_id)
+                stale = [k for k in self.entries if k[2] in (brand_id, None)]
+                for k in stale:
+                    del self.entries[k]
+                count = len(stale)
+        self.logger.info(f"Invalidated {count} cached route/template entries (brand_id={brand_id or 'ALL'})")
+
+    def status(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'ttl_seconds': self.ttl,
+            }
+
+
 # ============================================================================
 # DATABASE MANAGER
 # ============================================================================
@@ -527,6 +738,14 @@ class DatabaseManager:
     def __init__(self, config: Config):
         self.config = config
         self.conn = None
+        self.listen_conn = None
+        self.listen_channel = None
+        self._prepared = set()
+        self.agent_name = config.get('agent', 'name', default='Kitchen-Agent-1')
+        self.lease_seconds = config.get('polling', 'lease_seconds', default=120)
+        # Ticket times are printed in the POS TIME_ZONE, like Django's pre-rendered payloads
+        self.timezone = ZoneInfo(config.get('agent', 'timezone', default='Asia/Jakarta'))
+        self.routing_cache = RoutingCache(ttl=config.get('cache', 'ttl_seconds', default=300))
         self.logger = logging.getLogger('DatabaseManager')
         self.connect()
     
@@ -554,13 +773,100 @@ class DatabaseManager:
                 password=db_pass
             )
             self.conn.autocommit = True
+            self._prepared = set()
             self.logger.info("Database connected successfully")
         
         except Exception as e:
             self.logger.error(f"Database connection failed: {e}")
             raise
+
+    def listen(self, channel):
+        """Open a dedicated connection and LISTEN on a notification channel.
+
+        Kept separate from self.conn so a long select() wait never blocks
+        ticket queries. Returns True if LISTEN is active.
+        """
+        self.listen_channel = channel
+        try:
+            self.listen_conn = psycopg2.connect(
+                host=self.config.get('database', 'host'),
+                port=self.config.get('database', 'port'),
+                database=self.config.get('database', 'database'),
+                user=self.config.get('database', 'user'),
+                password=self.config.get('database', 'password')
+            )
+            self.listen_conn.autocommit = True
+            cursor = self.listen_conn.cursor()
+            cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+            cursor.close()
+            self.logger.info(f"Listening on channel '{channel}'")
+            return True
+        except Exception as e:
+            self.logger.error(f"LISTEN on '{channel}' failed: {e}")
+            self._close_listen_conn()
+            return False
+
+    def wait_for_notifications(self, timeout):
+        """Block up to timeout seconds for NOTIFY messages.
+
+        Returns a list of decoded payloads (dicts), an empty list on timeout,
+        or None if the listen connection is down (caller should poll).
+        """
+        if self.listen_conn is None:
+            if not self.listen_channel or not self.listen(self.listen_channel):
+                time.sleep(timeout)
+                return None
+
+        try:
+            readable, _, _ = select.select([self.listen_conn], [], [], timeout)
+            if not readable:
+                return []
+
+            self.listen_conn.poll()
+            payloads = []
+            while self.listen_conn.notifies:
+                notify = self.listen_conn.notifies.pop(0)
+                try:
+                    payloads.append(json.loads(notify.payload) if notify.payload else {})
+                except ValueError:
+                    payloads.append({})
+            return payloads
+
+        except Exception as e:
+            self.logger.error(f"Notification wait failed, will re-LISTEN: {e}")
+            self._close_listen_conn()
+            return None
+
+    def _close_listen_conn(self):
+        if self.listen_conn:
+            try:
+                self.listen_conn.close()
+            except Exception:
+                pass
+        self.listen_conn = None
     
     def get_printer_for_station(self, station_code, brand_id=None):
+        """Cached printer route for station + brand (see _query_printer_for_station).
+
+        Misses (no printer configured) are not cached so a newly added
+        printer is picked up on the next ticket.
+        """
+        key = ('printer', station_code, str(brand_id) if brand_id else None)
+        return self.routing_cache.get_or_load(
+            key, lambda: self._query_printer_for_station(station_code, brand_id), cache_none=False
+        )
+
+    def fetch_checker_template(self, brand_id=None):
+        """Cached checker template for brand (None = use built-in defaults)"""
+        key = ('checker_template', None, str(brand_id) if brand_id else None)
+        return self.routing_cache.get_or_load(key, lambda: self._query_checker_template(brand_id))
+
+    def fetch_kitchen_template(self, brand_id=None):
+        """Cached kitchen ticket template for brand (None = use built-in defaults)"""
+        key = ('kitchen_template', None, str(brand_id) if brand_id else None)
+        return self.routing_cache.get_or_load(key, lambda: self._query_kitchen_template(brand_id))
+
+    def _query_printer_for_station(self, station_code, brand_id=None):
         """Get printer configuration from database for station + brand.
 
         In multi-brand food courts, each brand has its own printer per station.
@@ -648,7 +954,7 @@ class DatabaseManager:
             self.logger.error(traceback.format_exc())
             return None
 
-    def fetch_checker_template(self, brand_id=None):
+    def _query_checker_template(self, brand_id=None):
         """Fetch checker template from database.
 
         Priority: brand-specific > company-wide (brand_id IS NULL).
@@ -698,7 +1004,7 @@ class DatabaseManager:
             self.logger.error(f"Failed to fetch checker template: {e}")
             return None
 
-    def fetch_kitchen_template(self, brand_id=None):
+    def _query_kitchen_template(self, brand_id=None):
         """Fetch kitchen ticket template from database.
 
         Priority: brand-specific > company-wide (brand_id IS NULL).
@@ -792,119 +1098,220 @@ class DatabaseManager:
         except Exception as e:
             self.logger.error(f"Failed to insert printer health: {e}")
     
-    def fetch_pending_tickets(self, station_codes, max_tickets=10, brand_ids=None):
-        """Fetch pending kitchen tickets for stations
+    # Server-side prepared statements, PREPAREd lazily once per connection.
+    # Claim + items are fetched in exactly two round trips per poll.
+    PREPARED_STATEMENTS = {
+        # Atomically claim tickets for this agent. FOR UPDATE SKIP LOCKED lets
+        # several agents share the queue without printing duplicates; tickets
+        # whose lease expired (agent crashed mid-print) are reclaimed.
+        'kitchen_claim_tickets': """
+            PREPARE kitchen_claim_tickets (text[], uuid[], int, bigint[], text, int) AS
+            WITH claimed AS (
+                UPDATE kitchen_kitchenticket
+                SET status = 'printing',
+                    print_attempts = print_attempts + 1,
+                    claimed_by = $5,
+                    lease_expires_at = NOW() + make_interval(secs => $6)
+                WHERE id IN (
+                    SELECT id
+                    FROM kitchen_kitchenticket
+                    WHERE printer_target = ANY($1)
+                      AND print_attempts < max_retries
+                      AND (
+                          status IN ('pending', 'new', 'failed')
+                          OR (status = 'printing' AND lease_expires_at < NOW())
+                      )
+                      AND ($2 IS NULL OR brand_id = ANY($2))
+                      AND NOT (id = ANY($4))
+                    ORDER BY created_at ASC
+                    LIMIT $3
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, printer_target, status, printer_ip, print_attempts,
+                          created_at, printed_at, bill_id, brand_id,
+                          rendered_payload, rendered_profile
+            )
+            SELECT
+                kt.id,
+                kt.printer_target,
+                kt.status,
+                kt.printer_ip,
+                kt.print_attempts,
+                kt.created_at,
+                kt.printed_at,
+                b.id as bill_id,
+                b.bill_number,
+                COALESCE(t.number, 'N/A') as table_number,
+                b.customer_name,
+                kt.brand_id,
+                kt.rendered_payload,
+                kt.rendered_profile
+            FROM claimed kt
+            JOIN pos_bill b ON kt.bill_id = b.id
+            LEFT JOIN tables_table t ON b.table_id = t.id
+            ORDER BY kt.created_at ASC
+        """,
+        'kitchen_ticket_items': """
+            PREPARE kitchen_ticket_items (bigint[]) AS
+            SELECT
+                kti.kitchen_ticket_id,
+                bi.id,
+                kti.quantity,
+                p.name as product_name,
+                bi.notes,
+                COALESCE(bi.printer_target, '') as station
+            FROM kitchen_kitchenticketitem kti
+            JOIN pos_billitem bi ON kti.bill_item_id = bi.id
+            JOIN core_product p ON bi.product_id = p.id
+            WHERE kti.kitchen_ticket_id = ANY($1)
+            ORDER BY kti.kitchen_ticket_id, bi.id
+        """,
+    }
+
+    def _ensure_prepared(self, cursor, name):
+        """PREPARE a statement on the current connection if not done yet"""
+        if name not in self._prepared:
+            cursor.execute(self.PREPARED_STATEMENTS[name])
+            self._prepared.add(name)
+
+    def claim_pending_tickets(self, station_codes, max_tickets=10, brand_ids=None, exclude_ids=None):
+        """Claim pending kitchen tickets for stations and return them
         
         Real DB structure:
         - kitchen_kitchenticket: id, printer_target (station code), status, printer_ip, bill_id
         - pos_bill: bill_number, table_id, etc
         - pos_billitem: items dengan product info
+
+        Claimed tickets are set to 'printing' with print_attempts + 1 and a
+        lease (claimed_by, lease_expires_at) in the same statement, so two
+        agents never receive the same ticket. Uses two prepared statements
+        (claim, then all items via ANY(ticket_ids)).
+        exclude_ids skips tickets deferred by the dispatcher (back-pressure).
         """
         try:
             cursor = self.conn.cursor()
-            
-            query = """
-                SELECT
-                    kt.id,
-                    kt.printer_target,
-                    kt.status,
-                    kt.printer_ip,
-                    kt.print_attempts,
-                    kt.created_at,
-                    kt.printed_at,
-                    b.id as bill_id,
-                    b.bill_number,
-                    COALESCE(t.number, 'N/A') as table_number,
-                    b.customer_name,
-                    kt.brand_id
-                FROM kitchen_kitchenticket kt
-                JOIN pos_bill b ON kt.bill_id = b.id
-                LEFT JOIN tables_table t ON b.table_id = t.id
-                WHERE kt.printer_target = ANY(%s)
-                  AND kt.status IN ('pending', 'new', 'failed')
-                  AND kt.print_attempts < kt.max_retries
-            """
+            self._ensure_prepared(cursor, 'kitchen_claim_tickets')
 
-            params = [station_codes]
-            if brand_ids:
-                query += " AND kt.brand_id = ANY(%s)"
-                params.append(brand_ids)
-
-            query += " ORDER BY kt.created_at ASC LIMIT %s"
-            params.append(max_tickets)
-            cursor.execute(query, tuple(params))
+            cursor.execute(
+                "EXECUTE kitchen_claim_tickets (%s::text[], %s::uuid[], %s, %s::bigint[], %s, %s)",
+                (
+                    list(station_codes),
+                    [str(b) for b in brand_ids] if brand_ids else None,
+                    max_tickets,
+                    list(exclude_ids or []),
+                    self.agent_name,
+                    self.lease_seconds,
+                )
+            )
             tickets = cursor.fetchall()
+
+            if not tickets:
+                cursor.close()
+                return []
+
+            # Fetch items for ALL fetched tickets in one round trip -
+            # ONLY items in each specific ticket
+            self._ensure_prepared(cursor, 'kitchen_ticket_items')
+            cursor.execute(
+                "EXECUTE kitchen_ticket_items (%s::bigint[])",
+                ([ticket[0] for ticket in tickets],)
+            )
+            items_by_ticket = {}
+            for item in cursor.fetchall():
+                items_by_ticket.setdefault(item[0], []).append({
+                    'id': item[1],
+                    'quantity': item[2],
+                    'product_name': item[3],
+                    'notes': item[4] or '',
+                    'station': item[5] or '',
+                })
+            cursor.close()
             
             result = []
             for ticket in tickets:
-                ticket_dict = {
+                result.append({
                     'id': ticket[0],
                     'printer_target': ticket[1],  # This is the station code
                     'status': ticket[2],
                     'printer_ip': ticket[3],
                     'print_attempts': ticket[4],
-                    'created_at': ticket[5].strftime('%Y-%m-%d %H:%M:%S') if ticket[5] else '',
+                    'created_at': ticket[5].astimezone(self.timezone).strftime('%Y-%m-%d %H:%M:%S') if ticket[5] else '',
                     'printed_at': ticket[6],
                     'bill_id': ticket[7],
                     'bill_number': ticket[8],
                     'table_number': ticket[9],
                     'customer_name': ticket[10] or '',
                     'brand_id': ticket[11],  # Brand ID for multi-brand printer routing
-                    'items': []
-                }
-                
-                # Fetch bill items - ONLY items in this specific ticket
-                items_query = """
-                    SELECT
-                        bi.id,
-                        kti.quantity,
-                        p.name as product_name,
-                        bi.notes,
-                        COALESCE(bi.printer_target, '') as station
-                    FROM kitchen_kitchenticketitem kti
-                    JOIN pos_billitem bi ON kti.bill_item_id = bi.id
-                    JOIN core_product p ON bi.product_id = p.id
-                    WHERE kti.kitchen_ticket_id = %s
-                    ORDER BY bi.id
-                """
-
-                cursor.execute(items_query, (ticket[0],))
-                items = cursor.fetchall()
-
-                for item in items:
-                    ticket_dict['items'].append({
-                        'id': item[0],
-                        'quantity': item[1],
-                        'product_name': item[2],
-                        'notes': item[3] or '',
-                        'station': item[4] or '',
-                    })
-                
-                result.append(ticket_dict)
+                    # ESC/POS bytes rendered by Django at ticket creation (may be None)
+                    'rendered_payload': bytes(ticket[12]) if ticket[12] is not None else None,
+                    'rendered_profile': ticket[13] or '',
+                    'items': items_by_ticket.get(ticket[0], [])
+                })
             
-            cursor.close()
             return result
         
         except Exception as e:
-            self.logger.error(f"Failed to fetch tickets: {e}")
+            self.logger.error(f"Failed to claim tickets: {e}")
             import traceback
             self.logger.error(traceback.format_exc())
             return []
     
-    def mark_ticket_printing(self, ticket_id):
-        """Mark ticket as printing and increment attempt counter"""
+    def fail_exhausted_leases(self):
+        """Fail expired leases that have no retries left.
+
+        Tickets whose agent died mid-print are reclaimed by the claim query
+        while retries remain; this stops the rest sitting in 'printing'.
+        """
         try:
             cursor = self.conn.cursor()
             cursor.execute(
-                "UPDATE kitchen_kitchenticket SET status = 'printing', print_attempts = print_attempts + 1 WHERE id = %s",
-                (ticket_id,)
+                """
+                UPDATE kitchen_kitchenticket
+                SET status = 'failed',
+                    lease_expires_at = NULL,
+                    error_message = 'Print lease expired',
+                    last_error_at = NOW()
+                WHERE status = 'printing'
+                  AND lease_expires_at < NOW()
+                  AND print_attempts >= max_retries
+                RETURNING id
+                """
+            )
+            expired = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            for ticket_id in expired:
+                self.log_ticket_action(ticket_id, 'failed', 'ERROR', 'Print lease expired', old_status='printing')
+            return len(expired)
+        except Exception as e:
+            self.logger.error(f"Failed to expire leases: {e}")
+            return 0
+    
+    def release_ticket(self, ticket_id, reason=''):
+        """Return a claimed ticket to the queue without consuming a retry.
+
+        Used when the ticket could not be printed by this agent (printer
+        breaker open, dispatch queue full, agent stopping).
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                UPDATE kitchen_kitchenticket
+                SET status = 'new',
+                    print_attempts = GREATEST(print_attempts - 1, 0),
+                    claimed_by = '',
+                    lease_expires_at = NULL
+                WHERE id = %s AND status = 'printing' AND claimed_by = %s
+                """,
+                (ticket_id, self.agent_name)
             )
             cursor.close()
+            self.log_ticket_action(ticket_id, 'new', 'RELEASED', reason, old_status='printing')
             return True
         except Exception as e:
-            self.logger.error(f"Failed to mark printing: {e}")
+            self.logger.error(f"Failed to release ticket: {e}")
             return False
-    
+
     def mark_ticket_printed(self, ticket_id, printer_ip=None):
         """Mark ticket as printed"""
         try:
@@ -913,7 +1320,8 @@ class DatabaseManager:
                 """
                 UPDATE kitchen_kitchenticket 
                 SET status = 'printed', 
-                    printed_at = NOW() 
+                    printed_at = NOW(),
+                    lease_expires_at = NULL
                 WHERE id = %s
                 """,
                 (ticket_id,)
@@ -930,7 +1338,7 @@ class DatabaseManager:
         try:
             cursor = self.conn.cursor()
             cursor.execute(
-                "UPDATE kitchen_kitchenticket SET status = 'failed' WHERE id = %s",
+                "UPDATE kitchen_kitchenticket SET status = 'failed', lease_expires_at = NULL WHERE id = %s",
                 (ticket_id,)
             )
             cursor.close()
@@ -950,7 +1358,7 @@ class DatabaseManager:
                 (ticket_id, timestamp, old_status, new_status, action, actor, printer_ip, error_code, error_message, duration_ms, metadata)
                 VALUES (%s, NOW(), %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """,
-                (ticket_id, old_status, new_status, action, 'kitchen_agent', printer_ip, '', message, duration_ms, '{}')
+                (ticket_id, old_status, new_status, action, self.agent_name, printer_ip, '', message, duration_ms, '{}')
             )
             cursor.close()
         except Exception as e:
@@ -984,11 +1392,225 @@ class DatabaseManager:
     
     def close(self):
         """Close database connection"""
+        self._close_listen_conn()
         if self.conn:
             self.conn.close()
             self.logger.info("Database connection closed")
 
 
+# ============================================================================
+# PRINTER DISPATCHER
+# ============================================================================
+
+class BreakerState(Enum):
+    CLOSED = 'closed'        # Printer healthy - print normally
+    OPEN = 'open'            # Printer dead - skip without socket timeout
+    HALF_OPEN = 'half_open'  # Cooldown elapsed - allow one trial print
+
+
+class CircuitBreaker:
+    """Per-printer circuit breaker.
+
+    Opens after `failure_threshold` consecutive print failures (or an offline
+    health check), so a dead printer stops costing a socket timeout on every
+    ticket. After `reset_seconds` one trial print is allowed (half-open);
+    success or an online health check closes it again.
+    """
+
+    def __init__(self, failure_threshold=3, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """True if a print may be attempted now"""
+        with self.lock:
+            if self.state == BreakerState.OPEN and time.time() - self.opened_at >= self.reset_seconds:
+                self.state = BreakerState.HALF_OPEN
+            return self.state != BreakerState.OPEN
+
+    def record_success(self):
+        with self.lock:
+            self.state = BreakerState.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == BreakerState.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.trip()
+
+    def trip(self):
+        """Open the breaker (caller may already hold the lock)"""
+        self.state = BreakerState.OPEN
+        self.opened_at = time.time()
+
+
+class PrinterWorker:
+    """Single worker thread + bounded FIFO queue for one physical printer.
+
+    One worker per printer keeps tickets for a station in FIFO order while
+    different printers print concurrently. Tickets already waiting in the
+    queue are handed to the handler together (up to max_batch) so they can
+    be sent to the printer in one buffered write.
+    """
+
+    def __init__(self, key, handler, queue_size, breaker, max_batch=1):
+        self.key = key
+        self.handler = handler
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.breaker = breaker
+        self.max_batch = max(1, max_batch)
+        self.stop_event = threading.Event()
+        self.logger = logging.getLogger(f'PrinterWorker[{key}]')
+        self.thread = threading.Thread(target=self.run, name=f'printer-{key}', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                jobs = [self.queue.get(timeout=1)]
+            except queue.Empty:
+                continue
+
+            # Coalesce whatever else is already queued for this printer
+            while len(jobs) < self.max_batch:
+                try:
+                    jobs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.handler(jobs, self.breaker)
+            except Exception as e:
+                self.logger.error(f"Worker error on tickets {[t.get('id') for t, _ in jobs]}: {e}")
+            finally:
+                for _ in jobs:
+                    self.queue.task_done()
+
+
+class PrinterDispatcher:
+    """Routes tickets to per-printer workers with back-pressure.
+
+    Tickets that cannot be queued (queue full or breaker open) are deferred:
+    they stay 'new' in the database and their ids are excluded from the next
+    fetch, so one dead printer's backlog never starves the other stations.
+    """
+
+    def __init__(self, handler, queue_size=20, failure_threshold=3, reset_seconds=30, max_batch=1):
+        self.handler = handler
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.workers = {}
+        self.breakers = {}
+        self.deferred = {}  # printer key -> set of ticket ids
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('PrinterDispatcher')
+
+    @staticmethod
+    def printer_key(printer_config):
+        """Stable key for a physical printer: host:port or win32 name"""
+        if printer_config.get('type') == 'win32':
+            return f"win32:{printer_config.get('name')}"
+        return f"{printer_config.get('host')}:{printer_config.get('port', 9100)}"
+
+    def get_breaker(self, key):
+        with self.lock:
+            if key not in self.breakers:
+                self.breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+            return self.breakers[key]
+
+    def _get_worker(self, key):
+        with self.lock:
+            if key not in self.workers:
+                if key not in self.breakers:
+                    self.breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+                self.workers[key] = PrinterWorker(
+                    key, self.handler, self.queue_size, self.breakers[key], self.max_batch
+                )
+            return self.workers[key]
+
+    def can_accept(self, key):
+        """True if the printer's breaker allows printing and its queue has room"""
+        if not self.get_breaker(key).allow():
+            return False
+        worker = self.workers.get(key)
+        return worker is None or not worker.queue.full()
+
+    def defer(self, key, ticket_id):
+        """Exclude a ticket from fetching until its printer can accept work"""
+        self.deferred.setdefault(key, set()).add(ticket_id)
+
+    def submit(self, ticket, printer_config):
+        """Queue a ticket for its printer. Returns False if it was deferred."""
+        key = self.printer_key(printer_config)
+        try:
+            self._get_worker(key).queue.put_nowait((ticket, printer_config))
+        except queue.Full:
+            self.defer(key, ticket['id'])
+            return False
+        return True
+
+    def deferred_ticket_ids(self):
+        """Ticket ids to exclude from the next fetch.
+
+        Deferrals are dropped as soon as their printer can accept work again.
+        """
+        for key in list(self.deferred):
+            if self.can_accept(key):
+                del self.deferred[key]
+        return [tid for ids in self.deferred.values() for tid in ids]
+
+    def record_health(self, key, is_online):
+        """Feed a health check result into the printer's breaker"""
+        breaker = self.get_breaker(key)
+        if is_online:
+            if breaker.state != BreakerState.CLOSED:
+                self.logger.info(f"Printer {key} back online - closing breaker")
+            breaker.record_success()
+        else:
+            with breaker.lock:
+                breaker.trip()
+
+    def status(self):
+        """Per-printer queue depth and breaker state for the health server"""
+        with self.lock:
+            keys = set(self.workers) | set(self.breakers)
+            return {
+                key: {
+                    'queued': self.workers[key].queue.qsize() if key in self.workers else 0,
+                    'breaker': self.breakers[key].state.value if key in self.breakers else 'closed',
+                    'deferred': len(self.deferred.get(key, ())),
+                }
+                for key in keys
+            }
+
+    def stop(self, timeout=5):
+        """Stop workers, letting in-flight prints finish.
+
+        Returns ids of tickets still queued so the caller can release them.
+        """
+        for worker in self.workers.values():
+            worker.stop_event.set()
+        for worker in self.workers.values():
+            worker.thread.join(timeout=timeout)
+
+        undelivered = []
+        for worker in self.workers.values():
+            while True:
+                try:
+                    ticket, _ = worker.queue.get_nowait()
+                except queue.Empty:
+                    break
+                undelivered.append(ticket['id'])
+        return undelivered
+
+
 # ============================================================================
 # HEALTH SERVER (HTTP)
 # ============================================================================
@@ -1026,6 +1648,9 @@ class HealthRequestHandler(BaseHTTPRequestHandler):
             'tickets_processed': agent.tickets_processed,
             'station_codes': agent.station_codes,
             'poll_interval': agent.poll_interval,
+            'polling_mode': 'notify' if agent.notify_active else 'poll',
+            'dispatch': agent.dispatcher.status(),
+            'routing_cache': agent.db.routing_cache.status(),
             'timestamp': datetime.now().isoformat()
         }
         self._send_json(200, response)
@@ -1102,6 +1727,9 @@ class KitchenAgent:
         self.station_codes = self.config.get('agent', 'station_codes', default=['kitchen'])
         self.brand_ids = self.config.get('agent', 'brand_ids', default=[])
         self.poll_interval = self.config.get('polling', 'interval_seconds', default=2)
+        self.polling_mode = self.config.get('polling', 'mode', default='notify')
+        self.notify_channel = self.config.get('polling', 'notify_channel', default='kitchen_tickets')
+        self.safety_poll_interval = self.config.get('polling', 'safety_interval_seconds', default=30)
         self.max_tickets = self.config.get('polling', 'max_tickets_per_poll', default=10)
         self.heartbeat_interval = self.config.get('agent', 'heartbeat_interval', default=30)
         self.health_check_interval = self.config.get('health_check', 'interval_seconds', default=60)
@@ -1123,6 +1751,21 @@ class KitchenAgent:
         self.last_heartbeat = 0
         self.last_health_check = 0
 
+        # Per-printer dispatch workers (concurrent stations, FIFO per printer)
+        self.stats_lock = threading.Lock()
+        self.dispatcher = PrinterDispatcher(
+            handler=self.print_dispatched_tickets,
+            queue_size=self.config.get('dispatch', 'queue_size', default=20),
+            max_batch=self.config.get('dispatch', 'max_batch_tickets', default=5),
+            failure_threshold=self.config.get('dispatch', 'breaker_failure_threshold', default=3),
+            reset_seconds=self.config.get('dispatch', 'breaker_reset_seconds', default=30),
+        )
+
+        # Push mode state: wake on NOTIFY, poll every safety_poll_interval
+        self.notify_active = False
+        self.tickets_wakeup = True
+        self.last_ticket_poll = 0
+
         self.running = False
         self.logger.info("Kitchen Agent initialized")
     
@@ -1179,7 +1822,10 @@ class KitchenAgent:
             self.logger.info(f"Agent Name: {self.agent_name}")
             self.logger.info(f"Station Codes: {self.station_codes}")
             self.logger.info(f"Brand IDs: {self.brand_ids if self.brand_ids else 'ALL'}")
+            self.logger.info(f"Polling Mode: {self.polling_mode}")
             self.logger.info(f"Poll Interval: {self.poll_interval}s")
+            if self.polling_mode == 'notify':
+                self.logger.info(f"Safety Poll Interval: {self.safety_poll_interval}s")
             self.logger.info(f"Heartbeat Interval: {self.heartbeat_interval}s")
             self.logger.info(f"Health Check Interval: {self.health_check_interval}s")
             self.logger.info("=" * 60)
@@ -1187,16 +1833,25 @@ class KitchenAgent:
             # Start HTTP health server (non-blocking daemon thread)
             self.start_health_server()
 
+            # Push mode: LISTEN for new ticket notifications
+            if self.polling_mode == 'notify':
+                self.notify_active = self.db.listen(self.notify_channel)
+                if not self.notify_active:
+                    self.logger.warning("LISTEN unavailable - falling back to fixed-interval polling")
+
             print("[DEBUG] Logger setup complete, entering loop")
             self.running = True
             
             while self.running:
-                print("[DEBUG] Loop iteration")
-                try:
-                    self.process_tickets()
-                except Exception as e:
-                    self.logger.error(f"Error in process_tickets: {e}")
-                    print(f"[DEBUG] Error in loop: {e}")
+                if self.should_fetch_tickets():
+                    try:
+                        fetched = self.process_tickets()
+                        self.last_ticket_poll = time.time()
+                        # Keep draining while the queue returns full batches
+                        self.tickets_wakeup = fetched >= self.max_tickets
+                    except Exception as e:
+                        self.logger.error(f"Error in process_tickets: {e}")
+                        print(f"[DEBUG] Error in loop: {e}")
                 
                 try:
                     self.send_heartbeat()
@@ -1207,8 +1862,11 @@ class KitchenAgent:
                     self.check_printers_health()
                 except Exception as e:
                     self.logger.error(f"Error in check_printers_health: {e}")
+
+                # Free printer port 9100 for other clients when idle
+                self.printer.pool.evict_idle()
                 
-                time.sleep(self.poll_interval)
+                self.wait_for_tickets()
         
         except KeyboardInterrupt:
             self.logger.info("Shutdown requested (Ctrl+C)")
@@ -1225,14 +1883,64 @@ class KitchenAgent:
             print("[DEBUG] In finally block")
             self.stop()
     
+    def should_fetch_tickets(self):
+        """Decide whether this loop iteration should query the ticket queue.
+
+        Poll mode (or LISTEN unavailable): every iteration.
+        Notify mode: only when woken by NOTIFY, while draining a full batch,
+        or when the safety-net interval has elapsed (covers missed
+        notifications and retries of failed tickets).
+        """
+        if not self.notify_active:
+            return True
+        if self.tickets_wakeup:
+            return True
+        return time.time() - self.last_ticket_poll >= self.safety_poll_interval
+
+    def wait_for_tickets(self):
+        """Sleep until the next loop iteration.
+
+        In notify mode this blocks on the LISTEN socket for at most
+        poll_interval, so heartbeat/health checks stay on schedule while an
+        incoming NOTIFY wakes the loop immediately without any DB query.
+        """
+        if not self.notify_active:
+            time.sleep(self.poll_interval)
+            return
+
+        payloads = self.db.wait_for_notifications(self.poll_interval)
+        if payloads is None:
+            # Listen connection dropped - poll once to avoid missing tickets,
+            # and drop cached routes in case a config_changed was missed
+            self.tickets_wakeup = True
+            self.db.routing_cache.invalidate()
+            return
+
+        for payload in payloads:
+            if payload.get('event') == 'config_changed':
+                self.db.routing_cache.invalidate(payload.get('brand_id'))
+            elif self.is_relevant_notification(payload):
+                self.tickets_wakeup = True
+
+    def is_relevant_notification(self, payload):
+        """Check whether a NOTIFY payload targets this agent's stations/brands"""
+        stations = payload.get('stations')
+        if stations and not set(stations) & set(self.station_codes):
+            return False
+        brand_id = payload.get('brand_id')
+        if self.brand_ids and brand_id and brand_id not in [str(b) for b in self.brand_ids]:
+            return False
+        return True
+
     def process_tickets(self):
-        """Process pending tickets for all stations"""
+        """Process pending tickets for all stations. Returns number fetched."""
         try:
             # Fetch tickets for all monitored stations
-            self.logger.info(f"Checking for tickets - Stations: {self.station_codes}")
-            tickets = self.db.fetch_pending_tickets(self.station_codes, self.max_tickets, self.brand_ids)
-            
-            self.logger.info(f"Fetched {len(tickets)} ticket(s)")
+            self.logger.debug(f"Checking for tickets - Stations: {self.station_codes}")
+            tickets = self.db.claim_pending_tickets(
+                self.station_codes, self.max_tickets, self.brand_ids,
+                exclude_ids=self.dispatcher.deferred_ticket_ids()
+            )
             
             if tickets:
                 self.logger.info(f"Found {len(tickets)} pending ticket(s)")
@@ -1241,14 +1949,17 @@ class KitchenAgent:
                     self.process_single_ticket(ticket)
             else:
                 self.logger.debug("No pending tickets found")
+
+            return len(tickets)
         
         except Exception as e:
             self.logger.error(f"Error processing tickets: {e}")
             import traceback
             self.logger.error(traceback.format_exc())
+            return 0
     
     def process_single_ticket(self, ticket):
-        """Process a single ticket"""
+        """Route a single ticket to its printer's dispatch queue"""
         ticket_id = ticket['id']
         bill_number = ticket['bill_number']
         printer_target = ticket['printer_target']
@@ -1266,30 +1977,74 @@ class KitchenAgent:
                 self.logger.error(error_msg)
                 self.db.mark_ticket_failed(ticket_id, error_msg)
                 return
-            
-            printer_ip = printer_config['ip']
-            
-            # Mark as printing
-            if not self.db.mark_ticket_printing(ticket_id):
-                self.logger.error(f"Failed to mark ticket {ticket_id} as printing")
+
+            # Ticket is already claimed ('printing' + lease) by claim_pending_tickets
+            key = PrinterDispatcher.printer_key(printer_config)
+            if not self.dispatcher.can_accept(key):
+                # Breaker open or queue full - hand ticket back for later
+                self.dispatcher.defer(key, ticket_id)
+                self.db.release_ticket(ticket_id, f"Printer {key} unavailable or busy")
+                self.logger.warning(f"Printer {key} unavailable or busy - deferring ticket {ticket_id}")
                 return
-            
-            # Print ticket with dynamic config (pass db for checker template lookup)
-            success = self.printer.print_ticket(ticket, printer_config, db=self.db)
-            
+
+            if not self.dispatcher.submit(ticket, printer_config):
+                self.db.release_ticket(ticket_id, f"Dispatch queue full for {key}")
+
+        except Exception as e:
+            self.logger.error(f"Error processing ticket {ticket_id}: {e}")
+            self.db.mark_ticket_failed(ticket_id, str(e))
+
+    def print_dispatched_tickets(self, jobs, breaker):
+        """Print queued tickets for one printer (runs on its worker thread).
+
+        All tickets in the batch are rendered first and sent in a single
+        buffered write - each payload already ends with the profile's
+        feed_and_cut, so the printer still cuts between tickets.
+        """
+        printer_config = jobs[0][1]
+        printer_ip = printer_config['ip']
+
+        # Breaker may have opened while these tickets waited in the queue
+        if not breaker.allow():
+            for ticket, _ in jobs:
+                self.db.release_ticket(ticket['id'], f"Printer {printer_ip} circuit open")
+            return
+
+        rendered = []
+        for ticket, config in jobs:
+            try:
+                rendered.append((ticket, self.printer.render_ticket(ticket, config, db=self.db)))
+            except Exception as e:
+                self.logger.error(f"Error formatting ticket {ticket['id']}: {e}")
+                self.db.mark_ticket_failed(ticket['id'], str(e), printer_ip=printer_ip)
+
+        if not rendered:
+            return
+
+        try:
+            success = self.printer.send_raw(b''.join(data for _, data in rendered), printer_config)
+        except Exception as e:
+            self.logger.error(f"Error printing tickets {[t['id'] for t, _ in rendered]}: {e}")
+            success = False
+
+        if success:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        for ticket, _ in rendered:
             if success:
                 # Mark as printed
-                self.db.mark_ticket_printed(ticket_id, printer_ip=printer_ip)
-                self.tickets_processed += 1
-                self.logger.info(f"✓ Bill #{bill_number} printed successfully")
+                self.db.mark_ticket_printed(ticket['id'], printer_ip=printer_ip)
+                self.logger.info(f"✓ Bill #{ticket['bill_number']} printed successfully")
             else:
                 # Mark as failed
-                self.db.mark_ticket_failed(ticket_id, "Print failed", printer_ip=printer_ip)
-                self.logger.error(f"✗ Bill #{bill_number} print failed")
-        
-        except Exception as e:
-            self.logger.error(f"Error processing ticket {ticket_id}: {e}")
-            self.db.mark_ticket_failed(ticket_id, str(e))
+                self.db.mark_ticket_failed(ticket['id'], "Print failed", printer_ip=printer_ip)
+                self.logger.error(f"✗ Bill #{ticket['bill_number']} print failed")
+
+        if success:
+            with self.stats_lock:
+                self.tickets_processed += len(rendered)
     
     def send_heartbeat(self):
         """Send heartbeat to database"""
@@ -1308,6 +2063,9 @@ class KitchenAgent:
             
             self.db.update_agent_heartbeat(self.agent_name, self.station_codes, stats)
             self.last_heartbeat = current_time
+
+            # Housekeeping: fail crashed-agent leases that have no retries left
+            self.db.fail_exhausted_leases()
             
             # Log heartbeat every 5 minutes
             if uptime % 300 == 0:
@@ -1336,10 +2094,15 @@ class KitchenAgent:
                 error_message = ''
 
                 try:
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(self.health_check_timeout)
-                    result = sock.connect_ex((str(printer['printer_ip']), int(printer['printer_port'])))
-                    sock.close()
+                    host, port = str(printer['printer_ip']), int(printer['printer_port'])
+                    if self.printer.pool.is_connected(host, port):
+                        # Pooled connection is up - don't open a second one
+                        result = 0
+                    else:
+                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                        sock.settimeout(self.health_check_timeout)
+                        result = sock.connect_ex((host, port))
+                        sock.close()
 
                     response_time_ms = int((time.time() - start_time) * 1000)
                     if result == 0:
@@ -1357,6 +2120,11 @@ class KitchenAgent:
                     error_message=error_message
                 )
 
+                # Open/close the printer's dispatch circuit breaker
+                self.dispatcher.record_health(
+                    f"{printer['printer_ip']}:{printer['printer_port']}", is_online
+                )
+
                 # Cache result for health server HTTP endpoint
                 self.printer_health_cache[printer['id']] = {
                     'id': printer['id'],
@@ -1382,6 +2150,12 @@ class KitchenAgent:
         self.logger.info("Stopping Kitchen Agent...")
         self.running = False
 
+        # Let in-flight prints finish before closing the DB connection,
+        # and hand still-queued tickets back to the queue
+        for ticket_id in self.dispatcher.stop():
+            self.db.release_ticket(ticket_id, "Agent stopped before printing")
+        self.printer.pool.close_all()
+
         # Shutdown health server
         if self.health_server:
             try:
@@ -47,10 +47,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.RequestIdMiddleware',  # Log correlation id (hotpath_log)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.middleware.StoreContextMiddleware',  # request.store_ctx (cached store/brands)
     'apps.core.middleware_session.SessionSafeguardMiddleware',  # Session protection
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -160,6 +162,33 @@ USE_TZ = True
 KITCHEN_LOG_RETENTION_DAYS = int(os.environ.get('KITCHEN_LOG_RETENTION_DAYS', '30'))
 KITCHEN_TICKET_RETENTION_DAYS = int(os.environ.get('KITCHEN_TICKET_RETENTION_DAYS', '30'))
 
+# Cached store/brand context (apps.core.store_context) safety-net reload interval
+STORE_CONTEXT_TTL = int(os.environ.get('STORE_CONTEXT_TTL', '300'))
+
+# Cached POS terminal lookups (apps.core.terminal_resolver) reload interval
+TERMINAL_CACHE_TTL = int(os.environ.get('TERMINAL_CACHE_TTL', '60'))
+
+# POS product catalog snapshot per brand (apps.pos.catalog) safety-net rebuild interval
+POS_CATALOG_TTL = int(os.environ.get('POS_CATALOG_TTL', '600'))
+
+# Compiled promotion sets per brand (apps.promotions.compiled) safety-net rebuild interval
+PROMOTION_CACHE_TTL = int(os.environ.get('PROMOTION_CACHE_TTL', '300'))
+
+# Time budget of the promotion combination search per cart (apps.promotions.allocation)
+PROMOTION_SOLVER_BUDGET_MS = int(os.environ.get('PROMOTION_SOLVER_BUDGET_MS', '50'))
+
+# Postgres LISTEN/NOTIFY channel used to wake kitchen printer agents
+KITCHEN_NOTIFY_CHANNEL = os.environ.get('KITCHEN_NOTIFY_CHANNEL', 'kitchen_tickets')
+
+# Render ESC/POS payloads when kitchen tickets are created (agent just streams bytes)
+KITCHEN_PRERENDER_TICKETS = os.environ.get('KITCHEN_PRERENDER_TICKETS', 'True') == 'True'
+
+# Hot-path logging (apps.core.hotpath_log): share of requests whose debug/info
+# events are logged, and whether diagnostic item dumps run at all
+POS_LOG_SAMPLE_RATE = float(os.environ.get('POS_LOG_SAMPLE_RATE', '1.0' if DEBUG else '0.05'))
+POS_LOG_DIAGNOSTIC_DUMPS = os.environ.get('POS_LOG_DIAGNOSTIC_DUMPS', str(DEBUG)) == 'True'
+POS_LOG_LEVEL = os.environ.get('POS_LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+
 # Static files
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
@@ -173,12 +202,18 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Session Settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Use database backend for reliability
+# SESSION_BACKEND: 'db' (default, reliable), 'cached_db' (reads from Redis, writes
+# through to DB) or 'cache' (Redis only - sessions lost if Redis is flushed)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_SECURE = False  # False for development (HTTP)
-SESSION_SAVE_EVERY_REQUEST = True  # Ensure session is saved on every request
+# SessionSafeguardMiddleware keep-alive: touch the session at most every N minutes
+# instead of an UPDATE on every HTMX request. 0 = legacy save on every request.
+SESSION_KEEPALIVE_MINUTES = int(os.environ.get('SESSION_KEEPALIVE_MINUTES', '5'))
+SESSION_SAVE_EVERY_REQUEST = SESSION_KEEPALIVE_MINUTES == 0
 SESSION_COOKIE_NAME = 'pos_sessionid'  # Custom name to avoid conflicts
 SESSION_COOKIE_PATH = '/'  # Ensure cookie is valid for all paths
 
@@ -286,11 +321,27 @@ SIMPLE_JWT = {
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'apps.core.hotpath_log.RequestIdFilter',
+        },
+    },
+    'formatters': {
+        'pos': {
+            'format': '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
+            'filters': ['request_id'],
+            'formatter': 'pos',
         },
     },
+    'loggers': {
+        'apps.pos.views': {'level': POS_LOG_LEVEL},
+        'apps.kitchen.views': {'level': POS_LOG_LEVEL},
+    },
     'root': {
         'handlers': ['console'],
         'level': 'INFO',